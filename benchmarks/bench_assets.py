@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+Cost of emit_assets on a page with dozens of asset tags.
+
+Renders a template calling emit_assets 50 times, with the memo table
+(the normal case) and with the memo table cleared before every call
+(the url_for cost paid on every call).
+
+Usage::
+
+    python benchmarks/bench_assets.py
+"""
+
+import sys
+import timeit
+from os.path import dirname, abspath, join
+
+from flask import Flask, render_template
+from flask_pluginkit import PluginManager
+
+EXAMPLE_DIR = join(dirname(dirname(abspath(__file__))), "examples", "fulldemo")
+
+PAGE = """\
+{%% for i in range(25) %%}
+{{ %(func)s('localdemo', 'css/style.css') }}
+{{ %(func)s('localdemo', 'js/hello.js', _external=True) }}
+{%% endfor %%}
+"""
+
+
+def main(number=2000):
+    sys.path.insert(0, EXAMPLE_DIR)
+    app = Flask("bench_assets")
+    pm = PluginManager(app, plugins_base=EXAMPLE_DIR)
+
+    def emit_assets_nomemo(*args, **kwargs):
+        pm._assets_memo.clear()
+        return pm.emit_assets(*args, **kwargs)
+
+    app.jinja_env.globals["emit_assets_nomemo"] = emit_assets_nomemo
+    cases = (
+        ("without memo", PAGE % dict(func="emit_assets_nomemo")),
+        ("with memo", PAGE % dict(func="emit_assets")),
+    )
+    with app.test_request_context("/"):
+        for name, source in cases:
+            tpl = app.jinja_env.from_string(source)
+            cost = min(
+                timeit.repeat(lambda: render_template(tpl), number=number, repeat=3)
+            )
+            print("%12s: %8.2f us/page" % (name, cost / number * 1e6))
+
+
+if __name__ == "__main__":
+    main()
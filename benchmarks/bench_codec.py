@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+Payload size and encode/decode time of the storage value codecs.
+
+Encodes a small, a medium and a large nested plugin payload with
+JsonCodec, PickleCodec without compression and PickleCodec compressing
+above 1 KiB, then prints the encoded size and the encode and decode time.
+
+Usage::
+
+    python benchmarks/bench_codec.py
+"""
+
+import timeit
+
+from flask_pluginkit.utils import JsonCodec, PickleCodec
+
+
+def make_payload(count):
+    return dict(
+        name="plugin",
+        enabled=True,
+        settings=[
+            dict(id=i, key="setting-%d" % i, value=[i, i * 2.5, "text %d" % i])
+            for i in range(count)
+        ],
+    )
+
+
+def main(number=200):
+    codecs = (
+        ("json", JsonCodec()),
+        ("pickle", PickleCodec(compress_threshold=0)),
+        ("pickle+zlib", PickleCodec(compress_threshold=1024)),
+    )
+    for count in (1, 100, 10000):
+        value = make_payload(count)
+        for name, codec in codecs:
+            data = codec.encode(value)
+            n = max(1, number // max(1, count // 100))
+            enc = min(timeit.repeat(lambda: codec.encode(value), number=n, repeat=3))
+            dec = min(timeit.repeat(lambda: codec.decode(data), number=n, repeat=3))
+            print(
+                "%5d items, %-11s: %9d bytes, encode %10.2f us, decode %10.2f us"
+                % (count, name, len(data), enc / n * 1e6, dec / n * 1e6)
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+Per-request cost of the hook extension point dispatch.
+
+Builds an application with 0, 10 and 100 plugins that each supply
+before_request, after_request and teardown_request heps, then times one
+request cycle of the hooks inside an already pushed request context
+(without routing, context setup or view execution).
+
+Usage::
+
+    python benchmarks/bench_hep.py
+"""
+
+import sys
+import timeit
+from os import mkdir
+from os.path import join
+from tempfile import mkdtemp
+
+from flask import Flask
+from flask_pluginkit import PluginManager
+
+PLUGIN_TPL = """\
+__plugin_name__ = "hep%(i)d"
+__version__ = "0.1.0"
+__author__ = "bench"
+
+
+def noop(*args):
+    pass
+
+
+def register():
+    return dict(
+        hep=dict(before_request=noop, after_request=noop, teardown_request=noop)
+    )
+"""
+
+
+def make_app(base, count):
+    folder = "heps%d" % count
+    mkdir(join(base, folder))
+    with open(join(base, folder, "__init__.py"), "w") as fd:
+        fd.write("")
+    for i in range(count):
+        pkg = join(base, folder, "hep%d" % i)
+        mkdir(pkg)
+        with open(join(pkg, "__init__.py"), "w") as fd:
+            fd.write(PLUGIN_TPL % dict(i=i))
+    app = Flask("bench%d" % count)
+    PluginManager(app, plugins_base=base, plugins_folder=folder)
+    return app
+
+
+def one_request(app, response):
+    app.preprocess_request()
+    app.process_response(response)
+    app.do_teardown_request()
+
+
+def main(number=20000):
+    base = mkdtemp(prefix="fpk-bench-")
+    sys.path.insert(0, base)
+    baseline = None
+    for count in (0, 10, 100):
+        app = make_app(base, count)
+        response = app.response_class()
+        with app.test_request_context("/"):
+            cost = min(
+                timeit.repeat(
+                    lambda: one_request(app, response), number=number, repeat=3
+                )
+            )
+        cost = cost / number * 1e6
+        if baseline is None:
+            baseline = cost
+        print(
+            "%3d hep plugins: %8.2f us/request (+%.2f us over no plugins)"
+            % (count, cost, cost - baseline)
+        )
+
+
+if __name__ == "__main__":
+    main()
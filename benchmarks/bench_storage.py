@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+Cost of the single-key operations of the local storages as the store grows.
+
+Fills a LocalStorage and a LogStorage with 10, 1000 and 5000 keys (each
+value is a small dict), then times ``get`` of one key, ``in``, ``len`` and
+``set``, for LocalStorage once opening the file per call and once with the
+persistent handle.
+
+Usage::
+
+    python benchmarks/bench_storage.py
+"""
+
+import timeit
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from flask_pluginkit import LocalStorage, LogStorage
+
+
+def main(number=20):
+    base = mkdtemp(prefix="fpk-bench-")
+    try:
+        for kind in ("per-call", "persistent", "log"):
+            for size in (10, 1000, 5000):
+                path = join(base, "s%d%s" % (size, kind))
+                if kind == "log":
+                    storage = LogStorage(path)
+                else:
+                    storage = LocalStorage(path, persistent=kind == "persistent")
+                storage.setmany(
+                    **{"k%d" % i: dict(i=i, name="value %d" % i) for i in range(size)}
+                )
+                for name, stmt in (
+                    ("get", lambda: storage.get("k1")),
+                    ("in", lambda: "k1" in storage),
+                    ("len", lambda: len(storage)),
+                    ("set", lambda: storage.set("k1", dict(i=1))),
+                ):
+                    cost = min(timeit.repeat(stmt, number=number, repeat=3))
+                    print(
+                        "%-10s %5d keys, %-3s: %9.2f us/op"
+                        % (kind, size, name, cost / number * 1e6)
+                    )
+                storage.close()
+    finally:
+        rmtree(base)
+
+
+if __name__ == "__main__":
+    main()
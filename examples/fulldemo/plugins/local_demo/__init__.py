@@ -55,6 +55,7 @@ def register():
         "tep": dict(
             code=u"<p>hello local-demo(from html code)</p>",
             html="localdemo/title.html",
+            cached=dict(tpl=u"<p>cached {{ name }}</p>", cache=dict(keys=["name"])),
         ),
         "hep": dict(before_request=br),
         "bep": dict(blueprint=bp, prefix="/localdemo"),
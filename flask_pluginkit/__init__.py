@@ -15,9 +15,12 @@ from .utils import (
     RedisStorage,
     JsonResponse,
     ExpiredLocalStorage,
+    AsyncLocalStorage,
+    AsyncRedisStorage,
 )
 from .version import __version__
 from ._installer import PluginInstaller
+from ._logstorage import LogStorage
 from ._web import blueprint
 
 
@@ -32,4 +35,7 @@ __all__ = [
     "push_dcp",
     "blueprint",
     "ExpiredLocalStorage",
+    "AsyncLocalStorage",
+    "AsyncRedisStorage",
+    "LogStorage",
 ]
@@ -10,10 +10,12 @@ installer: install or remove plugin.
 """
 
 import re
+import hmac
 import shutil
+import hashlib
 import tarfile
 import zipfile
-from os import remove
+from os import remove, unlink
 from os.path import join, abspath, isdir, isfile, basename
 from sys import executable
 from subprocess import call
@@ -29,13 +31,32 @@ from .utils import check_url
 class PluginInstaller(object):
     """plugin installer for installing a compressed local/remote plugin"""
 
-    def __init__(self, plugin_abspath, **kwargs):
+    #: The remote plugin package is downloaded by the chunks of the size
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, plugin_abspath, max_size=None, hash_name="sha256", **kwargs):
         """
         :param plugin_abspath: the absolute path to the plugin directory.
+
+        :param int max_size: the maximum bytes of a remote or uploaded
+                             plugin package, default is unlimited.
+
+        :param str hash_name: the hashlib algorithm of the checksum of
+                              a remote plugin package.
+
+        .. versionchanged:: 3.11.0
+            Add `max_size` and `hash_name` param.
         """
         self.plugin_abspath = plugin_abspath
         if not isdir(self.plugin_abspath):
             raise PluginError("Not Found Plugin Directory")
+        try:
+            self.max_size = int(max_size) if max_size else None
+        except (TypeError, ValueError):
+            raise PluginError("Invalid Max Size")
+        if self.max_size is not None and self.max_size < 0:
+            raise PluginError("Invalid Max Size")
+        self.hash_name = hash_name
 
     def __isValidTGZ(self, suffix):
         """To determine whether the suffix `.tar.gz` or `.tgz` format"""
@@ -126,7 +147,56 @@ class PluginInstaller(object):
         else:
             raise ZipError("Invalid Plugin Compressed File")
 
-    def _remote_download(self, url):
+    def __new_hash(self, checksum=None):
+        """Create the hash object of the checksum, it is like `algorithm:hex`
+        or `hex` by :attr:`hash_name`, return (hash, expected hex).
+        """
+        hash_name, expected = self.hash_name, None
+        if checksum:
+            if not isinstance(checksum, string_types):
+                raise InstallError("Invalid Checksum")
+            if ":" in checksum:
+                hash_name, expected = checksum.split(":", 1)
+            else:
+                expected = checksum
+            expected = expected.strip().lower()
+            if not expected:
+                raise InstallError("Invalid Checksum")
+        try:
+            return hashlib.new(hash_name), expected
+        except (TypeError, ValueError):
+            raise InstallError("Invalid Checksum Algorithm")
+
+    def _save_stream(self, f, fp, length=None, checksum=None):
+        """Stream the file-like object f to the file fp by chunks, hash the
+        data and limit the size by :attr:`max_size` on the fly.
+
+        :param length: the size announced by the sender, if known
+        :param checksum: the expected checksum, like `sha256:hex` or `hex`
+        :returns: the checksum of the data, like `sha256:hex`
+        :raises InstallError: the data is too large or does not match
+
+        .. versionadded:: 3.11.0
+        """
+        h, expected = self.__new_hash(checksum)
+        if self.max_size and length and int(length) > self.max_size:
+            raise InstallError("Plugin Package Too Large")
+        size = 0
+        while True:
+            chunk = f.read(self.CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if self.max_size and size > self.max_size:
+                raise InstallError("Plugin Package Too Large")
+            h.update(chunk)
+            fp.write(chunk)
+        digest = h.hexdigest()
+        if expected and not hmac.compare_digest(digest, expected):
+            raise InstallError("Checksum Mismatch")
+        return "%s:%s" % (h.name, digest)
+
+    def _remote_download(self, url, checksum=None):
         """To download the remote plugin package,
         there are four methods of setting filename according to priority,
         each of which stops setting when a qualified filename is obtained,
@@ -137,6 +207,14 @@ class PluginInstaller(object):
         2. The file name is resolved in the url, eg: http://x.com/p-v0.0.1.tgz
         3. Parse the Content-Disposition in the return header
         4. Parse the Content-Type in the return header
+
+        The package is streamed to a temporary file by chunks, its size is
+        limited by `max_size`, it is unpacked only if it matches `checksum`.
+
+        :returns: the checksum of the package, like `sha256:hex`
+
+        .. versionchanged:: 3.11.0
+            Stream the package, add `checksum` param.
         """
         #: Try to set filename in advance based on the previous two steps
         if check_url(url):
@@ -159,8 +237,16 @@ class PluginInstaller(object):
                     with NamedTemporaryFile(
                         mode="w+b", prefix="fpk-", suffix=suffix, delete=False
                     ) as fp:
-                        fp.write(f.read())
                         filename = fp.name
+                        length = f.getheader("Content-Length")
+                        if not (length and length.isdigit()):
+                            length = None
+                        try:
+                            digest = self._save_stream(f, fp, length, checksum)
+                        except BaseException:
+                            fp.close()
+                            remove(filename)
+                            raise
                     try:
                         if self.__isValidTGZ(suffix):
                             self.__unpack_tgz(filename)
@@ -168,6 +254,7 @@ class PluginInstaller(object):
                             self.__unpack_zip(filename)
                     finally:
                         remove(filename)
+                    return digest
                 else:
                     raise InstallError("Invalid Filename")
             finally:
@@ -188,8 +275,9 @@ class PluginInstaller(object):
                     else:
                         self.__unpack_zip(abspath(filepath))
                 finally:
+                    #: the param shadows :func:`os.remove`
                     if remove is True:
-                        remove(filepath)
+                        unlink(filepath)
             else:
                 raise InstallError("Invalid Filename")
         else:
@@ -229,6 +317,9 @@ class PluginInstaller(object):
         :param url: for method is remote,
                     plugin can be downloaded from the address.
 
+        :param checksum: for method is remote, the expected checksum of
+                         the package, like `sha256:hex` or `hex`.
+
         :param filepath: for method is local, plugin local absolute path
 
         :param remove: for method is local, remove the plugin source code
@@ -237,15 +328,23 @@ class PluginInstaller(object):
         :param package_or_url: for method is pip, pypi's package or VCS url.
 
         :returns: the result of adding the plugin, like {msg:str, code:int},
-                  code=0 is successful.
+                  code=0 is successful, for method is remote, the checksum
+                  of the package is added, like {checksum:str}.
 
         .. versionchanged:: 3.3.0
             Add pip method, with package_or_url param.
+
+        .. versionchanged:: 3.11.0
+            Add checksum param.
         """
         res = dict(code=1, msg=None)
         try:
             if method == "remote":
-                self._remote_download(kwargs["url"])
+                res.update(
+                    checksum=self._remote_download(
+                        kwargs["url"], kwargs.get("checksum")
+                    )
+                )
             elif method == "local":
                 self._local_upload(kwargs["filepath"], kwargs.get("remove", False))
             elif method == "pip":  # pragma: nocover
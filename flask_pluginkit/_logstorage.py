@@ -0,0 +1,459 @@
+# -*- coding: utf-8 -*-
+"""
+flask_pluginkit._logstorage
+~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+logstorage: a local storage on an append-only log file.
+
+:copyright: (c) 2019 by staugur.
+:license: BSD 3-Clause, see LICENSE for more details.
+"""
+
+import os
+import mmap
+import pickle
+import struct
+import zlib
+from contextlib import contextmanager
+from os.path import abspath, dirname, join
+from tempfile import gettempdir, mkstemp
+from threading import RLock, Lock, Thread
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+from ._compat import iteritems, text_type
+from .exceptions import ParamError, PluginError
+from .utils import BaseStorage, BaseCodec
+
+#: The first bytes of a log file
+MAGIC = b"FPKLOG1\n"
+
+#: The record header: key length, value length, crc32 of key and value
+HEADER = struct.Struct("<III")
+
+#: The value length of a deleted key
+TOMBSTONE = 0xFFFFFFFF
+
+
+class LogStorage(BaseStorage):
+    """Local file system storage on an append-only log file.
+
+    Each `set` or `remove` appends a record to the file, an in-memory index
+    maps the keys to the offset of their last value, so a write does not
+    rewrite the file and a read does not scan it. The values are pickled,
+    and unpickled from the memory-mapped file without being copied.
+
+    Many processes can read the file while one writes at a time (an
+    exclusive `fcntl.flock` on the `.lock` sibling, the threads of a
+    process share a lock, on the platforms without fcntl only the threads
+    are serialized). Each call picks up the records appended by the other
+    processes. A torn record at the end of the file, left by a crash, is
+    ignored and cut by the next write.
+
+    The overwritten and removed values are garbage, when it is more than
+    `compact_ratio` of the file, a thread rewrites the live records to a
+    new file and replaces the log, the writes go on meanwhile. One process
+    compacts at a time (an exclusive `fcntl.flock` on the `.compact.lock`
+    sibling).
+
+    :param path: the log file, default is `flask_pluginkit_log` in the
+                 temporary directory.
+
+    :param codec: encode the values by the
+                  :class:`~flask_pluginkit.utils.BaseCodec` instead of pickle.
+
+    :param float compact_ratio: the ratio of garbage to compact in the
+                                background, 0 is disabled.
+
+    :param int compact_min_size: the minimum size in bytes of the file to
+                                 compact in the background.
+
+    :param bool fsync: fsync after each write.
+
+    .. versionadded:: 3.11.0
+    """
+
+    #: The default index, as the only key, you can override it.
+    DEFAULT_INDEX: str = "flask_pluginkit_log"
+
+    #: The namespace is a sibling file
+    NAMESPACE_FORMAT: str = "%s.%s"
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        codec: Optional[BaseCodec] = None,
+        compact_ratio: float = 0.5,
+        compact_min_size: int = 1024 * 1024,
+        fsync: bool = False,
+    ):
+        if not 0 <= compact_ratio < 1:
+            raise ParamError("Invalid compact_ratio")
+        self.COVERED_INDEX = path or join(gettempdir(), self.DEFAULT_INDEX)
+        self.codec = codec
+        self.compact_ratio = compact_ratio
+        self.compact_min_size = compact_min_size
+        self.fsync = fsync
+        #: like {key: (record offset, record size, value offset, value size)}
+        self._index: Dict[str, Tuple[int, int, int, int]] = {}
+        self._lock = RLock()
+        self._compact_lock = Lock()
+        self._compactor: Optional[Thread] = None
+        self._fd: Optional[int] = None
+        self._lock_fd: Optional[int] = None
+        self._map: Optional[mmap.mmap] = None
+        self._flocked = 0
+        self._pid = os.getpid()
+        self._ino = 0
+        self._end = 0
+        self._garbage = 0
+
+    @property
+    def path(self) -> str:
+        return abspath(self.index)
+
+    def _clone(self, index: str) -> "LogStorage":
+        return self.__class__(
+            index,
+            self.codec,
+            self.compact_ratio,
+            self.compact_min_size,
+            self.fsync,
+        )
+
+    def _open(self):
+        """Open the file or reopen it after it is replaced by a compaction"""
+        self._close_files()
+        if self._lock_fd is None:
+            self._lock_fd = os.open(self.path + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        if os.fstat(fd).st_size == 0:
+            with self._flock():
+                if os.fstat(fd).st_size == 0:
+                    os.write(fd, MAGIC)
+        self._fd = fd
+        self._ino = os.fstat(fd).st_ino
+        self._index = {}
+        self._end = len(MAGIC)
+        self._garbage = 0
+        self._remap()
+        if self._map is None or self._map[: len(MAGIC)] != MAGIC:
+            raise PluginError("%s is not a log storage file" % self.path)
+        self._end = self._scan(self._end)
+
+    def _close_files(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _remap(self):
+        size = os.fstat(self._fd).st_size
+        if self._map is not None:
+            if len(self._map) == size:
+                return
+            self._map.close()
+            self._map = None
+        if size:
+            self._map = mmap.mmap(self._fd, size, access=mmap.ACCESS_READ)
+
+    def _scan(self, pos: int) -> int:
+        """Index the records from pos, stop at the end or a torn record,
+        return the end of the last complete record.
+        """
+        data = self._map
+        size = len(data) if data is not None else 0
+        index = self._index
+        while pos + HEADER.size <= size:
+            klen, vlen, crc = HEADER.unpack_from(data, pos)
+            vsize = 0 if vlen == TOMBSTONE else vlen
+            koff = pos + HEADER.size
+            end = koff + klen + vsize
+            if end > size:
+                break
+            with memoryview(data)[koff:end] as body:
+                if zlib.crc32(body) != crc:
+                    break
+                key = str(body[:klen], "utf-8")
+            old = index.pop(key, None)
+            if old is not None:
+                self._garbage += old[1]
+            if vlen == TOMBSTONE:
+                self._garbage += end - pos
+            else:
+                index[key] = (pos, end - pos, koff + klen, vlen)
+            pos = end
+        return pos
+
+    def _refresh(self):
+        """Pick up the records appended or the compaction by others"""
+        if self._fd is None:
+            self._open()
+            return
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            st = None
+        if st is None or st.st_ino != self._ino:
+            self._open()
+        elif st.st_size > self._end:
+            self._remap()
+            self._end = self._scan(self._end)
+
+    def _after_fork(self):
+        """The flock is shared with the parent by the inherited descriptor,
+        close them in the child and open its own.
+        """
+        self._pid = os.getpid()
+        self._lock = RLock()
+        self._compact_lock = Lock()
+        self._compactor = None
+        self._flocked = 0
+        self._close_files()
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    @contextmanager
+    def _flock(self):
+        if fcntl is None or self._flocked:
+            #: already locked by the thread holding self._lock
+            self._flocked += 1
+            try:
+                yield
+            finally:
+                self._flocked -= 1
+            return
+        fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+        self._flocked += 1
+        try:
+            yield
+        finally:
+            self._flocked -= 1
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    @contextmanager
+    def _reading(self):
+        if self._pid != os.getpid():
+            self._after_fork()
+        with self._lock:
+            self._refresh()
+            yield
+
+    @contextmanager
+    def _writing(self):
+        if self._pid != os.getpid():
+            self._after_fork()
+        with self._lock:
+            if self._fd is None:
+                self._open()
+            with self._flock():
+                self._refresh()
+                if os.fstat(self._fd).st_size > self._end:
+                    #: cut the torn record
+                    os.ftruncate(self._fd, self._end)
+                    self._remap()
+                yield
+        self._maybe_compact()
+
+    def _key(self, key: str) -> bytes:
+        if not isinstance(key, text_type):
+            key = key.decode("utf-8")
+        return key.encode("utf-8")
+
+    def _encode(self, value: Any) -> bytes:
+        if self.codec is None:
+            return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        data = self.codec.encode(value)
+        return data.encode("utf-8") if isinstance(data, text_type) else data
+
+    def _append(self, records):
+        """Append the records of (key bytes, value bytes or None) by one write"""
+        chunks = []
+        for key, value in records:
+            body = key + (value or b"")
+            vlen = TOMBSTONE if value is None else len(value)
+            chunks.append(HEADER.pack(len(key), vlen, zlib.crc32(body)))
+            chunks.append(body)
+        data = b"".join(chunks)
+        os.lseek(self._fd, self._end, os.SEEK_SET)
+        os.write(self._fd, data)
+        if self.fsync:
+            os.fsync(self._fd)
+        self._remap()
+        self._end = self._scan(self._end)
+
+    def _value(self, entry: Tuple[int, int, int, int]) -> Any:
+        _, _, offset, size = entry
+        with memoryview(self._map)[offset : offset + size] as data:
+            if self.codec is None:
+                return pickle.loads(data)
+            return self.codec.decode(bytes(data))
+
+    @property
+    def list(self) -> Dict[str, Any]:
+        """list all data"""
+        return dict(self.scan())
+
+    def scan(self):
+        """Iterate over the (key, value) in the order of the index"""
+        with self._reading():
+            entries = list(iteritems(self._index))
+            mapped = self._map
+        for key, entry in entries:
+            with self._lock:
+                if self._map is not mapped:
+                    #: the file is replaced, read the current entry
+                    entry = self._index.get(key)
+                    if entry is None:
+                        continue
+                value = self._value(entry)
+            yield key, value
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Get the value of key"""
+        key = self._key(key).decode("utf-8")
+        with self._reading():
+            entry = self._index.get(key)
+            return default if entry is None else self._value(entry)
+
+    def set(self, key: str, value: Any):
+        """Append the value of key"""
+        record = (self._key(key), self._encode(value))
+        with self._writing():
+            self._append([record])
+
+    def setmany(self, **mapping: Any):
+        """Append more data by one write"""
+        records = [(self._key(k), self._encode(v)) for k, v in iteritems(mapping)]
+        if records:
+            with self._writing():
+                self._append(records)
+
+    def remove(self, key: str):
+        """Remove the key
+
+        :raises KeyError: the key does not exist
+        """
+        key = self._key(key)
+        with self._writing():
+            if key.decode("utf-8") not in self._index:
+                raise KeyError(key.decode("utf-8"))
+            self._append([(key, None)])
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Get the statistics, look like {keys=, size=, garbage=}"""
+        with self._reading():
+            return dict(keys=len(self._index), size=self._end, garbage=self._garbage)
+
+    def _maybe_compact(self):
+        if (
+            not self.compact_ratio
+            or self._end < self.compact_min_size
+            or self._garbage < self._end * self.compact_ratio
+            or (self._compactor is not None and self._compactor.is_alive())
+        ):
+            return
+        self._compactor = Thread(target=self.compact, name="pluginkit-compactor")
+        self._compactor.daemon = True
+        self._compactor.start()
+
+    @contextmanager
+    def _compacting(self):
+        """Yield True if this thread is the only one compacting the file,
+        across the threads and the processes.
+        """
+        if not self._compact_lock.acquire(blocking=False):
+            yield False
+            return
+        try:
+            if fcntl is None:
+                yield True
+                return
+            fd = os.open(self.path + ".compact.lock", os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except (BlockingIOError, PermissionError):
+                    yield False
+                    return
+                yield True
+            finally:
+                #: closing the descriptor releases the flock
+                os.close(fd)
+        finally:
+            self._compact_lock.release()
+
+    def compact(self) -> bool:
+        """Rewrite the live records to a new file and replace the log,
+        the records appended meanwhile are copied at the end.
+
+        :returns: False if another thread or process is compacting the file,
+                  or the file was replaced by another process meanwhile.
+        """
+        with self._compacting() as compacting:
+            if not compacting:
+                return False
+            with self._reading():
+                ino, end = self._ino, self._end
+                entries = sorted(self._index.values())
+                #: the records before end never change, read them by a
+                #: private descriptor without holding the lock
+                src = os.open(self.path, os.O_RDONLY)
+            tmpfd, tmp = mkstemp(prefix=".compact-", dir=dirname(self.path))
+            try:
+                st = os.fstat(src)
+                if st.st_ino != ino:
+                    return False
+                os.fchmod(tmpfd, st.st_mode & 0o777)
+                with os.fdopen(tmpfd, "wb") as fp:
+                    tmpfd = None
+                    fp.write(MAGIC)
+                    for offset, size, _, _ in entries:
+                        os.lseek(src, offset, os.SEEK_SET)
+                        fp.write(os.read(src, size))
+                    with self._writing():
+                        if self._ino != ino:
+                            return False
+                        if self._end > end:
+                            with memoryview(self._map)[end : self._end] as tail:
+                                fp.write(tail)
+                        fp.flush()
+                        if self.fsync:
+                            os.fsync(fp.fileno())
+                        os.replace(tmp, self.path)
+                        tmp = None
+                        self._open()
+                return True
+            finally:
+                os.close(src)
+                if tmpfd is not None:
+                    os.close(tmpfd)
+                if tmp is not None:
+                    os.remove(tmp)
+
+    def close(self):
+        """Close the file, it is reopened on the next call"""
+        if self._compactor is not None:
+            self._compactor.join()
+        with self._lock:
+            self._close_files()
+            if self._lock_fd is not None:
+                os.close(self._lock_fd)
+                self._lock_fd = None
+
+    def __contains__(self, key: str) -> bool:
+        key = self._key(key).decode("utf-8")
+        with self._reading():
+            return key in self._index
+
+    def __len__(self):
+        with self._reading():
+            return len(self._index)
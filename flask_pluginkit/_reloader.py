@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+flask_pluginkit._reloader
+~~~~~~~~~~~~~~~~~~~~~~~~~
+
+reloader: restart the workers of gunicorn or uWSGI in rolling batches.
+
+:copyright: (c) 2019 by staugur.
+:license: BSD 3-Clause, see LICENSE for more details.
+"""
+
+import os
+import signal
+import threading
+from time import sleep, time
+from typing import Callable, List, Optional
+
+from ._compat import urllib2
+from .exceptions import PluginError
+
+
+class RollingReloader(object):
+    """Restart the workers of a master process (gunicorn or uWSGI) in rolling
+    batches, the master respawns a worker when it exits, the next batch is
+    restarted only when the respawned workers are healthy, so the capacity
+    never drops to zero.
+
+    The worker that runs the reloader is restarted in the last batch.
+
+    :param int master_pid: the pid of gunicorn or uWSGI master
+
+    :param int worker_signal: the signal to gracefully stop a worker,
+                              gunicorn is SIGTERM, uWSGI is SIGHUP.
+
+    :param int batch_size: the number of workers restarted at a time,
+                           it is limited to leave at least one worker serving.
+
+    :param float warmup: a new worker is healthy after running for
+                         the seconds, and passing the `probe`.
+
+    :param float timeout: the maximum seconds to wait for a batch.
+
+    :param probe: an optional health check, look like probe(psutil.Process)
+
+    :param report: receive the progress messages, look like report(msg)
+
+    :raises PluginError: the psutil module is not installed
+
+    .. versionadded:: 3.11.0
+    """
+
+    def __init__(
+        self,
+        master_pid: int,
+        worker_signal: int = signal.SIGTERM,
+        batch_size: int = 1,
+        warmup: float = 1,
+        timeout: float = 30,
+        probe: Optional[Callable] = None,
+        report: Optional[Callable[[str], None]] = None,
+        interval: float = 0.1,
+    ):
+        try:
+            import psutil
+        except ImportError:
+            raise PluginError("No dependent modules(psutil) installed")
+        self._psutil = psutil
+        self.master = psutil.Process(master_pid)
+        self.worker_signal = worker_signal
+        self.batch_size = max(1, int(batch_size))
+        self.warmup = warmup
+        self.timeout = timeout
+        self.probe = probe
+        self.report = report or (lambda msg: None)
+        self.interval = interval
+        #: The minimum number of alive workers observed during the reload
+        self.min_workers: Optional[int] = None
+
+    def workers(self) -> List:
+        """Get the alive worker processes of master"""
+        workers = []
+        for p in self.master.children():
+            try:
+                if p.status() != self._psutil.STATUS_ZOMBIE:
+                    workers.append(p)
+            except self._psutil.Error:
+                continue
+        return workers
+
+    def is_healthy(self, worker) -> bool:
+        try:
+            if not worker.is_running() or time() - worker.create_time() < self.warmup:
+                return False
+        except self._psutil.Error:
+            return False
+        return self.probe(worker) if self.probe else True
+
+    def _wait(self, old_pids, signaled, restarted: int) -> bool:
+        """Wait until the signaled workers have exited and the same number
+        of new workers are healthy.
+        """
+        deadline = time() + self.timeout
+        while time() < deadline:
+            workers = self.workers()
+            new = [w for w in workers if w.pid not in old_pids and self.is_healthy(w)]
+            serving = len(new) + len(
+                [w for w in workers if w.pid in old_pids and w.pid not in signaled]
+            )
+            if self.min_workers is None or serving < self.min_workers:
+                self.min_workers = serving
+            if len(new) >= restarted and not any(w.pid in signaled for w in workers):
+                return True
+            sleep(self.interval)
+        return False
+
+    def run(self) -> bool:
+        """Restart all workers, return False if a batch is not healthy
+        in time, then the remaining workers are not restarted.
+        """
+        current = os.getpid()
+        old = sorted(self.workers(), key=lambda w: w.pid == current)
+        total = len(old)
+        if total == 0:
+            self.report("No worker found")
+            return False
+        if total == 1:
+            #: a single worker can not be restarted without downtime,
+            #: let the master reload gracefully
+            self.report("Only one worker, reload the master")
+            os.kill(self.master.pid, signal.SIGHUP)
+            return True
+        batch_size = min(self.batch_size, total - 1)
+        old_pids = {w.pid for w in old}
+        signaled = set()
+        for i in range(0, total, batch_size):
+            batch = old[i : i + batch_size]
+            if any(w.pid == current for w in batch):
+                #: this worker is going to exit, report before that
+                self.report("Reload is successful")
+            for w in batch:
+                try:
+                    w.send_signal(self.worker_signal)
+                except self._psutil.Error:
+                    pass
+                signaled.add(w.pid)
+            if current in signaled:
+                return True
+            if not self._wait(old_pids, signaled, len(signaled)):
+                self.report(
+                    "Reload stopped, the workers are not healthy in %ss" % self.timeout
+                )
+                return False
+            self.report("Reloaded %d/%d workers" % (len(signaled), total))
+        self.report("Reload is successful")
+        return True
+
+    def start(self) -> threading.Thread:
+        """Run in a daemon thread"""
+        t = threading.Thread(target=self.run, name="pluginkit-reloader")
+        t.daemon = True
+        t.start()
+        return t
+
+
+def http_probe(url: str, timeout: float = 2) -> Callable:
+    """Create a probe of :class:`RollingReloader`, the worker is healthy
+    if the url answers a 2xx status, e.g. a health check view that needs
+    the application loaded.
+
+    The workers of gunicorn or uWSGI share the listening socket, the url
+    is answered by any worker, so it checks the service, not the worker
+    being probed.
+
+    .. versionadded:: 3.11.0
+    """
+
+    def probe(worker) -> bool:
+        try:
+            resp = urllib2.urlopen(url, timeout=timeout)
+        except Exception:
+            return False
+        try:
+            return 200 <= resp.getcode() < 300
+        finally:
+            resp.close()
+
+    return probe
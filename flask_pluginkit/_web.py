@@ -9,10 +9,20 @@ The server-side plugin management blueprint.
 :license: BSD 3-Clause, see LICENSE for more details.
 """
 
+import os
+import json
+import atexit
 import _thread as thread
-from time import sleep
 from collections import OrderedDict, deque
+from contextlib import contextmanager
+from os.path import join
 from tempfile import NamedTemporaryFile
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
 
 from werkzeug.utils import secure_filename
 from flask import (
@@ -26,8 +36,10 @@ from flask import (
     Response,
 )
 
-from .utils import allowed_uploaded_plugin_suffix, check_url
+from .utils import allowed_uploaded_plugin_suffix, check_url, private_tempdir
+from .exceptions import InstallError
 from ._installer import PluginInstaller
+from ._reloader import RollingReloader, http_probe
 
 
 #: Blueprint instance for managing plugins
@@ -40,10 +52,114 @@ blueprint = Blueprint(
     static_folder="static",
 )
 
+
+class _SharedQueue(object):
+    """A FIFO message queue shared by the workers of a master process
+    (gunicorn or uWSGI) on one host, it is a file named by the master pid
+    in the :func:`~flask_pluginkit.utils.private_tempdir`, so a message
+    reported by a worker can be read by any worker, even after the reporting
+    worker is restarted. The file is removed when a process exits and the
+    queue is empty, the broken lines are skipped.
+
+    On the platforms without fcntl, or if the private directory is not
+    available, it is a queue of the current process.
+
+    .. versionadded:: 3.11.0
+    """
+
+    def __init__(self, name: str = "flask_pluginkit_msg"):
+        self.name = name
+        self._local: deque = deque()
+        self._atexit = False
+
+    @property
+    def path(self) -> Optional[str]:
+        """The queue file, None if the queue is not shared"""
+        if fcntl is None:
+            return None
+        try:
+            return join(private_tempdir(), "%s.%d" % (self.name, os.getppid()))
+        except OSError:
+            return None
+
+    @contextmanager
+    def _locked(self, path: str):
+        if not self._atexit:
+            self._atexit = True
+            atexit.register(self.cleanup)
+        while True:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            #: the file was removed by :meth:`cleanup` while waiting
+            if os.fstat(fd).st_nlink:
+                break
+            os.close(fd)
+        try:
+            with os.fdopen(
+                fd, "r+", encoding="utf-8", errors="replace", closefd=False
+            ) as fp:
+                yield fp
+        finally:
+            #: closing the descriptor releases the flock
+            os.close(fd)
+
+    def append(self, msg: str):
+        path = self.path
+        if path is None:
+            self._local.append(msg)
+            return
+        with self._locked(path) as fp:
+            fp.seek(0, os.SEEK_END)
+            fp.write(json.dumps(msg) + "\n")
+
+    def popleft(self) -> str:
+        """Pop the oldest message
+
+        :raises IndexError: the queue is empty
+        """
+        path = self.path
+        if path is None:
+            return self._local.popleft()
+        with self._locked(path) as fp:
+            lines = fp.readlines()
+            msg = None
+            while lines:
+                line = lines.pop(0)
+                try:
+                    msg = json.loads(line)
+                except ValueError:
+                    #: a line written partly, e.g. by a killed worker
+                    continue
+                if isinstance(msg, str):
+                    break
+                msg = None
+            fp.seek(0)
+            fp.writelines(lines)
+            fp.truncate()
+        if msg is None:
+            raise IndexError("pop from an empty queue")
+        return msg
+
+    def cleanup(self):
+        """Remove the queue file if it is empty"""
+        path = self.path
+        if path is None or not os.path.exists(path):
+            return
+        try:
+            with self._locked(path) as fp:
+                if not fp.read(1):
+                    os.remove(path)
+        except OSError:
+            pass
+
+
 #: FIFO message queue
 #:
 #: ..versionadded:: 3.3.0
-_queue = deque()
+#:
+#: ..versionchanged:: 3.11.0
+#:     Shared by the workers, see :class:`_SharedQueue`
+_queue = _SharedQueue()
 
 
 def _get_conf(config_name):
@@ -185,9 +301,18 @@ def api():
                     PLUGINKIT_GUNICORN_ENABLED=True
                 - for uWSGI
                     PLUGINKIT_UWSGI_ENABLED=True
+            Optional current_app.config:
+                PLUGINKIT_RELOAD_BATCH_SIZE=1
+                PLUGINKIT_RELOAD_TIMEOUT=30
+                PLUGINKIT_RELOAD_WARMUP=1
+                PLUGINKIT_RELOAD_PROBE=None, a callable(psutil.Process)
+                    or a health check url
+
+            .. versionchanged:: 3.11.0
+                The workers are restarted in rolling batches,
+                the progress is sent to the message queue.
             """
             try:
-                import os
                 import signal
                 import psutil
             except ImportError:
@@ -202,18 +327,29 @@ def api():
                 pid = os.getppid()
                 p = psutil.Process(pid)
 
-                def reload(pid):
-                    """reload gunicorn or uwsgi"""
-                    sleep(3)
-                    os.kill(pid, signal.SIGHUP)
+                def reload(pid, worker_signal):
+                    """reload gunicorn or uwsgi workers in rolling batches"""
+                    probe = _get_conf("PLUGINKIT_RELOAD_PROBE")
+                    if probe and not callable(probe):
+                        probe = http_probe(probe)
+                    warmup = _get_conf("PLUGINKIT_RELOAD_WARMUP")
+                    RollingReloader(
+                        pid,
+                        worker_signal,
+                        batch_size=_get_conf("PLUGINKIT_RELOAD_BATCH_SIZE") or 1,
+                        warmup=1 if warmup is None else warmup,
+                        timeout=_get_conf("PLUGINKIT_RELOAD_TIMEOUT") or 30,
+                        probe=probe or None,
+                        report=_queue.append,
+                    ).start()
 
                 if (
                     ENV == "production"
                     and GUNICORN_ENABLED is True
                     and p.name() == "gunicorn: master [%s]" % PROCESSNAME
                 ):
-                    #: reload gunicorn
-                    thread.start_new_thread(reload, (pid,))
+                    #: reload gunicorn, the worker exits on SIGTERM gracefully
+                    reload(pid, signal.SIGTERM)
                     res.update(code=0)
 
                 elif (
@@ -221,8 +357,8 @@ def api():
                     and UWSGI_ENABLED is True
                     and p.name() == (PROCESSNAME or "uwsgi")
                 ):
-                    #: reload uwsgi
-                    thread.start_new_thread(reload, (pid,))
+                    #: reload uwsgi, the worker exits on SIGHUP gracefully
+                    reload(pid, signal.SIGHUP)
                     res.update(code=0)
 
                 else:
@@ -234,21 +370,38 @@ def api():
             f = request.files.get("file")
             if f and allowed_uploaded_plugin_suffix(f.filename):
                 suffix = "." + secure_filename(f.filename).split(".")[-1]
+                #: the maximum size by PLUGINKIT_INSTALL_MAX_SIZE as well
+                pi = PluginInstaller(
+                    pm.plugins_abspath, max_size=_get_conf("PLUGINKIT_INSTALL_MAX_SIZE")
+                )
                 with NamedTemporaryFile(
                     mode="w+b", prefix="fpk-web-", suffix=suffix, delete=False
                 ) as fp:
-                    fp.write(f.stream.read())
                     filename = fp.name
-                pi = PluginInstaller(pm.plugins_abspath)
-                res = pi.addPlugin(method="local", filepath=filename, remove=True)
+                    try:
+                        pi._save_stream(f.stream, fp, f.content_length or None)
+                    except InstallError as e:
+                        res.update(msg=str(e))
+                if res["msg"]:
+                    os.remove(filename)
+                else:
+                    res = pi.addPlugin(method="local", filepath=filename, remove=True)
             else:
                 msg = "Unsuccessfully obtained file or format is not allowed"
                 res.update(code=50000, msg=msg)
         elif Action == "downloadPlugin":
             url = request.form.get("url")
             if check_url(url):
-                pi = PluginInstaller(pm.plugins_abspath)
-                res = pi.addPlugin(method="remote", url=url)
+                #: the optional checksum, and the maximum size by
+                #: PLUGINKIT_INSTALL_MAX_SIZE of current_app.config
+                pi = PluginInstaller(
+                    pm.plugins_abspath, max_size=_get_conf("PLUGINKIT_INSTALL_MAX_SIZE")
+                )
+                res = pi.addPlugin(
+                    method="remote",
+                    url=url,
+                    checksum=request.form.get("checksum") or None,
+                )
             else:
                 res.update(code=60000, msg="Please fill in the correct URL")
         elif Action == "installPackage":
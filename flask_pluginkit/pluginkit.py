@@ -9,42 +9,300 @@ Load and run plugins.
 :license: BSD 3-Clause, see LICENSE for more details.
 """
 
+import re
+import sys
 import logging
-from time import time
-from itertools import chain
-from os import getcwd, listdir, remove
-from os.path import join, dirname, abspath, isdir, isfile, splitext
-from typing import Optional, Dict, Union, Any, Sequence, List, Callable
+import posixpath
+from time import time, perf_counter, monotonic
+from uuid import uuid4
+from threading import RLock
+from contextlib import contextmanager
+from importlib.util import find_spec
+from concurrent.futures import ThreadPoolExecutor
+from copy import copy
+from types import MappingProxyType
+from weakref import WeakKeyDictionary
+from os import getcwd, listdir, remove, walk
+from os.path import join, dirname, abspath, isdir, isfile, splitext, relpath
+from mimetypes import guess_type
+from typing import Optional, Dict, Union, Any, Sequence, List, Callable, Tuple
 
 from flask import (
     Flask,
     Blueprint,
     render_template,
-    render_template_string,
     send_from_directory,
     abort,
     url_for,
     current_app,
+    request,
+    has_request_context,
 )
 from markupsafe import Markup
-from jinja2 import ChoiceLoader, FileSystemLoader
+from werkzeug.security import safe_join
+from werkzeug.exceptions import HTTPException
+from jinja2 import ChoiceLoader, FileSystemLoader, Template
 
 from .utils import (
     isValidPrefix,
     isValidSemver,
     Attribution,
     DcpManager,
+    BaseStorage,
+    LazyPlugin,
+    LRUCache,
+    hash_file,
+    hash_data,
     pip_install,
-    pip_list,
+    installed_packages,
+    canonical_name,
     is_match_version_req,
+    parse_plugin_meta,
+    PluginManifest,
+    file_stamp,
+    private_tempdir,
     egg_pat,
 )
-from ._compat import string_types, iteritems, text_type
+from ._compat import string_types, iteritems, itervalues, text_type
 from .exceptions import PluginError, VersionError, PEPError, TemplateNotFound
 
 
 META = Dict[str, Union[None, str, list, dict]]
 
+#: The prebuilt compressed siblings of the static files, in preferred order
+PRECOMPRESSED_ENCODINGS = {"br": ".br", "gzip": ".gz"}
+PRECOMPRESSED_SUFFIXES = tuple(PRECOMPRESSED_ENCODINGS.values())
+
+#: The length of the content hash in the static file url
+FINGERPRINT_LENGTH = 12
+
+#: The max number of the memoized :meth:`PluginManager.emit_assets` results
+#: per app, the least recently used ones are evicted
+ASSETS_MEMO_SIZE = 1024
+
+#: The max-age of the fingerprinted static files, one year
+IMMUTABLE_MAX_AGE = 31536000
+
+#: The allowed suffixes of the static bundles
+BUNDLE_SUFFIXES = (".css", ".js")
+
+#: The url() references and the @import, @charset rules of the bundled css
+CSS_URL_RE = re.compile(rb"""url\(\s*(['"]?)([^'"()\s]+)\1\s*\)""")
+CSS_IMPORT_RE = re.compile(rb"""@import\s+(url\([^)]*\)|"[^"]*"|'[^']*')[^;]*;\s*""")
+CSS_CHARSET_RE = re.compile(rb"""@charset\s+(?:"[^"]*"|'[^']*')\s*;\s*""")
+CSS_ABSOLUTE_URL_RE = re.compile(rb"^(?:[a-zA-Z][a-zA-Z0-9+.-]*:|/|#)")
+
+#: The storage key of the version of the plugin states shared by workers,
+#: and the key of the state of each plugin
+STATE_SYNC_KEY = "pluginkit:plugin_states"
+STATE_SYNC_PLUGIN_KEY = "pluginkit:plugin_state:%s"
+
+
+def _rebase_css_url(url: bytes, base: str) -> bytes:
+    """Rebase a relative url of a plugin css file to the bundle url,
+    which is `<static_url_path>/_bundles/<name>`, base is the directory
+    of the css file like `<plugin_name>/css/`.
+    """
+    if CSS_ABSOLUTE_URL_RE.match(url):
+        return url
+    return b"../" + posixpath.normpath(base + url.decode("utf-8")).encode("utf-8")
+
+
+def _rebase_css(content: bytes, base: str) -> Tuple[List[bytes], bytes]:
+    """Prepare a plugin css file for a bundle, the relative url() are
+    rebased, the @charset rules are removed and the @import rules are
+    returned apart, they must precede all other rules of the bundle.
+
+    :returns: ([import rule], the rest content)
+    """
+
+    def rebase_url(m):
+        quote = m.group(1)
+        return b"url(%s%s%s)" % (quote, _rebase_css_url(m.group(2), base), quote)
+
+    def rebase_import(m):
+        target = m.group(1)
+        if target[:1] in (b'"', b"'"):
+            target = target[:1] + _rebase_css_url(target[1:-1], base) + target[:1]
+        else:
+            target = CSS_URL_RE.sub(rebase_url, target)
+        imports.append(m.group(0).replace(m.group(1), target, 1).rstrip() + b"\n")
+        return b""
+
+    imports: List[bytes] = []
+    content = CSS_CHARSET_RE.sub(b"", content)
+    content = CSS_IMPORT_RE.sub(rebase_import, content)
+    return imports, CSS_URL_RE.sub(rebase_url, content)
+
+
+class PluginRegistry(object):
+    """An immutable snapshot of all plugins and the extension points
+    of the enabled plugins.
+
+    It is compiled once by :class:`PluginManager` after the plugins are
+    loaded, it is :attr:`PluginManager.registry` and the ``get_enabled_*``
+    properties return the list or dict copies of it, the manager swaps in
+    a new registry only when the plugin state really changes.
+    Sequences are tuples and mappings are read-only proxies.
+
+    .. versionadded:: 3.11.0
+    """
+
+    __slots__ = (
+        "plugins",
+        "by_name",
+        "by_package",
+        "enabled_plugins",
+        "enabled_names",
+        "disabled_modules",
+        "tpl_paths",
+        "teps",
+        "tep_entries",
+        "tep_caches",
+        "heps",
+        "beps",
+        "veps",
+        "cveps",
+        "filters",
+        "errhandlers",
+        "tcps",
+        "tcp_context",
+    )
+
+    def __init__(
+        self,
+        plugins: Sequence[META],
+        hooks: Sequence[str],
+        stpl_reverse: Optional[bool] = None,
+    ):
+        enabled = tuple(p for p in plugins if p.plugin_state == "enabled")
+        set_ = self.__set
+        set_("plugins", tuple(plugins))
+        #: The first plugin wins if the names are duplicated
+        by_name: Dict[str, META] = {}
+        by_package: Dict[str, META] = {}
+        for p in plugins:
+            by_name.setdefault(p.plugin_name, p)
+            by_package.setdefault(p.plugin_package_name, p)
+        set_("by_name", MappingProxyType(by_name))
+        set_("by_package", MappingProxyType(by_package))
+        set_("enabled_plugins", enabled)
+        set_("enabled_names", frozenset(p.plugin_name for p in enabled))
+        #: The module names of disabled plugins, their dcp callbacks are muted
+        set_(
+            "disabled_modules",
+            tuple(
+                self.module_name(p)
+                for p in plugins
+                if p.plugin_state != "enabled" and self.module_name(p)
+            ),
+        )
+        set_(
+            "tpl_paths",
+            tuple(p.plugin_tpl_path for p in enabled if isdir(p.plugin_tpl_path)),
+        )
+
+        #: like {tep_name: dict(fil=[(plugin_name, tpl)], cod=[(plugin_name, code)])}
+        teps: Dict[str, Dict[str, list]] = {}
+        for p in enabled:
+            for e, v in iteritems(p.plugin_tep):
+                tep = teps.setdefault(e, dict(fil=[], cod=[]))
+                for f, s in iteritems(v):
+                    if f in tep:
+                        tep[f].append((p.plugin_name, s))
+        set_(
+            "teps",
+            MappingProxyType(
+                {
+                    e: MappingProxyType(
+                        {f: tuple(s for _, s in items) for f, items in iteritems(v)}
+                    )
+                    for e, v in iteritems(teps)
+                }
+            ),
+        )
+        #: The template sorting is done here once, emit_tep renders in order
+        if stpl_reverse is not None:
+            for tep in itervalues(teps):
+                for f, items in iteritems(tep):
+                    items = sorted(
+                        items,
+                        key=lambda x: self.tep_priority(x[1]),
+                        reverse=stpl_reverse,
+                    )
+                    tep[f] = [(n, tpl.split("@")[-1]) for n, tpl in items]
+        set_(
+            "tep_caches",
+            MappingProxyType(
+                {
+                    (p.plugin_name, e): (v["cache"]["ttl"], v["cache"]["keys"])
+                    for p in enabled
+                    for e, v in iteritems(p.plugin_tep)
+                    if v.get("cache")
+                }
+            ),
+        )
+        set_(
+            "tep_entries",
+            MappingProxyType(
+                {
+                    e: MappingProxyType(dict(fil=tuple(v["fil"]), cod=tuple(v["cod"])))
+                    for e, v in iteritems(teps)
+                }
+            ),
+        )
+        set_(
+            "heps",
+            MappingProxyType(
+                {
+                    hep: tuple(p.plugin_hep[hep] for p in enabled if hep in p.plugin_hep)
+                    for hep in hooks
+                }
+            ),
+        )
+        set_("beps", tuple(p.plugin_bep for p in enabled if p.plugin_bep))
+        set_("veps", tuple(rule for p in enabled for rule in p.plugin_vep))
+        set_("cveps", tuple(rule for p in enabled for rule in p.plugin_cvep))
+        set_("filters", tuple(f for p in enabled for f in p.plugin_filter))
+        set_("errhandlers", tuple(eh for p in enabled for eh in p.plugin_errhandler))
+        tcps = tuple(
+            MappingProxyType({k: v}) for p in enabled for k, v in iteritems(p.plugin_tcp)
+        )
+        set_("tcps", tcps)
+        set_(
+            "tcp_context",
+            MappingProxyType({k: v for tcp in tcps for k, v in iteritems(tcp)}),
+        )
+
+    @staticmethod
+    def tep_priority(tpl: str) -> Tuple[int, float, str]:
+        """Get the sort key of a tep like "priority@template".
+
+        A numeric priority sorts by value and before the others,
+        a non-numeric one sorts as a string like before.
+        """
+        prefix = tpl.split("@")[0]
+        try:
+            return (0, float(prefix), "")
+        except ValueError:
+            return (1, 0.0, prefix)
+
+    @staticmethod
+    def module_name(plugin_info: META) -> Optional[str]:
+        """Get the module name of a plugin without importing it."""
+        proxy = plugin_info.get("__proxy__")
+        if isinstance(proxy, LazyPlugin):
+            return proxy.module_name
+        return getattr(proxy, "__name__", None)
+
+    def __set(self, name: str, value: Any):
+        object.__setattr__(self, name, value)
+
+    def __setattr__(self, name: str, value: Any):
+        raise AttributeError("%s is read-only" % self.__class__.__name__)
+
+    __delattr__ = __setattr__
+
 
 class PluginManager(object):
     """Flask Plugin Manager Extension, collects all plugins and
@@ -113,6 +371,45 @@ class PluginManager(object):
     :param pluginkit_config: additional configuration can be used
                              in the template via :meth:`emit_config`.
 
+    :param bool static_fingerprint: hash the plugins static files at startup,
+                                    :meth:`emit_assets` generates content-hashed
+                                    urls, which are served with strong ETag and
+                                    immutable Cache-Control, and the prebuilt
+                                    `.br`/`.gz` siblings are served to the
+                                    accepted clients. Default False.
+
+    :param bool lazy_load: read the metadata of plugins statically in parallel,
+                           and do not import the disabled plugins at startup,
+                           default True. It has no effect with `hot_reload`.
+
+    :param bool hot_reload: :meth:`enable_plugin` and :meth:`disable_plugin`
+                            take effect immediately without restarting,
+                            all plugins are imported at startup and the routes
+                            of disabled plugins answer 404. Default False.
+
+    :param state_sync: propagate the plugin state changes between workers
+                       with `hot_reload`, True means polling the state files
+                       of plugins (for the workers on one host), or a
+                       :class:`~flask_pluginkit.utils.BaseStorage` instance
+                       shared by all workers, e.g. RedisStorage.
+
+    :param float state_sync_interval: the minimum seconds between two checks
+                                      of `state_sync`, default 1.
+
+    :param static_bundles: declare the bundles of plugin static files, look like
+                           {"name.css": [(plugin_name, filename), ...]},
+                           see :meth:`add_bundle`.
+
+    :param int tep_cache_size: the maximum number of compiled code teps
+                               kept by :meth:`emit_tep`, default 128.
+
+    :param int tep_fragment_cache_size: the maximum number of rendered results
+                                        kept for the cacheable teps, default 256.
+
+    :param plugin_storage: a :class:`~flask_pluginkit.utils.BaseStorage`
+                           instance, e.g. a ShardedStorage, each plugin gets
+                           a namespace of it by :meth:`get_plugin_storage`.
+
     .. versionchanged:: 3.1.0
         Add a vep handler
 
@@ -149,6 +446,33 @@ class PluginManager(object):
 
     .. versionadded:: 3.10.0
         Add `install_packages` parameter, install third-party package from PyPI or Git.
+
+    .. versionadded:: 3.11.0
+        Add `tep_cache_size` parameter, the code teps are compiled once.
+
+    .. versionadded:: 3.11.0
+        Add `tep_fragment_cache_size` parameter for the cacheable teps.
+
+    .. versionadded:: 3.11.0
+        Add `static_fingerprint` parameter for the plugins static files.
+
+    .. versionadded:: 3.11.0
+        Add `static_bundles` parameter and :meth:`emit_bundle`.
+
+    .. versionadded:: 3.11.0
+        Add `lazy_load` parameter.
+
+    .. versionadded:: 3.11.0
+        Add `plugin_manifest` parameter, skip re-scanning on warm start.
+
+    .. versionadded:: 3.11.0
+        Add `hot_reload` parameter, enable or disable plugins live.
+
+    .. versionadded:: 3.11.0
+        Add `state_sync` and `state_sync_interval` parameter.
+
+    .. versionadded:: 3.11.0
+        Add `plugin_storage` parameter and :meth:`get_plugin_storage`.
     """
 
     def __init__(
@@ -168,8 +492,9 @@ class PluginManager(object):
         self.stpl: Union[str, bool] = options.get("stpl", False)
 
         #: Template sort order, True descending, False ascending (default).
+        self.stpl_reverse: bool = False
         if self.stpl in ("asc", "desc", "ASC", "DESC"):
-            self.stpl_reverse: bool = False if self.stpl in ("asc", "ASC") else True
+            self.stpl_reverse = False if self.stpl in ("asc", "ASC") else True
             self.stpl = True
 
         #: Third-party plugin package
@@ -187,6 +512,57 @@ class PluginManager(object):
         self.install_packages: List[str] = ipkgs.pop("pkgs", None) or []
         self.install_packages_meta: Dict[str, Union[str, bool]] = ipkgs
 
+        #: Enable or disable plugins without restarting the application
+        #:
+        #: .. versionadded:: 3.11.0
+        self.hot_reload: bool = options.get("hot_reload") is True
+
+        #: Propagate the plugin states between workers, see :meth:`sync_plugin_states`
+        #:
+        #: .. versionadded:: 3.11.0
+        self.state_sync: Union[bool, BaseStorage, None] = options.get("state_sync")
+        if self.state_sync is False:
+            self.state_sync = None
+        if self.state_sync is not None:
+            if not (self.state_sync is True or isinstance(self.state_sync, BaseStorage)):
+                raise PluginError("Invalid state_sync")
+            if not self.hot_reload:
+                raise PluginError("The state_sync requires hot_reload")
+        self.state_sync_interval: float = options.get("state_sync_interval", 1)
+        self.__state_version: Any = None
+        self.__state_checked: float = 0
+
+        #: The storage whose namespaces are given to plugins,
+        #: see :meth:`get_plugin_storage`
+        #:
+        #: .. versionadded:: 3.11.0
+        self.plugin_storage: Optional[BaseStorage] = options.get("plugin_storage")
+        if self.plugin_storage is not None and not isinstance(
+            self.plugin_storage, BaseStorage
+        ):
+            raise PluginError("Invalid plugin_storage")
+        self.__plugin_storages: Dict[str, BaseStorage] = {}
+
+        #: Do not import the disabled plugins, all plugins are imported
+        #: with :attr:`hot_reload`
+        #:
+        #: .. versionadded:: 3.11.0
+        self.lazy_load: bool = (
+            options.get("lazy_load", True) is not False and not self.hot_reload
+        )
+
+        #: The manifest file of the discovered plugins, True means a file in
+        #: :func:`~flask_pluginkit.utils.private_tempdir`,
+        #: see :class:`~flask_pluginkit.utils.PluginManifest`
+        #:
+        #: .. versionadded:: 3.11.0
+        self.plugin_manifest: Union[str, bool, None] = options.get("plugin_manifest")
+        if self.plugin_manifest is not None and not isinstance(
+            self.plugin_manifest, (bool, string_types)
+        ):
+            raise PluginError("Invalid plugin_manifest")
+        self._manifest: Optional[PluginManifest] = None
+
         #: Static endpoint
         self.static_endpoint: str = options.get("static_endpoint") or "assets"  # type: ignore
 
@@ -197,11 +573,51 @@ class PluginManager(object):
         if not isValidPrefix(self.static_url_path):
             raise PluginError("Invalid static_url_path")
 
+        #: Static files fingerprint, like {plugin_name: {filename: (hash, encodings)}}
+        #:
+        #: .. versionadded:: 3.11.0
+        self.static_fingerprint: bool = options.get("static_fingerprint") is True
+        self._assets_manifest: Dict[str, Dict[str, Tuple[str, Tuple[str, ...]]]] = {}
+
+        #: Static bundles, like {name: ((plugin_name, filename), ...)}
+        #: and the built bundles, like {name: (content, hash)}
+        #:
+        #: .. versionadded:: 3.11.0
+        self._bundles: Dict[str, Tuple[Tuple[str, str], ...]] = {}
+        self._built_bundles: Dict[str, Tuple[bytes, str]] = {}
+        for name, assets in iteritems(options.get("static_bundles") or {}):
+            self.add_bundle(name, assets)
+
+        #: Memo table of :meth:`emit_assets`, like {app: (url_version, LRUCache)}
+        #:
+        #: .. versionadded:: 3.11.0
+        self._assets_memo: "WeakKeyDictionary[Flask, Tuple[int, LRUCache]]" = (
+            WeakKeyDictionary()
+        )
+
+        #: Bumped when the rules or the static files of plugins are changed,
+        #: the memo table of :meth:`emit_assets` is reset on a new version
+        #:
+        #: .. versionadded:: 3.11.0
+        self._url_version: int = 0
+
         #: Configuration Dictionary of Flask-PLuginKit in Project
         self.pluginkit_config: Dict[str, Any] = options.get("pluginkit_config") or {}
         if not isinstance(self.pluginkit_config, dict):
             raise PluginError("Invalid pluginkit_config")
 
+        #: Compiled templates of the code teps, keyed by (plugin_name, tep)
+        #:
+        #: .. versionadded:: 3.11.0
+        self._tep_cache: LRUCache = LRUCache(options.get("tep_cache_size", 128))
+
+        #: Rendered results of the cacheable teps
+        #:
+        #: .. versionadded:: 3.11.0
+        self._tep_fragments: LRUCache = LRUCache(
+            options.get("tep_fragment_cache_size", 256)
+        )
+
         #: Plugins Extended Processor
         self.__pet_handlers: Dict[str, Callable] = {
             "tep": self._tep_handler,
@@ -230,6 +646,25 @@ class PluginManager(object):
         #: All locally stored plugins
         self.__plugins: List = []
 
+        #: The states of hot reload: the initialized apps and their template
+        #: loaders, the endpoints of route-based extension points with their
+        #: plugins, the added template filters, and the extension points
+        #: before the p3 preprocessing, like {id(plugin): (plugin, {pet: value})}
+        #:
+        #: .. versionadded:: 3.11.0
+        self.__apps: "WeakKeyDictionary[Flask, FileSystemLoader]" = WeakKeyDictionary()
+        self.__route_owners: Dict[str, str] = {}
+        self.__added_filters: Dict[str, Callable] = {}
+        self.__p3_origins: Dict[int, Tuple[META, Dict[str, Any]]] = {}
+        self.__state_lock = RLock()
+
+        #: Compiled extension points of the plugins, see :class:`PluginRegistry`
+        #:
+        #: .. versionadded:: 3.11.0
+        self.__registry: PluginRegistry = PluginRegistry(
+            self.__plugins, tuple(self.__het_allow_hooks)
+        )
+
         #: Initialize app via a factory
         if app is not None:
             self.init_app(app, plugins_base, plugins_folder)
@@ -251,39 +686,86 @@ class PluginManager(object):
             "Start plugins initialization, local plugins path: %s, third party"
             "-plugins: %s" % (self.plugins_abspath, self.plugin_packages)
         )
-        installed_pkgs = pip_list()
-        for pkg in self.install_packages:
-            egg = egg_pat.search(pkg)
-            if egg:
-                name = egg.group(1)
-                if name in installed_pkgs:
-                    continue
-            pip_install(pkg, **self.install_packages_meta)  # type: ignore
+        #: .. versionchanged:: 3.11.0
+        #:     Only detect the installed packages (in-process) when there is
+        #:     something to install
+        if self.install_packages:
+            installed_pkgs = installed_packages(
+                self.install_packages_meta.get("target_dir") or ""  # type: ignore
+            )
+            for pkg in self.install_packages:
+                egg = egg_pat.search(pkg)
+                if egg:
+                    name = canonical_name(egg.group(1))
+                    if name in installed_pkgs:
+                        continue
+                pip_install(pkg, **self.install_packages_meta)  # type: ignore
+
+        #: Trust the unchanged plugins in the manifest
+        #:
+        #: .. versionadded:: 3.11.0
+        if self.plugin_manifest:
+            manifest_file = self.plugin_manifest
+            if manifest_file is True:
+                try:
+                    manifest_file = join(
+                        private_tempdir(),
+                        "manifest.%s.json"
+                        % hash_data(self.plugins_abspath.encode("utf-8"))[:12],
+                    )
+                except OSError as e:
+                    self.logger.warning("plugin manifest is disabled: %s" % e)
+                    manifest_file = None
+            if manifest_file:
+                self._manifest = PluginManifest(manifest_file)  # type: ignore
 
         self.__scan_third_plugins()
         self.__scan_affiliated_plugins()
 
+        if self._manifest is not None:
+            try:
+                self._manifest.save()
+            except OSError as e:
+                self.logger.warning("failed to write plugin manifest: %s" % e)
+            else:
+                self.logger.debug(
+                    "plugin manifest %s: %s" % (self._manifest.path, self._manifest.stats)
+                )
+
         #: Try to update `self.__plugins`
         #:
         #: ..versionadded:: 3.7.0
         self.__preprocess_all_plugins()
 
+        #: Hash the static files of the enabled plugins
+        #:
+        #: .. versionadded:: 3.11.0
+        if self.static_fingerprint:
+            for p in self.get_enabled_plugins:
+                self.__build_assets_manifest(p)
+
         #: Analysis and run plugins. First, register template variable
         app.jinja_env.globals.update(
             emit_tep=self.emit_tep,
             emit_assets=self.emit_assets,
+            emit_bundle=self.emit_bundle,
             emit_config=self.emit_config,
             emit_dcp=self._dcp_manager.emit,
         )
 
         #: Custom add multiple template folders.
         #: Maybe you can use :class:`~jinja2.PackageLoader`.
+        #:
+        #: .. versionchanged:: 3.11.0
+        #:     The search path follows the plugin state with `hot_reload`
+        tpl_loader = FileSystemLoader(self.__get_valid_tpl)
         app.jinja_loader = ChoiceLoader(
             [
                 app.jinja_loader,
-                FileSystemLoader(self.__get_valid_tpl),
+                tpl_loader,
             ]
         )  # type: ignore
+        self.__apps[app] = tpl_loader
 
         #: Add a static rule for plugins
         app.add_url_rule(
@@ -292,37 +774,72 @@ class PluginManager(object):
             view_func=self._send_plugin_static_file,
         )
 
+        #: Add a rule for the bundles of plugins static files
+        #:
+        #: .. versionadded:: 3.11.0
+        app.add_url_rule(
+            self.static_url_path + "/_bundles/<string:name>",
+            endpoint=self.static_endpoint + "_bundle",
+            view_func=self._send_bundle_file,
+        )
+        self._url_version += 1
+
+        #: With `hot_reload`, the route-based extension points of all plugins
+        #: are registered, the disabled ones are guarded by the plugin state.
+        #:
+        #: .. versionadded:: 3.11.0
+        route_plugins = self.__plugins if self.hot_reload else self.get_enabled_plugins
+        if self.hot_reload:
+            before_request_funcs = app.before_request_funcs.setdefault(None, [])
+            before_request_funcs.insert(0, self.__hot_reload_guard)
+            if self.state_sync is not None:
+                before_request_funcs.insert(0, self.__state_sync_hook)
+
         #: Register the hook extension point processor
+        #:
+        #: .. versionchanged:: 3.11.0
+        #:     Only register the hooks that at least one plugin supplies
         for hep, handler in iteritems(self.__het_allow_hooks):
-            _deco_func = getattr(app, hep)
-            _deco_func(handler)
+            if any(hep in p.plugin_hep for p in route_plugins):
+                _deco_func = getattr(app, hep)
+                _deco_func(handler)
 
         #: Register the blueprint extension point
         #:
         #: .. versionchanged:: 3.6.2
         #:     flask 2.0 nested blueprints,
         #:     but only blueprints of other plugins can be nested
-        _plugin_bps = {}  # {name:{blueprint}, }
-        _nested_bps = {}  # {parent:[{blueprint}, ], }
-        for bep in self.get_enabled_beps:
+        _plugin_bps = {}  # {name:(plugin_name, {blueprint}), }
+        _nested_bps = {}  # {parent:[(plugin_name, {blueprint}), ], }
+        for p in route_plugins:
+            bep = p.plugin_bep
+            if not bep:
+                continue
             bp = bep["blueprint"]
             parent = bep.get("parent")
             if parent:
-                _nested_bps.setdefault(parent, []).append(bep)
+                _nested_bps.setdefault(parent, []).append((p.plugin_name, bep))
             else:
-                _plugin_bps[bp.name] = bep
+                _plugin_bps[bp.name] = (p.plugin_name, bep)
         for parent, beps in iteritems(_nested_bps):
             if parent not in _plugin_bps:
                 raise PEPError("No parent blueprint found named %s" % parent)
-            pbp = _plugin_bps[parent]["blueprint"]
-            for bep in beps:
+            pbp = _plugin_bps[parent][1]["blueprint"]
+            for _, bep in beps:
                 bp = bep["blueprint"]
                 prefix = bep["prefix"]
                 pbp.register_blueprint(bp, url_prefix=prefix)
-        for bep in _plugin_bps.values():
+        for plugin_name, bep in _plugin_bps.values():
             bp = bep["blueprint"]
             prefix = bep["prefix"]
-            app.register_blueprint(bp, url_prefix=prefix)
+            with self.__own_routes(app, plugin_name):
+                app.register_blueprint(bp, url_prefix=prefix)
+            #: The endpoints of nested blueprints belong to their plugins
+            for child_name, child in _nested_bps.get(bp.name, ()):
+                child_prefix = "%s.%s." % (bp.name, child["blueprint"].name)
+                for endpoint in list(self.__route_owners):
+                    if endpoint.startswith(child_prefix):
+                        self.__route_owners[endpoint] = child_name
 
         #: Register the viewfunc extension point
         #:
@@ -330,26 +847,30 @@ class PluginManager(object):
         #:
         #: .. versionchanged:: 3.6.0
         #:     allow blueprint name
-        for vep in self.get_enabled_veps:
-            rule, viewfunc, endpoint, options, _bp = vep
-            if _bp:
-                if _bp in app.blueprints:
-                    s = app.blueprints[_bp].make_setup_state(app, {})
-                    s.add_url_rule(rule, endpoint, viewfunc, **options)
-                else:
-                    raise PEPError(
-                        "The required blueprint({}) was not found when "
-                        "registering vep with {}".format(_bp, rule)
-                    )
-            else:
-                app.add_url_rule(rule, endpoint, viewfunc, **options)
+        for p in route_plugins:
+            for vep in p.plugin_vep:
+                rule, viewfunc, endpoint, options, _bp = vep
+                with self.__own_routes(app, p.plugin_name):
+                    if _bp:
+                        if _bp in app.blueprints:
+                            s = app.blueprints[_bp].make_setup_state(app, {})
+                            s.add_url_rule(rule, endpoint, viewfunc, **options)
+                        else:
+                            raise PEPError(
+                                "The required blueprint({}) was not found when "
+                                "registering vep with {}".format(_bp, rule)
+                            )
+                    else:
+                        app.add_url_rule(rule, endpoint, viewfunc, **options)
 
         #: Register the class-based view extension point
         #:
         #: .. versionadded:: 3.5.0
-        for cvep in self.get_enabled_cveps:
-            viewclass, options = cvep
-            viewclass.register(app, **options)
+        for p in route_plugins:
+            for cvep in p.plugin_cvep:
+                viewclass, options = cvep
+                with self.__own_routes(app, p.plugin_name):
+                    viewclass.register(app, **options)
 
         #: Register the template filters
         #:
@@ -357,56 +878,276 @@ class PluginManager(object):
         for tf in self.get_enabled_filters:
             if tf and tf[0] not in app.jinja_env.filters:
                 app.add_template_filter(tf[-1], tf[0])
+                self.__added_filters[tf[0]] = tf[-1]
 
         #: Register the error handlers
         #:
         #: .. versionadded:: 3.2.0
-        for err_code_exc, errview in self.get_enabled_errhandlers:
-            app.register_error_handler(err_code_exc, errview)
+        #:
+        #: .. versionchanged:: 3.11.0
+        #:     With `hot_reload`, one guarded handler per error dispatches
+        #:     to the last enabled plugin that handles it
+        if self.hot_reload:
+            errhandlers = {}  # {err_code_exc: [(plugin_name, errview)]}
+            for p in route_plugins:
+                for err_code_exc, errview in p.plugin_errhandler:
+                    errhandlers.setdefault(err_code_exc, []).append(
+                        (p.plugin_name, errview)
+                    )
+            for err_code_exc, chain in iteritems(errhandlers):
+                app.register_error_handler(
+                    err_code_exc, self.__guard_errhandler(app, err_code_exc, chain)
+                )
+        else:
+            for err_code_exc, errview in self.get_enabled_errhandlers:
+                app.register_error_handler(err_code_exc, errview)
 
         #: Register the template context processors
         #:
         #: .. versionadded:: 3.2.0
+        #:
+        #: .. versionchanged:: 3.11.0
+        #:     The context is merged once when the registry is compiled
         app.template_context_processors[None].append(
-            lambda: {k: v for tcp in self.get_enabled_tcps for k, v in iteritems(tcp)}
+            lambda: self.__registry.tcp_context
         )
 
         #: register extension with app
         app.extensions = getattr(app, "extensions", None) or {}
         app.extensions["pluginkit"] = self
 
+        #: Catch up with the states published by other workers
+        #:
+        #: .. versionadded:: 3.11.0
+        if self.state_sync is not None:
+            self.sync_plugin_states(force=True)
+
+    @contextmanager
+    def __own_routes(self, app: Flask, plugin_name: str):
+        """Record the endpoints added in the block as owned by the plugin,
+        only with :attr:`hot_reload`.
+
+        .. versionadded:: 3.11.0
+        """
+        if not self.hot_reload:
+            yield
+            return
+        before = set(app.view_functions)
+        yield
+        for endpoint in set(app.view_functions) - before:
+            self.__route_owners[endpoint] = plugin_name
+
+    def __state_sync_hook(self):
+        self.sync_plugin_states()
+
+    def __hot_reload_guard(self):
+        """The routes of disabled plugins answer 404.
+
+        .. versionadded:: 3.11.0
+        """
+        plugin_name = self.__route_owners.get(request.endpoint)  # type: ignore
+        if plugin_name and plugin_name not in self.__registry.enabled_names:
+            return abort(404)
+
+    def __guard_errhandler(
+        self, app: Flask, err_code_exc: Any, chain: Sequence[Tuple[str, Callable]]
+    ) -> Callable:
+        """Make an error handler that calls the errview of the last enabled
+        plugin in `chain`, if none, it falls back to the handler registered
+        before, or the default handling of Flask.
+
+        .. versionadded:: 3.11.0
+        """
+        exc_class, code = app._get_exc_class_and_code(err_code_exc)
+        fallback = app.error_handler_spec[None][code].get(exc_class)
+        chain = tuple(reversed(chain))
+
+        def handler(e):
+            enabled = self.__registry.enabled_names
+            for plugin_name, errview in chain:
+                if plugin_name in enabled:
+                    return errview(e)
+            if fallback is not None:
+                return fallback(e)
+            if isinstance(e, HTTPException):
+                return e
+            raise e
+
+        return handler
+
     def __scan_third_plugins(self):
         if self.plugin_packages and isinstance(self.plugin_packages, (list, tuple)):
+            candidates = []
             for package_name in self.plugin_packages:
                 self.logger.debug("find third plugin package: %s" % package_name)
                 try:
-                    plugin = __import__(package_name)
-                except ImportError as e:
+                    spec = find_spec(package_name)
+                except (ImportError, ValueError) as e:
                     raise PluginError(e)
-                else:
-                    plugin_abspath = dirname(abspath(plugin.__file__))
-                    self.__load_plugin(plugin, plugin_abspath, package_name)
+                if spec is None:
+                    raise PluginError("No module named %s" % package_name)
+                origin = spec.origin if spec.has_location else None
+                candidates.append(
+                    (
+                        package_name,
+                        package_name,
+                        dirname(abspath(origin)) if origin else None,
+                        origin,
+                    )
+                )
+            self.__load_plugins(candidates, third=True)
 
     def __scan_affiliated_plugins(self):
         if isdir(self.plugins_abspath) and isfile(
             join(self.plugins_abspath, "__init__.py")
         ):
-            for package_name in listdir(self.plugins_abspath):
+            packages = None
+            if self._manifest is not None:
+                packages = self._manifest.listdir(self.plugins_abspath)
+            if packages is None:
+                packages = [
+                    package_name
+                    for package_name in listdir(self.plugins_abspath)
+                    if isfile(join(self.plugins_abspath, package_name, "__init__.py"))
+                ]
+                if self._manifest is not None:
+                    self._manifest.set_listdir(self.plugins_abspath, packages)
+            candidates = []
+            for package_name in packages:
+                self.logger.debug("find local plugin package: %s" % package_name)
                 package_abspath = join(self.plugins_abspath, package_name)
-                if isdir(package_abspath) and isfile(
-                    join(package_abspath, "__init__.py")
-                ):
-                    self.logger.debug("find local plugin package: %s" % package_name)
-                    #: Dynamic load module (plugins.package):
-                    #: you can query custom information and get the plugin's
-                    #: class definition through `register` function.
-                    plugin = __import__(
+                candidates.append(
+                    (
                         "%s.%s" % (self.plugins_folder, package_name),
-                        fromlist=[
-                            self.plugins_folder,
-                        ],
+                        package_name,
+                        package_abspath,
+                        join(package_abspath, "__init__.py"),
                     )
-                    self.__load_plugin(plugin, package_abspath, package_name)
+                )
+            self.__load_plugins(candidates)
+
+    def __load_plugins(self, candidates, third=False):
+        """Load the discovered plugins in order.
+
+        The metadata of candidates is read in parallel first, then the
+        enabled plugins are imported one by one, and the disabled plugins
+        are not imported if :attr:`lazy_load` is enabled.
+
+        :param candidates: look like [(module, package_name, abspath, entry)]
+
+        .. versionadded:: 3.11.0
+        """
+        if self.lazy_load and len(candidates) > 1:
+            with ThreadPoolExecutor(max_workers=min(8, len(candidates))) as e:
+                metas = list(e.map(self.__discover_lazy_plugin, candidates))
+        else:
+            metas = [self.__discover_lazy_plugin(c) for c in candidates]
+        for (module_name, package_name, package_abspath, _), meta in zip(
+            candidates, metas
+        ):
+            if meta is False:
+                continue
+            start = perf_counter()
+            if meta is not None:
+                plugin = LazyPlugin(module_name, meta)
+            elif third:
+                try:
+                    plugin = __import__(package_name)
+                except ImportError as e:
+                    raise PluginError(e)
+                package_abspath = dirname(abspath(plugin.__file__))
+            else:
+                #: Dynamic load module (plugins.package):
+                #: you can query custom information and get the plugin's
+                #: class definition through `register` function.
+                plugin = __import__(
+                    module_name,
+                    fromlist=[
+                        self.plugins_folder,
+                    ],
+                )
+            plugin_info = self.__load_plugin(plugin, package_abspath, package_name)
+            plugin_info["__load_cost__"] = perf_counter() - start
+            self.logger.debug(
+                "load plugin %s in %.3fms%s"
+                % (
+                    plugin_info.plugin_name,
+                    plugin_info.__load_cost__ * 1000,
+                    " (lazy)" if meta is not None else "",
+                )
+            )
+
+    def __discover_lazy_plugin(self, candidate) -> Union[None, bool, Dict[str, Any]]:
+        """Read the metadata of a candidate without importing it, return
+        the metadata if the plugin is disabled and can be loaded lazily,
+        or False if the candidate listed in the manifest has gone.
+        The unchanged candidates are read from the manifest.
+
+        .. versionadded:: 3.11.0
+        """
+        _, _, package_abspath, init_file = candidate
+        if not package_abspath or not init_file:
+            return None
+        if self._manifest is not None:
+            stamp_files = self.__stamp_files(package_abspath, init_file)
+            entry = self._manifest.get(package_abspath, *stamp_files)
+            if entry is None:
+                if not isfile(init_file):
+                    #: The package listed in the manifest has gone
+                    return False
+                entry = self._manifest.set(
+                    package_abspath,
+                    self.__discover_plugin(package_abspath, init_file),
+                    *stamp_files,
+                )
+        elif self.lazy_load:
+            entry = self.__discover_plugin(package_abspath, init_file)
+        else:
+            return None
+        return entry["meta"] if self.lazy_load else None
+
+    @staticmethod
+    def __stamp_files(package_abspath, init_file) -> List[str]:
+        """The files whose stamp invalidates the manifest entry of a plugin,
+        the entry file and the `__init__.py` of its subpackages, from which
+        the entry may import its version.
+
+        .. versionadded:: 3.11.0
+        """
+        files = [init_file]
+        try:
+            names = sorted(listdir(package_abspath))
+        except OSError:
+            return files
+        for name in names:
+            child = join(package_abspath, name, "__init__.py")
+            if isfile(child):
+                files.append(child)
+        return files
+
+    def __discover_plugin(self, package_abspath, init_file) -> Dict[str, Any]:
+        """Check the state markers and the static metadata of a plugin,
+        the `meta` is not None if the plugin can be loaded lazily.
+
+        .. versionadded:: 3.11.0
+        """
+        enabled = isfile(join(package_abspath, "ENABLED"))
+        disabled = isfile(join(package_abspath, "DISABLED"))
+        entry = dict(markers=[enabled, disabled], meta=None)
+        if enabled and not disabled:
+            return entry
+        try:
+            meta, dynamic = parse_plugin_meta(init_file)
+        except (OSError, SyntaxError, ValueError):
+            return entry
+        required = ("__plugin_name__", "__version__", "__author__", "register")
+        if dynamic.intersection(("__state__",) + required) or not all(
+            k in meta for k in required
+        ):
+            return entry
+        if disabled or meta.get("__state__") == "disabled":
+            entry["meta"] = meta
+        return entry
 
     def __load_plugin(self, p_obj, package_abspath, package_name):
         """Try to load the plugin.
@@ -426,7 +1167,16 @@ class PluginManager(object):
 
         .. versionchanged:: 3.3.1
             Read and convert the method of getPluginClass in the old version.
+
+        .. versionchanged:: 3.11.0
+            Return the plugin info, the :class:`~flask_pluginkit.utils.LazyPlugin`
+            is recorded without calling `register`, the extension points of
+            disabled plugins are also parsed with `hot_reload`.
         """
+        if isinstance(p_obj, LazyPlugin):
+            plugin_info = self._get_plugin_meta(p_obj, package_abspath, package_name)
+            self.__plugins.append(plugin_info)
+            return plugin_info
         #: Detection plugin information
         if (
             hasattr(p_obj, "__plugin_name__")
@@ -444,7 +1194,7 @@ class PluginManager(object):
                 plugin_info: META = self._get_plugin_meta(
                     p_obj, package_abspath, package_name
                 )
-                if plugin_info.plugin_state == "enabled":
+                if plugin_info.plugin_state == "enabled" or self.hot_reload:
                     for pet, value in iteritems(pets):
                         try:
                             self.__pet_handlers[pet](plugin_info, value)
@@ -455,6 +1205,7 @@ class PluginManager(object):
                                 % (plugin_info.plugin_name, pet)
                             )
                 self.__plugins.append(plugin_info)
+                return plugin_info
             else:
                 raise PEPError(
                     "When loading %s, the register returns the wrong type, "
@@ -486,17 +1237,35 @@ class PluginManager(object):
 
         .. versionchanged:: 3.10.0
             add load_time and appversion checking
+
+        .. versionchanged:: 3.11.0
+            add load_cost (seconds), set after loading,
+            the validated version and state markers are trusted
+            if the plugin in manifest has not changed
         """
-        if not isValidSemver(p_obj.__version__):
-            raise VersionError(
-                "The version number of %s is not compliant, "
-                "please refer to https://semver.org" % package_name
-            )
+        entry = None
+        if self._manifest is not None:
+            entry = self._manifest.trusted(package_abspath)
         appver = getattr(p_obj, "__appversion__", None)
-        if not is_match_version_req(appver):
-            raise VersionError(
-                "%s: app version number does not match for %s" % (package_name, appver)
-            )
+        if (
+            entry is None
+            or entry.get("version") != p_obj.__version__
+            or entry.get("appversion") != appver
+        ):
+            if not isValidSemver(p_obj.__version__):
+                raise VersionError(
+                    "The version number of %s is not compliant, "
+                    "please refer to https://semver.org" % package_name
+                )
+            if not is_match_version_req(appver):
+                raise VersionError(
+                    "%s: app version number does not match for %s"
+                    % (package_name, appver)
+                )
+            if entry is not None:
+                self._manifest.update(  # type: ignore
+                    package_abspath, version=p_obj.__version__, appversion=appver
+                )
 
         try:
             plugin_state = p_obj.__state__
@@ -506,9 +1275,14 @@ class PluginManager(object):
         #: The plugin state first reads the `__state__` value,
         #: the priority is lower than the state file,
         #: and the ENABLED file has a lower priority than the DISABLED file.
-        if isfile(join(package_abspath, "ENABLED")):
+        if entry is not None:
+            enabled, disabled = entry["markers"]
+        else:
+            enabled = isfile(join(package_abspath, "ENABLED"))
+            disabled = isfile(join(package_abspath, "DISABLED"))
+        if enabled:
             plugin_state = "enabled"
-        if isfile(join(package_abspath, "DISABLED")):
+        if disabled:
             plugin_state = "disabled"
 
         return Attribution(
@@ -537,6 +1311,7 @@ class PluginManager(object):
                 "plugin_p3": {},
                 "__proxy__": p_obj,
                 "__load_time__": time(),
+                "__load_cost__": 0.0,
             }
         )
 
@@ -559,13 +1334,26 @@ class PluginManager(object):
                         using template type can be specified when rendering
                         and introduced to additional data.
 
+                        3. The value can also be a dict like
+                        {tpl=file_or_code, cache=True or dict(ttl=, keys=[])},
+                        then the rendered result is cached by :meth:`emit_tep`,
+                        `ttl` is the expiration seconds (0 is never expired),
+                        `keys` are the context names that affect the result.
+
         :raises TemplateNotFound: if no template file is found.
 
         :raises PEPError: if tep rule or content is invalid.
+
+        .. versionchanged:: 3.11.0
+            Allow the cacheable tep with dict value
         """
         if isinstance(tep_rule, dict):
             plugin_tep = {}
             for event, tpl in iteritems(tep_rule):
+                cache = None
+                if isinstance(tpl, dict):
+                    cache = self.__parse_tep_cache(plugin_info, tpl.get("cache"))
+                    tpl = tpl.get("tpl")
                 if isinstance(tpl, string_types):
                     if splitext(tpl)[-1] in (".html", ".htm", ".xhtml"):
                         if isfile(
@@ -588,6 +1376,8 @@ class PluginManager(object):
                         if not isinstance(tpl, text_type):
                             tpl = tpl.decode("utf-8")
                         plugin_tep[event] = dict(cod=tpl)
+                    if cache:
+                        plugin_tep[event]["cache"] = cache
                 else:
                     raise PEPError(
                         "The tep content is invalid for %s" % plugin_info.plugin_name
@@ -601,6 +1391,27 @@ class PluginManager(object):
                 "it should be a dict." % plugin_info.plugin_name
             )
 
+    def __parse_tep_cache(self, plugin_info: META, cache: Any) -> Optional[dict]:
+        """Normalize the cache option of a tep to dict(ttl=int, keys=tuple).
+
+        .. versionadded:: 3.11.0
+        """
+        if not cache:
+            return None
+        if cache is True:
+            cache = {}
+        if isinstance(cache, dict):
+            ttl = cache.get("ttl") or 0
+            keys = cache.get("keys") or ()
+            if (
+                isinstance(ttl, int)
+                and ttl >= 0
+                and isinstance(keys, (list, tuple))
+                and all(isinstance(k, string_types) for k in keys)
+            ):
+                return dict(ttl=ttl, keys=tuple(keys))
+        raise PEPError("The tep cache is invalid for %s" % plugin_info.plugin_name)
+
     def _hep_handler(self, plugin_info: META, hep_rule: Dict[str, Callable]):
         """Hook extension point handler.
 
@@ -910,19 +1721,19 @@ class PluginManager(object):
             )
 
     def __before_request_hook_handler(self):
-        for func in self.get_enabled_heps["before_request"]:
+        for func in self.__registry.heps["before_request"]:
             resp = func()
             if resp is not None:
                 return resp
 
     def __after_request_hook_handler(self, response):
-        for func in self.get_enabled_heps["after_request"]:
+        for func in self.__registry.heps["after_request"]:
             func(response)
             #: TODO response = func(response)
         return response
 
     def __teardown_request_hook_handler(self, exception=None):
-        for func in self.get_enabled_heps["teardown_request"]:
+        for func in self.__registry.heps["teardown_request"]:
             func(exception)
 
     def __preprocess_all_plugins(self):
@@ -933,7 +1744,14 @@ class PluginManager(object):
         If the plugin is not enabled, skip it.
 
         .. versionadded:: 3.7.0
+
+        .. versionchanged:: 3.11.0
+            It can be run again when the plugin state changed, the extension
+            points modified by p3 are restored first.
         """
+        for p, origins in itervalues(self.__p3_origins):
+            p.update(origins)
+        self.__p3_origins.clear()
         # all plugins data
         oplugins = []
         # like {plugin_name:[(from_pname,{pet:func, pet:func}), (other,{})],}
@@ -956,6 +1774,10 @@ class PluginManager(object):
                             obj = "plugin_" + pet
                             try:
                                 ov = p[obj]
+                                origins = self.__p3_origins.setdefault(
+                                    id(p), (p, {})
+                                )[1]
+                                origins.setdefault(obj, copy(ov))
                                 nv = func(ov)
                                 if type(ov) != type(nv):
                                     raise PluginError(
@@ -968,56 +1790,77 @@ class PluginManager(object):
                                 p[obj] = nv
             nplugins.append(p)
         self.__plugins = nplugins
+        self.__compile_registry()
+
+    def __compile_registry(self):
+        """Compile the current plugins into a new :class:`PluginRegistry`
+        and swap it in at once.
+
+        .. versionadded:: 3.11.0
+        """
+        self.__registry = PluginRegistry(
+            self.__plugins,
+            tuple(self.__het_allow_hooks),
+            self.stpl_reverse if self.stpl is True else None,
+        )
+        self._tep_cache.clear()
+        self._tep_fragments.clear()
+        self._built_bundles.clear()
+        self._url_version += 1
+        self._dcp_manager.muted_modules = self.__registry.disabled_modules
 
     @property
     def get_all_plugins(self):
         """Get all plugins, enabled and disabled"""
         return self.__plugins
 
+    @property
+    def registry(self) -> PluginRegistry:
+        """The compiled :class:`PluginRegistry` of the current plugin states,
+        its sequences are tuples and its mappings are read-only, read it
+        instead of the ``get_enabled_*`` copies on the hot paths.
+
+        .. versionadded:: 3.11.0
+        """
+        return self.__registry
+
     @property
     def get_enabled_plugins(self):
-        """Get all enabled plugins"""
-        return [p for p in self.get_all_plugins if p.plugin_state == "enabled"]
+        """Get all enabled plugins
+
+        .. versionchanged:: 3.11.0
+            Return a new list copied from the compiled :attr:`registry`
+        """
+        return list(self.__registry.enabled_plugins)
 
     @property
     def __get_valid_tpl(self):
-        return [
-            p.plugin_tpl_path
-            for p in self.get_enabled_plugins
-            if isdir(p.plugin_tpl_path)
-        ]
+        return list(self.__registry.tpl_paths)
 
     @property
     def get_enabled_teps(self):
         """Get all tep of the enabled plugins.
 
         :returns: dict, look like {tep_1: dict(fil=[], cod=[]), tep_n...}
+
+        .. versionchanged:: 3.11.0
+            Return a new dict copied from the compiled :attr:`registry`
         """
-        teps = {}
-        for p in self.get_enabled_plugins:
-            for e, v in iteritems(p.plugin_tep):
-                tep = teps.get(e, dict())
-                tepHF = tep.get("fil", [])
-                tepHS = tep.get("cod", [])
-                tepHF += [s for f, s in v.items() if f == "fil"]
-                tepHS += [s for f, s in v.items() if f == "cod"]
-                teps[e] = dict(fil=tepHF, cod=tepHS)
-        return teps
+        return {
+            e: {f: list(s) for f, s in iteritems(v)}
+            for e, v in iteritems(self.__registry.teps)
+        }
 
     @property
     def get_enabled_heps(self):
         """Get all hep of the enabled plugins.
 
         :returns: dictionary with nested tuples, look like {hook:[]}
+
+        .. versionchanged:: 3.11.0
+            Return a new dict copied from the compiled :attr:`registry`
         """
-        heps = {}
-        for hep in self.__het_allow_hooks.keys():
-            heps[hep] = [
-                p.plugin_hep[hep]
-                for p in self.get_enabled_plugins
-                if hep in p.plugin_hep.keys()
-            ]
-        return heps
+        return {hep: list(funcs) for hep, funcs in iteritems(self.__registry.heps)}
 
     @property
     def get_enabled_beps(self):
@@ -1025,7 +1868,7 @@ class PluginManager(object):
 
         :returns: List of nested dictionaries, like [{blueprint=,prefix=},]
         """
-        return [p.plugin_bep for p in self.get_enabled_plugins if p.plugin_bep]
+        return list(self.__registry.beps)
 
     @property
     def get_enabled_veps(self):
@@ -1035,12 +1878,7 @@ class PluginManager(object):
 
         .. versionadded:: 3.1.0
         """
-        return [
-            rule
-            for p in self.get_enabled_plugins
-            for rule in p.plugin_vep
-            if p.plugin_vep
-        ]
+        return list(self.__registry.veps)
 
     @property
     def get_enabled_cveps(self):
@@ -1050,12 +1888,7 @@ class PluginManager(object):
 
         .. versionadded:: 3.5.0
         """
-        return [
-            rule
-            for p in self.get_enabled_plugins
-            for rule in p.plugin_cvep
-            if p.plugin_cvep
-        ]
+        return list(self.__registry.cveps)
 
     @property
     def get_enabled_filters(self):
@@ -1065,11 +1898,7 @@ class PluginManager(object):
 
         .. versionadded:: 3.2.0
         """
-        return list(
-            chain.from_iterable(
-                [p.plugin_filter for p in self.get_enabled_plugins if p.plugin_filter]
-            )
-        )
+        return list(self.__registry.filters)
 
     @property
     def get_enabled_errhandlers(self):
@@ -1082,15 +1911,7 @@ class PluginManager(object):
         .. versionchanged:: 3.4.0
             Return type changed from dict to list
         """
-        return list(
-            chain.from_iterable(
-                [
-                    p.plugin_errhandler
-                    for p in self.get_enabled_plugins
-                    if p.plugin_errhandler
-                ]
-            )
-        )
+        return list(self.__registry.errhandlers)
 
     @property
     def get_enabled_tcps(self):
@@ -1100,60 +1921,319 @@ class PluginManager(object):
 
         .. versionadded:: 3.2.0
         """
-        return [
-            {k: v}
-            for p in self.get_enabled_plugins
-            for k, v in iteritems(p.plugin_tcp)
-            if p.plugin_tcp
-        ]
+        return [dict(tcp) for tcp in self.__registry.tcps]
 
     def get_plugin_info(self, plugin_name):
-        """Get plugin information from all plugins"""
+        """Get plugin information from all plugins
+
+        .. versionchanged:: 3.11.0
+            Look up the name index of the registry
+        """
         try:
-            return next(
-                (p for p in self.get_all_plugins if p.plugin_name == plugin_name)
-            )
-        except StopIteration:
+            return self.__registry.by_name[plugin_name]
+        except KeyError:
             raise PluginError("No plugin named %s was found" % plugin_name)
 
+    def get_plugin_info_by_package(self, package_name):
+        """Get plugin information from all plugins by the package name
+
+        .. versionadded:: 3.11.0
+        """
+        try:
+            return self.__registry.by_package[package_name]
+        except KeyError:
+            raise PluginError("No plugin package named %s was found" % package_name)
+
+    def get_plugin_storage(self, plugin_name: Optional[str] = None) -> BaseStorage:
+        """Get the namespace of :attr:`plugin_storage` for a plugin,
+        the namespace is the plugin name, so the keys of plugins do not
+        collide::
+
+            #: in a plugin module
+            pm = current_app.extensions["pluginkit"]
+            storage = pm.get_plugin_storage(__plugin_name__)
+
+        If plugin_name is None, it is guessed from the module of the direct
+        caller, which must be the plugin package or one of its submodules.
+        A helper outside the plugin package, e.g. a shared library module,
+        raises PluginError or, if it is a module of another plugin, gets
+        that plugin's namespace, so pass plugin_name in such helpers.
+
+        :raises PluginError: no plugin_storage or plugin found
+
+        .. versionadded:: 3.11.0
+        """
+        if self.plugin_storage is None:
+            raise PluginError("The plugin_storage param is not set")
+        if plugin_name is None:
+            module = sys._getframe(1).f_globals.get("__name__", "")
+            for p in self.get_all_plugins:
+                name = PluginRegistry.module_name(p)
+                if name and (module == name or module.startswith(name + ".")):
+                    plugin_name = p.plugin_name
+                    break
+            else:
+                raise PluginError("The caller %s is not a plugin" % module)
+        else:
+            plugin_name = self.get_plugin_info(plugin_name).plugin_name
+        storage = self.__plugin_storages.get(plugin_name)
+        if storage is None:
+            storage = self.plugin_storage.namespace(plugin_name)
+            self.__plugin_storages[plugin_name] = storage
+        return storage
+
     def disable_plugin(self, plugin_name):
         """Disable a plugin (that is, create a DISABLED empty file)
         and restart the application to take effect.
+
+        .. versionchanged:: 3.11.0
+            Take effect immediately with :attr:`hot_reload`.
         """
         p = self.get_plugin_info(plugin_name)
         ENABLED = join(p.plugin_package_abspath, "ENABLED")
         DISABLED = join(p.plugin_package_abspath, "DISABLED")
+        if self.state_sync is not None:
+            self.sync_plugin_states(force=True)
         if isfile(ENABLED):
             remove(ENABLED)
         self.__touch_file(DISABLED)
+        if self.hot_reload:
+            self.__set_plugin_states([(p, "disabled")])
+            self.__publish_plugin_state(p)
 
     def enable_plugin(self, plugin_name):
         """Enable a plugin (that is, create a ENABLED empty file)
         and restart the application to take effect.
+
+        .. versionchanged:: 3.11.0
+            Take effect immediately with :attr:`hot_reload`.
         """
         p = self.get_plugin_info(plugin_name)
         ENABLED = join(p.plugin_package_abspath, "ENABLED")
         DISABLED = join(p.plugin_package_abspath, "DISABLED")
+        if self.state_sync is not None:
+            self.sync_plugin_states(force=True)
         if isfile(DISABLED):
             remove(DISABLED)
         self.__touch_file(ENABLED)
+        if self.hot_reload:
+            self.__set_plugin_states([(p, "enabled")])
+            self.__publish_plugin_state(p)
+
+    def __set_plugin_states(self, changes: Sequence[Tuple[META, str]]) -> int:
+        """Change the state of plugins, then preprocess the plugins and
+        swap in a new registry, the in-flight requests keep working.
+
+        :param changes: look like [(plugin_info, state), ...]
+
+        :returns: int: the number of plugins whose state changed
+
+        .. versionadded:: 3.11.0
+        """
+        with self.__state_lock:
+            changed = [(p, state) for p, state in changes if p.plugin_state != state]
+            if not changed:
+                return 0
+            for p, state in changed:
+                p["plugin_state"] = state
+                self.logger.debug("%s plugin %s" % (state, p.plugin_name))
+            self.__preprocess_all_plugins()
+            if self.static_fingerprint:
+                for p, state in changed:
+                    if state == "enabled" and p.plugin_name not in self._assets_manifest:
+                        self.__build_assets_manifest(p)
+            self.__sync_apps()
+            return len(changed)
+
+    def sync_plugin_states(self, force: bool = False) -> int:
+        """Apply the plugin states changed by other workers, with
+        :attr:`state_sync` it is called before each request, but checks
+        at most once every :attr:`state_sync_interval` seconds.
+
+        :param bool force: check now regardless of the interval
+
+        :returns: int: the number of plugins whose state changed
+
+        .. versionadded:: 3.11.0
+        """
+        if self.state_sync is None:
+            return 0
+        now = monotonic()
+        if not force and now - self.__state_checked < self.state_sync_interval:
+            return 0
+        #: Only one thread checks, the others go on with the current registry
+        if not self.__state_lock.acquire(blocking=force):
+            return 0
+        try:
+            self.__state_checked = now
+            version, states = self.__read_plugin_states()
+            if version == self.__state_version:
+                return 0
+            self.__state_version = version
+            return self.__set_plugin_states(
+                [
+                    (p, states[p.plugin_name])
+                    for p in self.__plugins
+                    if states.get(p.plugin_name) in ("enabled", "disabled")
+                ]
+            )
+        finally:
+            self.__state_lock.release()
+
+    def __read_plugin_states(self) -> Tuple[Any, Dict[str, str]]:
+        """Get the version and the plugin states from :attr:`state_sync`,
+        the version of state files is made of the stamps of plugin directories.
+
+        .. versionadded:: 3.11.0
+        """
+        if isinstance(self.state_sync, BaseStorage):
+            #: the version is read first, the states published after it
+            #: come with a newer version and are read at the next check
+            version = self.state_sync.get(STATE_SYNC_KEY)
+            if version is None or version == self.__state_version:
+                return version, {}
+            keys = [STATE_SYNC_PLUGIN_KEY % p.plugin_name for p in self.__plugins]
+            if hasattr(self.state_sync, "getmany"):
+                data = self.state_sync.getmany(*keys)
+            else:
+                data = {k: self.state_sync.get(k) for k in keys}
+            return version, {
+                p.plugin_name: data.get(k) for p, k in zip(self.__plugins, keys)
+            }
+        version = tuple(
+            tuple(file_stamp(p.plugin_package_abspath) or ()) for p in self.__plugins
+        )
+        states = {}
+        for p in self.__plugins:
+            if isfile(join(p.plugin_package_abspath, "DISABLED")):
+                states[p.plugin_name] = "disabled"
+            elif isfile(join(p.plugin_package_abspath, "ENABLED")):
+                states[p.plugin_name] = "enabled"
+            else:
+                states[p.plugin_name] = getattr(p.__proxy__, "__state__", "enabled")
+        return version, states
+
+    def __publish_plugin_state(self, plugin_info: META):
+        """Publish the state of a plugin to the :attr:`state_sync` storage,
+        each plugin has its own key, so the changes of different plugins by
+        workers at the same time do not undo each other, then a new version
+        tells the workers to read the states again.
+
+        .. versionadded:: 3.11.0
+        """
+        if isinstance(self.state_sync, BaseStorage):
+            self.state_sync.set(
+                STATE_SYNC_PLUGIN_KEY % plugin_info.plugin_name,
+                plugin_info.plugin_state,
+            )
+            #: the version is not marked as read here, this worker may have
+            #: missed a change published meanwhile under the same version
+            self.state_sync.set(STATE_SYNC_KEY, uuid4().hex)
+
+    def __sync_apps(self):
+        """Update the template search path and filters of the initialized
+        apps to the current registry, and clear their template cache.
+
+        .. versionadded:: 3.11.0
+        """
+        filters = {}
+        for name, func in self.__registry.filters:
+            filters.setdefault(name, func)
+        for app, tpl_loader in list(self.__apps.items()):
+            tpl_loader.searchpath[:] = self.__registry.tpl_paths
+            env_filters = app.jinja_env.filters
+            for name, func in list(self.__added_filters.items()):
+                if filters.get(name) is not func and env_filters.get(name) is func:
+                    del env_filters[name]
+            for name, func in iteritems(filters):
+                if name not in env_filters:
+                    env_filters[name] = func
+            if app.jinja_env.cache is not None:
+                app.jinja_env.cache.clear()
+        for name, func in list(self.__added_filters.items()):
+            if filters.get(name) is not func:
+                del self.__added_filters[name]
+        for name, func in iteritems(filters):
+            self.__added_filters.setdefault(name, func)
 
     def __touch_file(self, filename):
         """Create an empty file"""
         with open(filename, "w") as fd:
             fd.write("")
 
+    def __build_assets_manifest(self, plugin_info: META):
+        """Hash the static files of a plugin and record the prebuilt
+        compressed siblings, look like {filename: (hash, ("br", "gzip"))}
+
+        .. versionadded:: 3.11.0
+        """
+        manifest = {}
+        ats_path = plugin_info.plugin_ats_path
+        for root, _, files in walk(ats_path):
+            for f in files:
+                if f.endswith(PRECOMPRESSED_SUFFIXES):
+                    continue
+                name = relpath(join(root, f), ats_path).replace("\\", "/")
+                encodings = tuple(
+                    enc
+                    for enc, suffix in iteritems(PRECOMPRESSED_ENCODINGS)
+                    if f + suffix in files
+                )
+                manifest[name] = (hash_file(join(root, f)), encodings)
+        self._assets_manifest[plugin_info.plugin_name] = manifest
+        self._url_version += 1
+        self.logger.debug(
+            "Hash %d static files of %s" % (len(manifest), plugin_info.plugin_name)
+        )
+
     def _send_plugin_static_file(self, plugin_name, filename):
-        try:
-            p = self.get_plugin_info(plugin_name)
-        except PluginError:
+        """Send the static file of a plugin.
+
+        .. versionchanged:: 3.11.0
+            Strong ETag, immutable Cache-Control and precompressed siblings
+            if :attr:`static_fingerprint` is enabled.
+        """
+        p = self.__registry.by_name.get(plugin_name)
+        if p is None:
             return abort(404)
-        else:
+        asset = self._assets_manifest.get(plugin_name, {}).get(filename)
+        if asset is None:
             return send_from_directory(p.plugin_ats_path, filename)
+        digest, encodings = asset
+        max_age = None
+        if request.args.get("v") == digest[:FINGERPRINT_LENGTH]:
+            max_age = IMMUTABLE_MAX_AGE
+        encoding = None
+        for enc in encodings:
+            if request.accept_encodings[enc]:
+                encoding = enc
+                break
+        if encoding:
+            resp = send_from_directory(
+                p.plugin_ats_path,
+                filename + PRECOMPRESSED_ENCODINGS[encoding],
+                mimetype=guess_type(filename)[0] or "application/octet-stream",
+                etag="%s-%s" % (digest, encoding),
+                max_age=max_age,
+            )
+            # the type comes from the original file, and the sibling's
+            # name must not leak out as a download name
+            resp.headers.pop("Content-Disposition", None)
+            resp.headers["Content-Encoding"] = encoding
+        else:
+            resp = send_from_directory(
+                p.plugin_ats_path, filename, etag=digest, max_age=max_age
+            )
+        if encodings:
+            resp.vary.add("Accept-Encoding")
+        if max_age:
+            resp.cache_control.immutable = True
+        return resp
 
     def emit_tep(self, tep, typ="all", **context):
         """Emit a tep and get the tep data(html code) with
-        :func:`flask.render_template` or :func:`flask.render_template_string`
+        :func:`flask.render_template`, the code teps are compiled once
+        and kept in a bounded cache.
 
         Please use this function in the template file or code.
         The emit_tep needs to be defined by yourself.
@@ -1180,36 +2260,78 @@ class PluginManager(object):
         :param context: Keyword params, additional data passed to the template
 
         :returns: html code with :class:`~flask.Markup`.
+
+        .. versionchanged:: 3.11.0
+            The code teps are compiled once with ``jinja_env.from_string``
+            and cached by (plugin_name, tep), only the requested typ is rendered.
+            With ``stpl``, the order is precomputed by :class:`PluginRegistry`
+            and a numeric sort-field sorts by its value.
+            The result of a cacheable tep (see :meth:`_tep_handler`) is cached.
         """
-        tep_result = self.get_enabled_teps.get(tep) or dict(cod=[], fil=[])
-        #: Disposable template sequence
-        if self.stpl is True:
-
-            def _sort_refresh(tep_typ):
-                func = sorted(
-                    tep_result[tep_typ],
-                    key=lambda x: x.split("@")[0],
-                    reverse=self.stpl_reverse,
-                )
-                return map(lambda tpl: tpl.split("@")[-1], func)
+        tep_result = self.__registry.tep_entries.get(tep) or dict(cod=(), fil=())
+        #: Already sorted by the registry if stpl is enabled
+        fils = tep_result["fil"]
+        cods = tep_result["cod"]
+        typ = "all" if typ not in ("fil", "cod") else typ
+        mtf = mtc = Markup("")
+        if typ != "cod":
+            mtf = Markup(
+                "".join([self.__render_tep(tep, "fil", n, i, context) for n, i in fils])
+            )
+        if typ != "fil":
+            mtc = Markup(
+                "".join([self.__render_tep(tep, "cod", n, i, context) for n, i in cods])
+            )
+        return mtf + mtc
 
-            tep_result["fil"] = _sort_refresh("fil")
-            tep_result["cod"] = _sort_refresh("cod")
+    def __render_tep(
+        self, tep: str, typ: str, plugin_name: str, tpl: str, context: Dict[str, Any]
+    ) -> str:
+        """Render a tep of a plugin, the cacheable tep looks up
+        :attr:`_tep_fragments` first.
 
-        mtf = Markup(
-            "".join([render_template(i, **context) for i in tep_result["fil"]])
-        )
-        mtc = Markup(
-            "".join([render_template_string(i, **context) for i in tep_result["cod"]])
+        .. versionadded:: 3.11.0
+        """
+        if typ == "cod":
+            tpl = self.__get_code_tpl(tep, plugin_name, tpl)
+        rule = self.__registry.tep_caches.get((plugin_name, tep))
+        if rule is None:
+            return render_template(tpl, **context)
+        ttl, keys = rule
+        key = (plugin_name, tep, typ, tuple(context.get(k) for k in keys))
+        try:
+            rv = self._tep_fragments.get(key)
+        except TypeError:
+            #: unhashable context value, can not be cached
+            return render_template(tpl, **context)
+        if rv is None:
+            rv = Markup(render_template(tpl, **context))
+            self._tep_fragments.set(key, rv, ttl)
+        return rv
+
+    @property
+    def tep_cache_stats(self) -> Dict[str, Dict[str, int]]:
+        """Get the statistics of the compiled code teps and the rendered
+        cacheable teps, look like {compiled={hits=,misses=,...}, fragments={}}
+
+        .. versionadded:: 3.11.0
+        """
+        return dict(
+            compiled=self._tep_cache.stats, fragments=self._tep_fragments.stats
         )
 
-        typ = "all" if typ not in ("fil", "cod") else typ
-        if typ == "fil":
-            return mtf
-        elif typ == "cod":
-            return mtc
-        else:
-            return mtf + mtc
+    def __get_code_tpl(self, tep: str, plugin_name: str, code: str) -> Template:
+        """Get the compiled template of a code tep, compile it on first use.
+
+        .. versionadded:: 3.11.0
+        """
+        env = current_app.jinja_env
+        key = (plugin_name, tep)
+        tpl = self._tep_cache.get(key)
+        if tpl is None or tpl.environment is not env:
+            tpl = env.from_string(code)
+            self._tep_cache.set(key, tpl)
+        return tpl
 
     def emit_assets(self, plugin_name, filename, _raw=False, _external=False):
         """Get the static file in template context.
@@ -1275,13 +2397,55 @@ class PluginManager(object):
 
         .. versionchanged:: 3.6.0
             Add _external, pass to :func:`flask.url_for`
+
+        .. versionchanged:: 3.11.0
+            Add the content hash as `v` query if :attr:`static_fingerprint`
+            is enabled, like ``/assets/plugin/css/demo.css?v=0123456789ab``
+
+        .. versionchanged:: 3.11.0
+            The recent results are memoized per app, and reset when the rules
+            or the static files of plugins are changed
         """
+        app = current_app._get_current_object()  # type: ignore
+        #: The url only depends on the url map and the url adapter,
+        #: that is, the request (script root and host) or the app config.
+        if has_request_context():
+            ctx = (request.script_root, request.host_url if _external else None)
+        else:
+            ctx = (
+                app.config["SERVER_NAME"],
+                app.config["APPLICATION_ROOT"],
+                app.config["PREFERRED_URL_SCHEME"],
+            )
+        key = (plugin_name, filename, _raw, _external, ctx)
+        #: Reset the memo table when the rules or static files are changed,
+        #: it is bounded because the host of request comes from the client
+        memo = self._assets_memo.get(app)
+        if memo is None or memo[0] != self._url_version:
+            memo = self._assets_memo[app] = (
+                self._url_version,
+                LRUCache(ASSETS_MEMO_SIZE),
+            )
+        rv = memo[1].get(key)
+        if rv is not None:
+            return rv
+
+        values = {}
+        asset = self._assets_manifest.get(plugin_name, {}).get(filename)
+        if asset is not None:
+            values["v"] = asset[0][:FINGERPRINT_LENGTH]
         uri = url_for(
             self.static_endpoint,
             plugin_name=plugin_name,
             filename=filename,
             _external=_external,
+            **values,
         )
+        rv = self.__assets_tag(uri, filename, _raw)
+        memo[1].set(key, rv)
+        return rv
+
+    def __assets_tag(self, uri: str, filename: str, _raw: bool = False) -> Markup:
         if _raw is not True:
             if filename.endswith(".css"):
                 uri = '<link rel="stylesheet" href="%s">' % uri
@@ -1289,6 +2453,145 @@ class PluginManager(object):
                 uri = '<script src="%s"></script>' % uri
         return Markup(uri)
 
+    def add_bundle(self, name: str, assets: Sequence[Sequence[str]]):
+        """Declare a bundle, which concatenates several static files of
+        the plugins into one css or js file.
+
+        :param name: the bundle name, it must end with `.css` or `.js`.
+
+        :param assets: the static files, like [(plugin_name, filename), ...],
+                       the filename should have the same suffix as name.
+
+        :raises PluginError: if the name or assets is invalid.
+
+        .. versionadded:: 3.11.0
+        """
+        if not isinstance(name, string_types) or not name.endswith(BUNDLE_SUFFIXES):
+            raise PluginError("Invalid bundle name %s" % name)
+        if not isinstance(assets, (list, tuple)) or not assets:
+            raise PluginError("Invalid bundle assets for %s" % name)
+        suffix = splitext(name)[-1]
+        pairs = []
+        for asset in assets:
+            if (
+                not isinstance(asset, (list, tuple))
+                or len(asset) != 2
+                or not asset[1].endswith(suffix)
+            ):
+                raise PluginError("Invalid bundle asset %s for %s" % (asset, name))
+            pairs.append(tuple(asset))
+        self._bundles[name] = tuple(pairs)
+        self._built_bundles.pop(name, None)
+
+    def __build_bundle(self, name: str) -> Tuple[bytes, str]:
+        """Build a bundle on first use and keep it in memory until the
+        plugin states change, the files of the disabled plugins are skipped.
+
+        In a css bundle, the relative url() are rebased to the static url of
+        their plugin, the @charset rules are removed (the bundle is utf-8)
+        and the @import rules are moved to the top of the bundle.
+
+        :raises PluginError: if the bundle or the static file is not found.
+
+        .. versionadded:: 3.11.0
+        """
+        try:
+            return self._built_bundles[name]
+        except KeyError:
+            pass
+        try:
+            assets = self._bundles[name]
+        except KeyError:
+            raise PluginError("No bundle named %s was found" % name)
+        #: js files may not end with a semicolon
+        sep = b";\n" if name.endswith(".js") else b"\n"
+        is_css = name.endswith(".css")
+        registry = self.__registry
+        imports: List[bytes] = []
+        chunks = []
+        for plugin_name, filename in assets:
+            p = self.get_plugin_info(plugin_name)
+            if p.plugin_name not in registry.enabled_names:
+                self.logger.debug(
+                    "Skip the bundle file %s of disabled %s" % (filename, plugin_name)
+                )
+                continue
+            path = safe_join(p.plugin_ats_path, filename)
+            if not path or not isfile(path):
+                raise PluginError(
+                    "The bundle file %s of %s was not found" % (filename, plugin_name)
+                )
+            with open(path, "rb") as fd:
+                data = fd.read()
+            if is_css:
+                base = posixpath.dirname(filename)
+                rules, data = _rebase_css(
+                    data, "%s/%s" % (p.plugin_name, base + "/" if base else "")
+                )
+                imports.extend(rules)
+            chunks.append(data.strip())
+        content = b"".join(imports) + sep.join(chunks) + b"\n"
+        bundle = (content, hash_data(content))
+        if registry is self.__registry:
+            #: not built from the plugins of a replaced registry
+            self._built_bundles[name] = bundle
+        return bundle
+
+    def build_bundles(self):
+        """Build all declared bundles ahead of time.
+
+        .. versionadded:: 3.11.0
+        """
+        for name in self._bundles:
+            self.__build_bundle(name)
+
+    def _send_bundle_file(self, name):
+        """Send a bundle from memory.
+
+        .. versionadded:: 3.11.0
+        """
+        try:
+            content, digest = self.__build_bundle(name)
+        except PluginError:
+            return abort(404)
+        resp = current_app.response_class(
+            content, mimetype=guess_type(name)[0] or "application/octet-stream"
+        )
+        resp.set_etag(digest)
+        if request.args.get("v") == digest[:FINGERPRINT_LENGTH]:
+            resp.cache_control.public = True
+            resp.cache_control.max_age = IMMUTABLE_MAX_AGE
+            resp.cache_control.immutable = True
+        else:
+            resp.cache_control.no_cache = True
+        return resp.make_conditional(request)
+
+    def emit_bundle(self, name, _raw=False, _external=False):
+        """Get the bundle declared by :meth:`add_bundle` in template context,
+        it is similar to :meth:`emit_assets`, but only one tag is generated for
+        several static files, with the content hash as `v` query, like this::
+
+            <link rel="stylesheet" href="/assets/_bundles/common.css?v=0123456789ab">
+
+        :param name: the bundle name
+
+        :param _raw: if True, not to parse automatically, only generate uri.
+
+        :param _external: _external parameter passed to url_for
+
+        :returns: html code with :class:`~flask.Markup`.
+
+        .. versionadded:: 3.11.0
+        """
+        _, digest = self.__build_bundle(name)
+        uri = url_for(
+            self.static_endpoint + "_bundle",
+            name=name,
+            v=digest[:FINGERPRINT_LENGTH],
+            _external=_external,
+        )
+        return self.__assets_tag(uri, name, _raw)
+
     def emit_config(self, conf_name):
         """Get configuration information in the template context."""
         try:
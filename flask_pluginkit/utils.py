@@ -9,17 +9,37 @@ Some tool classes and functions.
 :license: BSD 3-Clause, see LICENSE for more details.
 """
 
+import os
 import sys
+import asyncio
+import ast
+import atexit
 import json
 import shelve
+import hashlib
+import heapq
+import pickle
+import zlib
 from re import compile
-from functools import cmp_to_key
-from os.path import join, abspath, isdir
-from tempfile import gettempdir
-from collections import deque
-from time import time
+from functools import cmp_to_key, partial
+from copy import copy
+from contextlib import contextmanager
+from os import stat, replace, getpid
+from os.path import join, abspath, isdir, dirname
+from stat import S_ISDIR
+from tempfile import gettempdir, mkstemp
+from collections import deque, OrderedDict
+from threading import RLock, Event, Thread
+from time import time, sleep, monotonic
 from subprocess import call, check_output
-from typing import List, Any, Optional, Dict
+from importlib import import_module
+from importlib.metadata import distributions
+from typing import List, Any, Optional, Dict, Set, Tuple, Union
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
 
 from flask import Response, jsonify
 from markupsafe import Markup
@@ -37,6 +57,24 @@ from .version import __version__
 
 comma_pat = compile(r"\s*,\s*")
 egg_pat = compile(r"egg=([\w-]+)")
+name_pat = compile(r"[-_.]+")
+
+#: The plugin metadata that can be read by :func:`parse_plugin_meta`
+PLUGIN_META_NAMES = (
+    "__plugin_name__",
+    "__version__",
+    "__author__",
+    "__description__",
+    "__url__",
+    "__license__",
+    "__license_file__",
+    "__readme_file__",
+    "__state__",
+    "__appversion__",
+)
+
+#: Cache of :func:`installed_packages`, like {target_dir: {name: version}}
+_installed_packages_cache: Dict[str, Dict[str, str]] = {}
 
 
 def isValidPrefix(prefix: str, allow_none: bool = False) -> bool:
@@ -121,6 +159,9 @@ class BaseStorage(object):
     #: The default index, as the only key, you can override it.
     DEFAULT_INDEX: str = "flask_pluginkit_dat"
 
+    #: The index of a namespace, formatted by (index, name)
+    NAMESPACE_FORMAT: str = "%s:%s"
+
     @property
     def index(self):
         """Get the final index
@@ -150,6 +191,25 @@ class BaseStorage(object):
     def remove(self, key: str) -> Any:
         raise NotImplementedError("Please override the list method")
 
+    def _clone(self, index: str) -> "BaseStorage":
+        """Copy the storage to another index, the subclasses reset the
+        state that must not be shared.
+        """
+        storage = copy(self)
+        storage.index = index
+        return storage
+
+    def namespace(self, name: str) -> "BaseStorage":
+        """Get a storage of the same type and options whose keys are
+        isolated from this one, it is stored in the index formatted by
+        :attr:`NAMESPACE_FORMAT`.
+
+        .. versionadded:: 3.11.0
+        """
+        if not name or not isinstance(name, string_types) or "/" in name:
+            raise ParamError("Invalid namespace")
+        return self._clone(self.NAMESPACE_FORMAT % (self.index, name))
+
     def __getitem__(self, key: str):
         if hasattr(self, "get"):
             return self.get(key)
@@ -178,11 +238,445 @@ class BaseStorage(object):
     __repr__ = __str__
 
 
-class LocalStorage(BaseStorage):
-    """Local file system storage based on the shelve module."""
+class BaseCodec(object):
+    """The base class of the value codecs of the storages, override
+    `encode` and `decode`.
+
+    .. versionadded:: 3.11.0
+    """
+
+    def encode(self, value: Any) -> Union[str, bytes]:
+        raise NotImplementedError("Please override the encode method")
+
+    def decode(self, data: Union[str, bytes]) -> Any:
+        raise NotImplementedError("Please override the decode method")
+
+
+class JsonCodec(BaseCodec):
+    """Encode the value by json, it is the default of :class:`RedisStorage`
+
+    .. versionadded:: 3.11.0
+    """
+
+    def encode(self, value: Any) -> str:
+        return json.dumps(value)
+
+    def decode(self, data: Union[str, bytes]) -> Any:
+        if not isinstance(data, text_type):
+            data = data.decode("utf-8")
+        return json.loads(data)
+
+
+class PickleCodec(BaseCodec):
+    """Encode the value by pickle, it is compact and faster than json for
+    the large nested values, and supports bytes, datetime, set and the
+    other picklable types, the data above `compress_threshold` bytes is
+    compressed by zlib. The data encoded by json is still decoded, so a
+    storage can switch to this codec.
+
+    Unpickling can run arbitrary code, only use it with a trusted redis.
+
+    :param int compress_threshold: the minimum size in bytes to compress,
+                                   0 is never.
+
+    :param int level: the zlib compression level
+
+    .. versionadded:: 3.11.0
+    """
+
+    #: The first byte of the plain or compressed pickle data
+    PLAIN: bytes = b"p"
+    COMPRESSED: bytes = b"z"
+
+    def __init__(self, compress_threshold: int = 1024, level: int = 6):
+        if compress_threshold < 0:
+            raise ParamError("Invalid compress_threshold")
+        self.compress_threshold = compress_threshold
+        self.level = level
+
+    def encode(self, value: Any) -> bytes:
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if self.compress_threshold and len(data) >= self.compress_threshold:
+            return self.COMPRESSED + zlib.compress(data, self.level)
+        return self.PLAIN + data
+
+    def decode(self, data: Union[str, bytes]) -> Any:
+        if isinstance(data, text_type):
+            return json.loads(data)
+        head = data[:1]
+        if head == self.PLAIN:
+            return pickle.loads(data[1:])
+        if head == self.COMPRESSED:
+            return pickle.loads(zlib.decompress(data[1:]))
+        return json.loads(data.decode("utf-8"))
+
+
+#: The shelves kept open by the persistent local storages of this process,
+#: like {abspath: _ShelfHandle}
+_shelf_pool: Dict[str, "_ShelfHandle"] = {}
+_shelf_pool_lock = RLock()
+_shelf_pool_pid = getpid()
+
+#: The placeholder of a missing or expired entry
+_MISSING = object()
+
+#: The placeholder of a key not in the cache
+_UNCACHED = object()
+
+#: The reserved key of :class:`ExpiredLocalStorage` to save the expire time
+#: of the keys with a ttl, it is also the prefix of the bucket keys
+_EXPIRY_KEY = "__pluginkit_expiry__"
+
+#: The width in seconds of the time buckets of the expiry index
+_EXPIRY_BUCKET = 60
+
+#: The seconds that a call of the shelve storages waits for the lock of
+#: the file
+_SHELF_LOCK_TIMEOUT = 5
+
+
+class _ExpiryIndex(object):
+    """The expire time of the keys with a ttl, grouped in time buckets of
+    :data:`_EXPIRY_BUCKET` seconds. Each bucket is a reserved key of the
+    shelf, like {key: etime}, and the table of the bucket sizes, like
+    {bucket: size}, is saved under :data:`_EXPIRY_KEY`. So a write only
+    rewrites the bucket of the key and the table, and the expired keys are
+    found in the past buckets, the buckets are loaded on demand.
+    """
+
+    def __init__(self, table: Dict[int, int]):
+        self.table = table
+        #: The loaded buckets, like {bucket: {key: etime}}
+        self.buckets: Dict[int, Dict[str, int]] = {}
+        #: The buckets saved in the shelf, and the changed ones
+        self.stored: Set[int] = set(table)
+        self.changed: Set[int] = set()
+        #: Changed since loaded from the shelf
+        self.dirty = False
+
+    @staticmethod
+    def bucket_key(bucket: int) -> str:
+        return "%s:%d" % (_EXPIRY_KEY, bucket)
+
+    @classmethod
+    def load(cls, db: shelve.Shelf) -> "_ExpiryIndex":
+        table = db.get(_EXPIRY_KEY)
+        if table is not None and all(isinstance(b, int) for b in table):
+            return cls(table)
+        if table is None:
+            #: the file is written before the index, scan it once
+            etimes = {
+                k: v["etime"]
+                for k, v in db.items()
+                if not k.startswith(_EXPIRY_KEY) and v["etime"]
+            }
+        else:
+            #: the previous index, like {key: etime}
+            etimes = table
+        index = cls({})
+        for key, etime in iteritems(etimes):
+            index.set(db, key, etime)
+        index.dirty = table is not None or bool(etimes)
+        return index
+
+    def save(self, db: shelve.Shelf):
+        for bucket in self.changed:
+            keys = self.buckets.get(bucket)
+            if keys:
+                db[self.bucket_key(bucket)] = keys
+                self.stored.add(bucket)
+            elif bucket in self.stored:
+                db.pop(self.bucket_key(bucket), None)
+                self.stored.discard(bucket)
+        db[_EXPIRY_KEY] = self.table
+        self.changed.clear()
+        self.dirty = False
+
+    def _bucket(self, db: shelve.Shelf, bucket: int) -> Dict[str, int]:
+        keys = self.buckets.get(bucket)
+        if keys is None:
+            keys = {}
+            if bucket in self.stored:
+                keys = db.get(self.bucket_key(bucket)) or {}
+            self.buckets[bucket] = keys
+        return keys
+
+    def _changed(self, bucket: int, keys: Dict[str, int]):
+        if keys:
+            self.table[bucket] = len(keys)
+        else:
+            self.table.pop(bucket, None)
+        self.changed.add(bucket)
+        self.dirty = True
+
+    def set(self, db: shelve.Shelf, key: str, etime: int, old: int = 0):
+        """Index the etime of key, `old` is its previous etime"""
+        if old:
+            self.remove(db, key, old)
+        if etime:
+            bucket = etime // _EXPIRY_BUCKET
+            keys = self._bucket(db, bucket)
+            keys[key] = etime
+            self._changed(bucket, keys)
+
+    def remove(self, db: shelve.Shelf, key: str, etime: int):
+        bucket = etime // _EXPIRY_BUCKET
+        if bucket in self.table:
+            keys = self._bucket(db, bucket)
+            if keys.pop(key, None) is not None:
+                self._changed(bucket, keys)
+
+    def expired(self, db: shelve.Shelf, now: float) -> List[Tuple[int, str]]:
+        """Get the (etime, key) of the expired keys, the earliest first,
+        only the past buckets are loaded.
+        """
+        rv: List[Tuple[int, str]] = []
+        for bucket in sorted(self.table):
+            if now <= bucket * _EXPIRY_BUCKET:
+                break
+            keys = self._bucket(db, bucket)
+            rv.extend(sorted((e, k) for k, e in iteritems(keys) if now > e))
+        return rv
+
+    def count_expired(self, db: shelve.Shelf, now: float) -> int:
+        """Count the expired keys by the table, only the bucket of now
+        is scanned.
+        """
+        count = 0
+        for bucket, size in iteritems(self.table):
+            if now > (bucket + 1) * _EXPIRY_BUCKET - 1:
+                count += size
+            elif now > bucket * _EXPIRY_BUCKET:
+                keys = self._bucket(db, bucket)
+                count += sum(1 for etime in keys.values() if now > etime)
+        return count
+
+    def pop_expired(self, db: shelve.Shelf, now: float, limit: int) -> List[str]:
+        """Remove at most `limit` expired keys from the index, return them"""
+        expired = self.expired(db, now)[:limit]
+        for etime, key in expired:
+            self.remove(db, key, etime)
+        return [key for _, key in expired]
+
+
+def _lock_shelf(
+    path: str, exclusive: bool, timeout: Optional[float] = None
+) -> Optional[int]:
+    """Lock the sibling `<path>.lock` file of a shelve file, a persistent
+    handle holds the exclusive lock while it is open, the other calls
+    hold the exclusive lock to write or the shared lock to read.
+
+    :param timeout: seconds to wait, default is :data:`_SHELF_LOCK_TIMEOUT`
+    :returns: the locked file descriptor, None without fcntl
+    :raises PluginError: the lock is not acquired in `timeout` seconds
+    """
+    if fcntl is None:
+        return None
+    if timeout is None:
+        timeout = _SHELF_LOCK_TIMEOUT
+    fd = os.open(path + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+    operation = (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) | fcntl.LOCK_NB
+    deadline = monotonic() + timeout
+    delay = 0.001
+    while True:
+        try:
+            fcntl.flock(fd, operation)
+            return fd
+        except BlockingIOError:
+            if monotonic() >= deadline:
+                os.close(fd)
+                raise PluginError(
+                    "The shelve file %s is kept open persistently by another "
+                    "process, or locked by a long call" % path
+                )
+            sleep(delay)
+            delay = min(delay * 2, 0.05)
+
+
+def _unlock_shelf(fd: Optional[int]):
+    if fd is not None:
+        #: closing the descriptor releases the flock
+        os.close(fd)
+
+
+class _ShelfHandle(object):
+    """A shelf opened once per process and shared by the persistent
+    storages of the same path, the writes are synced in batches.
+
+    The handle keeps the file index in memory, so it owns the file by an
+    exclusive lock, the other processes refuse to open the file until the
+    handle is closed, instead of losing the writes of each other.
+    """
+
+    def __init__(self, path: str, sync_every: int, sync_interval: float):
+        self.lock = RLock()
+        #: wait for the calls of other processes that are in progress
+        self.lock_fd = _lock_shelf(path, exclusive=True, timeout=1)
+        try:
+            self.db = shelve.open(filename=path, flag="c", protocol=2, writeback=False)
+        except BaseException:
+            _unlock_shelf(self.lock_fd)
+            raise
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.dirty = 0
+        self.synced = time()
+        #: The :class:`_ExpiryIndex` of :class:`ExpiredLocalStorage`, it is
+        #: saved with the batched sync
+        self.expiry: Optional[_ExpiryIndex] = None
+
+    def written(self, count: int = 1):
+        self.dirty += count
+        if self.dirty >= self.sync_every or time() - self.synced >= self.sync_interval:
+            self.sync()
+
+    def sync(self):
+        with self.lock:
+            if self.expiry is not None and self.expiry.dirty:
+                self.expiry.save(self.db)
+                self.dirty += 1
+            if self.dirty:
+                self.db.sync()
+            self.dirty = 0
+            self.synced = time()
+
+    def close(self):
+        with self.lock:
+            try:
+                self.sync()
+                self.db.close()
+            finally:
+                _unlock_shelf(self.lock_fd)
+
+    def discard(self):
+        """Drop the handle inherited by a forked child without writing
+        anything, the parent process still owns the file.
+        """
+        raw = getattr(self.db, "dict", None)
+        if hasattr(raw, "_modified"):
+            #: dbm.dumb rewrites its whole index on close
+            raw._modified = False
+        try:
+            self.db.close()
+        except Exception:
+            pass
+        #: the lock is kept by the descriptor of the parent
+        _unlock_shelf(self.lock_fd)
+
+
+def _reset_shelf_pool():
+    global _shelf_pool, _shelf_pool_lock, _shelf_pool_pid
+    inherited = list(_shelf_pool.values())
+    _shelf_pool = {}
+    _shelf_pool_lock = RLock()
+    _shelf_pool_pid = getpid()
+    for handle in inherited:
+        handle.discard()
+
+
+def _get_shelf(
+    path: str, sync_every: int, sync_interval: float, create: bool = True
+) -> Optional[_ShelfHandle]:
+    if _shelf_pool_pid != getpid():
+        _reset_shelf_pool()
+    with _shelf_pool_lock:
+        handle = _shelf_pool.get(path)
+        if handle is None and create:
+            handle = _ShelfHandle(path, sync_every, sync_interval)
+            _shelf_pool[path] = handle
+        return handle
+
+
+def _close_shelf_pool():
+    if _shelf_pool_pid != getpid():
+        return
+    with _shelf_pool_lock:
+        while _shelf_pool:
+            _shelf_pool.popitem()[1].close()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_shelf_pool)
+atexit.register(_close_shelf_pool)
+
+
+class StorageTransaction(object):
+    """The writes of :meth:`LocalStorage.transaction` or
+    :meth:`RedisStorage.transaction`, they are buffered
+    and applied together when the block exits without an exception,
+    otherwise discarded. The reads see the buffered writes.
+
+    .. versionadded:: 3.11.0
+    """
+
+    def __init__(self, storage: BaseStorage):
+        self._storage = storage
+        self._pending: Dict[str, Any] = {}
+        self._removed: Set[str] = set()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        key = self._storage._key(key)
+        if key in self._pending:
+            value = self._storage._decode(self._pending[key])
+            return default if value is _MISSING else value
+        if key in self._removed:
+            return default
+        return self._storage.get(key, default)
+
+    def set(self, key: str, value: Any, **options: Any):
+        """Set a key, the options are the same as the storage's `set`"""
+        key = self._storage._key(key)
+        self._pending[key] = self._storage._encode(value, **options)
+        self._removed.discard(key)
+
+    def remove(self, key: str):
+        key = self._storage._key(key)
+        self._pending.pop(key, None)
+        self._removed.add(key)
+
+    def _apply(self, db: shelve.Shelf) -> int:
+        for key in self._removed:
+            self._storage._delete(db, key)
+        for key, entry in iteritems(self._pending):
+            self._storage._put(db, key, entry)
+        return len(self._removed) + len(self._pending)
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __getitem__(self, key: str):
+        return self.get(key)
+
+    def __setitem__(self, key: str, value: Any):
+        self.set(key, value)
+
+    def __delitem__(self, key: str):
+        self.remove(key)
+
+
+class _ShelfStorage(BaseStorage):
+    """The shelve file handling of :class:`LocalStorage` and
+    :class:`ExpiredLocalStorage`.
+    """
 
-    def __init__(self, path: Optional[str] = None):
+    #: The namespace is a sibling file
+    NAMESPACE_FORMAT: str = "%s.%s"
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        persistent: bool = False,
+        sync_every: int = 100,
+        sync_interval: float = 1,
+        codec: Optional[BaseCodec] = None,
+    ):
         self.COVERED_INDEX = path or join(gettempdir(), self.DEFAULT_INDEX)
+        #: The codec of the values, by default shelve pickles them as is
+        self.codec = codec
+        #: Keep one open handle per process
+        self.persistent = persistent
+        self.sync_every = max(1, int(sync_every))
+        self.sync_interval = sync_interval
 
     def _open(self, flag: str = "c") -> shelve.Shelf:
         return shelve.open(
@@ -192,28 +686,185 @@ class LocalStorage(BaseStorage):
             writeback=False,
         )
 
-    @property
-    def list(self) -> Dict[str, Any]:
-        """list all data
+    def _handle(self) -> _ShelfHandle:
+        return _get_shelf(  # type: ignore
+            abspath(self.index), self.sync_every, self.sync_interval
+        )
 
-        :returns: dict
+    def _shared_handle(self) -> Optional[_ShelfHandle]:
+        """The persistent handle of the path in this process, the storage
+        that is not persistent also uses it if it is open.
         """
-        db = None
+        if self.persistent:
+            return self._handle()
+        return _get_shelf(
+            abspath(self.index), self.sync_every, self.sync_interval, create=False
+        )
+
+    @contextmanager
+    def _db(self, write: bool = False):
+        """Yield the shelf, or None if it can not be opened for reading.
+        On success of a write, it is counted for the batched sync.
+
+        :raises PluginError: the file is kept open by a persistent handle
+                             of another process
+        """
+        handle = self._shared_handle()
+        if handle is not None:
+            with handle.lock:
+                yield handle.db
+                if write:
+                    handle.written()
+            return
         try:
-            db = self._open(flag="r")
-        except Exception:
-            return dict()
-        else:
-            return dict(db)
+            lock_fd = _lock_shelf(abspath(self.index), exclusive=write)
+        except OSError:
+            if write:
+                raise
+            yield None
+            return
+        try:
+            try:
+                db = self._open(flag="c" if write else "r")
+            except Exception:
+                if write:
+                    raise
+                db = None
+            try:
+                yield db
+            finally:
+                if db is not None:
+                    db.close()
         finally:
-            if db:
-                db.close()
+            _unlock_shelf(lock_fd)
 
-    def __ck(self, key: str) -> str:
+    def _key(self, key: str) -> str:
         if not isinstance(key, text_type):
             key = key.decode("utf-8")
         return key
 
+    def _encode(self, value: Any, **options: Any) -> Any:
+        return value if self.codec is None else self.codec.encode(value)
+
+    def _decode(self, entry: Any) -> Any:
+        return entry if self.codec is None else self.codec.decode(entry)
+
+    def _put(self, db: shelve.Shelf, key: str, entry: Any):
+        db[key] = entry
+
+    def _delete(self, db: shelve.Shelf, key: str):
+        db.pop(key, None)
+
+    @contextmanager
+    def transaction(self):
+        """Group the reads and writes, the writes are applied together
+        and synced once when the block exits, or discarded if it raises.
+        With `persistent`, the other threads wait for the block::
+
+            with storage.transaction() as txn:
+                txn["count"] = (txn.get("count") or 0) + 1
+
+        :returns: :class:`StorageTransaction`
+
+        .. versionadded:: 3.11.0
+        """
+        txn = StorageTransaction(self)
+        handle = self._shared_handle()
+        if handle is not None:
+            with handle.lock:
+                yield txn
+                handle.written(txn._apply(handle.db))
+                handle.sync()
+        else:
+            yield txn
+            with self._db(write=True) as db:
+                txn._apply(db)
+
+    def sync(self):
+        """Write the pending writes of the persistent handle to disk
+
+        .. versionadded:: 3.11.0
+        """
+        if self.persistent:
+            self._handle().sync()
+
+    def close(self):
+        """Close the persistent handle of this process, it is reopened
+        on the next call.
+
+        .. versionadded:: 3.11.0
+        """
+        if self.persistent:
+            path = abspath(self.index)
+            with _shelf_pool_lock:
+                handle = _shelf_pool.pop(path, None)
+            if handle is not None:
+                handle.close()
+
+    def __contains__(self, key: str) -> bool:
+        """Check the key without loading the value
+
+        .. versionadded:: 3.11.0
+        """
+        with self._db() as db:
+            return db is not None and self._key(key) in db
+
+    def __len__(self):
+        """Count the keys without loading the values
+
+        .. versionchanged:: 3.11.0
+        """
+        with self._db() as db:
+            return 0 if db is None else len(db)
+
+
+class LocalStorage(_ShelfStorage):
+    """Local file system storage based on the shelve module.
+
+    :param path: the shelve file, default is `flask_pluginkit_dat` in
+                 the temporary directory.
+
+    :param persistent: keep the file open in the process, see below.
+
+    :param sync_every: with `persistent`, sync after the number of writes.
+
+    :param sync_interval: with `persistent`, sync when the seconds have
+                          passed since the last sync.
+
+    :param codec: encode the values by the :class:`BaseCodec`, e.g.
+                  :class:`PickleCodec` to compress the large values.
+
+    By default, each call opens and closes the shelve file. With
+    `persistent`, the file is opened once per process and shared by the
+    storages of the same path, the calls are serialized by a lock, the
+    writes are synced to disk every `sync_every` writes or after
+    `sync_interval` seconds (checked on write), and at exit.
+
+    The persistent handle keeps the file index in memory, so it owns the
+    file by an exclusive lock of the sibling `<path>.lock` file: the calls
+    of the other storages of the path in this process use the handle, and
+    the other processes, including the forked children, raise
+    :class:`~flask_pluginkit.exceptions.PluginError` until it is closed,
+    instead of losing the writes of each other.
+
+    .. versionchanged:: 3.11.0
+        Add `persistent`, `sync_every`, `sync_interval` and `codec` param,
+        add :meth:`transaction`, :meth:`sync` and :meth:`close`
+    """
+
+    @property
+    def list(self) -> Dict[str, Any]:
+        """list all data
+
+        :returns: dict
+        """
+        with self._db() as db:
+            if db is None:
+                return dict()
+            if self.codec is None:
+                return dict(db)
+            return {k: self._decode(v) for k, v in db.items()}
+
     def set(self, key: str, value: Any):
         """Set persistent data with shelve.
 
@@ -225,13 +876,8 @@ class LocalStorage(BaseStorage):
 
         :returns:
         """
-        db = None
-        try:
-            db = self._open()
-            db[self.__ck(key)] = value
-        finally:
-            if db:
-                db.close()
+        with self._db(write=True) as db:
+            db[self._key(key)] = self._encode(value)
 
     def setmany(self, **mapping: Dict[str, Any]):
         """Set more data
@@ -241,36 +887,139 @@ class LocalStorage(BaseStorage):
         .. versionadded:: 3.4.1
         """
         if mapping and isinstance(mapping, dict):
-            db = self._open()
-            for k, v in iteritems(mapping):
-                db[self.__ck(k)] = v
-            db.close()
+            with self._db(write=True) as db:
+                for k, v in iteritems(mapping):
+                    db[self._key(k)] = self._encode(v)
 
     def get(self, key: str, default: Any = None):
         """Get persistent data from shelve.
 
         :returns: data
+
+        .. versionchanged:: 3.11.0
+            Look up the key directly, the other values are not loaded.
         """
-        try:
-            value = self.list[key]
-        except KeyError:
-            return default
-        else:
-            return value
+        with self._db() as db:
+            entry = _MISSING if db is None else db.get(self._key(key), _MISSING)
+        return default if entry is _MISSING else self._decode(entry)
 
     def remove(self, key: str):
-        db = self._open()
-        del db[key]
+        """Remove the key
 
-    def __len__(self):
-        return len(self.list)
+        :raises KeyError: the key does not exist
 
+        .. versionchanged:: 3.11.0
+            The file is closed
+        """
+        with self._db(write=True) as db:
+            del db[self._key(key)]
 
-class ExpiredLocalStorage(BaseStorage):
-    """Local file system storage based on the shelve module, support exire time."""
 
-    def __init__(self, path: Optional[str] = None):
-        self.COVERED_INDEX = path or join(gettempdir(), self.DEFAULT_INDEX)
+class ExpiredLocalStorage(_ShelfStorage):
+    """Local file system storage based on the shelve module, support exire time.
+
+    The params are the same as :class:`LocalStorage`, and:
+
+    :param sweep_batch: each `set` deletes at most the number of expired
+                        keys, 0 is disabled.
+
+    The expire time of the keys with a ttl is indexed in time buckets of
+    one minute, each bucket is a reserved key of the file, so a write only
+    rewrites its bucket, `list`, `len` and `in` skip the expired entries
+    without loading them, and the expired keys are deleted in bounded
+    batches by `set`, :meth:`sweep` or the thread of :meth:`start_sweeper`.
+    With `persistent`, the index is kept in memory and saved with the sync.
+
+    .. versionchanged:: 3.11.0
+        Add `persistent`, `sync_every`, `sync_interval`, `sweep_batch` and
+        `codec` param, add :meth:`transaction`, :meth:`sync`, :meth:`close`,
+        :meth:`sweep` and :meth:`start_sweeper`
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        persistent: bool = False,
+        sync_every: int = 100,
+        sync_interval: float = 1,
+        sweep_batch: int = 10,
+        codec: Optional[BaseCodec] = None,
+    ):
+        super(ExpiredLocalStorage, self).__init__(
+            path, persistent, sync_every, sync_interval, codec
+        )
+        self.sweep_batch = max(0, int(sweep_batch))
+        self._sweeper: Optional[Thread] = None
+        self._sweeper_stop = Event()
+
+    def _clone(self, index: str) -> "ExpiredLocalStorage":
+        storage = super(ExpiredLocalStorage, self)._clone(index)
+        storage._sweeper = None
+        storage._sweeper_stop = Event()
+        return storage
+
+    @contextmanager
+    def _db(self, write: bool = False):
+        with super(ExpiredLocalStorage, self)._db(write) as db:
+            yield db
+            #: the persistent handle saves its index when syncing
+            index = getattr(db, "expiry", None)
+            if write and index is not None and index.dirty:
+                index.save(db)
+
+    def _index(self, db: shelve.Shelf) -> _ExpiryIndex:
+        handle = self._shared_handle()
+        if handle is not None:
+            if handle.expiry is None:
+                handle.expiry = _ExpiryIndex.load(db)
+            return handle.expiry
+        index = getattr(db, "expiry", None)
+        if index is None:
+            index = db.expiry = _ExpiryIndex.load(db)
+        return index
+
+    def _key(self, key: str) -> str:
+        key = super(ExpiredLocalStorage, self)._key(key)
+        if key.startswith(_EXPIRY_KEY):
+            raise ParamError("The key %s is reserved" % key)
+        return key
+
+    def _encode(self, value: Any, ttl: int = 0) -> Dict[str, Any]:
+        if not value or ttl < 0:
+            raise ParamError("Invalid key or value or ttl")
+        etime = int(time()) + ttl if ttl > 0 else 0
+        if self.codec is not None:
+            value = self.codec.encode(value)
+        return {"value": value, "etime": etime}
+
+    def _decode(self, entry: Any) -> Any:
+        if not entry:
+            return _MISSING
+        etime = entry["etime"]
+        if etime != 0 and time() > etime:
+            return _MISSING
+        return self._decode_value(entry["value"])
+
+    def _decode_value(self, value: Any) -> Any:
+        return value if self.codec is None else self.codec.decode(value)
+
+    def _put(self, db: shelve.Shelf, key: str, entry: Dict[str, Any]):
+        index = self._index(db)
+        old = db.get(key)
+        db[key] = entry
+        index.set(db, key, entry["etime"], old["etime"] if old else 0)
+
+    def _delete(self, db: shelve.Shelf, key: str):
+        index = self._index(db)
+        old = db.pop(key, None)
+        if old and old["etime"]:
+            index.remove(db, key, old["etime"])
+
+    def _sweep(self, db: shelve.Shelf, limit: int) -> int:
+        keys = self._index(db).pop_expired(db, time(), limit)
+        for key in keys:
+            db.pop(key, None)
+        return len(keys)
 
     def set(self, key: str, value: Any, ttl: int = 0):
         """Set persistent data with expired time.
@@ -279,50 +1028,204 @@ class ExpiredLocalStorage(BaseStorage):
         :param ttl: int: expired time in seconds, default is 0(no expired)
         :raises:
         """
-        if not key or not value or ttl < 0:
+        if not key:
             raise ParamError("Invalid key or value or ttl")
-        with shelve.open(self.COVERED_INDEX) as db:
-            etime = int(time()) + ttl if ttl > 0 else 0
-            db[key] = {"value": value, "etime": etime}
+        entry = self._encode(value, ttl)
+        with self._db(write=True) as db:
+            self._put(db, self._key(key), entry)
+            if self.sweep_batch:
+                self._sweep(db, self.sweep_batch)
 
-    def get(self, key: str) -> Any:
+    def get(self, key: str, default: Any = None) -> Any:
         """Gets the key value and automatically deletes and returns None if it has expired"""
-        with shelve.open(self.COVERED_INDEX) as db:
-            entry = db.get(key)
-            if not entry:
-                return None
-
-            etime = entry["etime"]
-            if etime == 0:
-                return entry["value"]
-            elif time() > etime:
-                del db[key]  # 删除过期条目
-                return None
-            return entry["value"]
+        key = self._key(key)
+        with self._db() as db:
+            entry = None if db is None else db.get(key)
+        value = self._decode(entry)
+        if value is _MISSING:
+            if entry:
+                self.remove(key)  # 删除过期条目
+            return default
+        return value
 
     def remove(self, key):
         """Remove the key from the storage"""
-        with shelve.open(self.COVERED_INDEX) as db:
+        key = self._key(key)
+        with self._db(write=True) as db:
             if key in db:
-                del db[key]
+                self._delete(db, key)
+
+    def sweep(self, limit: int = 100) -> int:
+        """Delete at most `limit` expired keys, the earliest expired first
+
+        :returns: the number of deleted keys
+
+        .. versionadded:: 3.11.0
+        """
+        with self._db(write=True) as db:
+            return self._sweep(db, limit)
+
+    def start_sweeper(self, interval: float = 60, batch: int = 100) -> Thread:
+        """Sweep the expired keys in a daemon thread every `interval`
+        seconds, in batches of `batch` keys, the lock is released between
+        the batches. Stop it by :meth:`stop_sweeper`.
+
+        .. versionadded:: 3.11.0
+        """
+        if self._sweeper is None or not self._sweeper.is_alive():
+            self._sweeper_stop.clear()
+
+            def run():
+                while not self._sweeper_stop.wait(interval):
+                    while self.sweep(batch) == batch:
+                        pass
+
+            self._sweeper = Thread(target=run, name="pluginkit-sweeper")
+            self._sweeper.daemon = True
+            self._sweeper.start()
+        return self._sweeper
+
+    def stop_sweeper(self):
+        """Stop the thread of :meth:`start_sweeper`
+
+        .. versionadded:: 3.11.0
+        """
+        self._sweeper_stop.set()
+        if self._sweeper is not None:
+            self._sweeper.join()
+            self._sweeper = None
 
     @property
     def list(self) -> Dict[str, Any]:
-        """list all data"""
-        with shelve.open(self.COVERED_INDEX) as db:
-            now = int(time())
-            # 过滤掉过期的键值对
-            valid_data = {
-                k: v for k, v in db.items() if v["etime"] > now or v["etime"] == 0
+        """list all data
+
+        .. versionchanged:: 3.11.0
+            The expired entries are skipped without being loaded
+        """
+        with self._db() as db:
+            if db is None:
+                return dict()
+            expired = {k for _, k in self._index(db).expired(db, time())}
+            return {
+                k: self._decode_value(db[k]["value"])
+                for k in db.keys()
+                if not k.startswith(_EXPIRY_KEY) and k not in expired
             }
-            return {k: v["value"] for k, v in valid_data.items()}
 
+    def __contains__(self, key: str) -> bool:
+        """Check the key is set and not expired, without loading the value
 
-class RedisStorage(BaseStorage):
-    """Use redis stand-alone storage"""
+        .. versionadded:: 3.11.0
+        """
+        key = self._key(key)
+        with self._db() as db:
+            if db is None or key not in db:
+                return False
+            return all(k != key for _, k in self._index(db).expired(db, time()))
+
+    def __len__(self):
+        """Count the keys that are not expired
 
-    def __init__(self, redis_url=None, redis_connection=None):
+        .. versionchanged:: 3.11.0
+        """
+        with self._db() as db:
+            if db is None:
+                return 0
+            index = self._index(db)
+            reserved = (_EXPIRY_KEY in db) + len(index.stored)
+            return len(db) - reserved - index.count_expired(db, time())
+
+
+class _RedisHashMixin(object):
+    """The encoding and the version key shared by the sync and async
+    redis storages.
+    """
+
+    @property
+    def version_key(self) -> str:
+        """The key incremented by each write, the "/" separator is refused
+        by :meth:`~BaseStorage.namespace`, so it is never a namespace index.
+
+        .. versionadded:: 3.11.0
+        """
+        return "%s/version" % self.index
+
+    #: The codec of the values
+    codec: BaseCodec = JsonCodec()
+
+    def _key(self, key: str) -> str:
+        return key
+
+    def _encode(self, value: Any) -> Union[str, bytes]:
+        return self.codec.encode(value)
+
+    def _decode(self, v: Any) -> Any:
+        return self.codec.decode(v)
+
+
+class RedisStorage(_RedisHashMixin, BaseStorage):
+    """Use redis stand-alone storage
+
+    The data is a redis hash named by :attr:`index`, :meth:`getmany`,
+    :meth:`setmany`, :meth:`removemany` and :meth:`transaction` read or
+    write many keys in one round trip.
+
+    :param int cache_size: enable an in-process cache of the read values
+                           (`get` and `getmany`) with the maximum number of
+                           keys, 0 is disabled.
+
+    :param int cache_ttl: the seconds a value is cached, 0 means until it
+                          is invalidated.
+
+    :param float cache_check_interval: the seconds between two checks of
+                                       the version key.
+
+    :param codec: encode the values by the :class:`BaseCodec`, default is
+                  :class:`JsonCodec`.
+
+    Each write also increments the version key `<index>/version` in the
+    same MULTI/EXEC, the cache of a process is cleared when it sees the
+    version changed by another client, so its reads are stale for at most
+    `cache_check_interval` seconds. The cached values are shared, do not
+    modify them.
+
+    .. versionchanged:: 3.11.0
+        Add :meth:`getmany`, :meth:`removemany`, :meth:`scan` and
+        :meth:`transaction`, `list` is read by HSCAN, add `cache_size`,
+        `cache_ttl`, `cache_check_interval` and `codec` param
+    """
+
+    #: The number of fields asked by each HSCAN
+    SCAN_COUNT: int = 500
+
+    def __init__(
+        self,
+        redis_url=None,
+        redis_connection=None,
+        cache_size: int = 0,
+        cache_ttl: int = 60,
+        cache_check_interval: float = 1,
+        codec: Optional[BaseCodec] = None,
+    ):
         self._db = self._open(redis_url) if redis_url else redis_connection
+        if codec is not None:
+            self.codec = codec
+        self._cache = LRUCache(cache_size, cache_ttl) if cache_size > 0 else None
+        self.cache_check_interval = cache_check_interval
+        self._reset_cache()
+
+    def _reset_cache(self):
+        self._cache_lock = RLock()
+        self._version = 0
+        self._checked = 0.0
+        self._invalidations = 0
+
+    def _clone(self, index: str) -> "RedisStorage":
+        storage = super(RedisStorage, self)._clone(index)
+        if self._cache is not None:
+            storage._cache = LRUCache(self._cache.maxsize, self._cache.ttl)
+        storage._reset_cache()
+        return storage
 
     def _open(self, redis_url):
         try:
@@ -332,14 +1235,101 @@ class RedisStorage(BaseStorage):
         else:
             return from_url(redis_url)
 
+    @property
+    def cache_stats(self) -> Optional[Dict[str, int]]:
+        """Get the statistics of the cache, look like
+        {hits=, misses=, size=, maxsize=, invalidations=}, None if disabled,
+        `invalidations` counts the clears by the writes of other clients
+
+        .. versionadded:: 3.11.0
+        """
+        if self._cache is None:
+            return None
+        return dict(self._cache.stats, invalidations=self._invalidations)
+
+    def _invalidate(self):
+        if len(self._cache):
+            self._cache.clear()
+            self._invalidations += 1
+
+    def _check_version(self):
+        now = time()
+        if now - self._checked < self.cache_check_interval:
+            return
+        version = int(self._db.get(self.version_key) or 0)
+        with self._cache_lock:
+            self._checked = now
+            if version != self._version:
+                self._invalidate()
+                self._version = version
+
+    def _execute(self, pipe, keys) -> list:
+        """Execute the write pipeline with the increment of the version key,
+        only the written keys are invalidated unless another client has
+        written in the meantime.
+        """
+        pipe.incr(self.version_key)
+        results = pipe.execute()
+        version = results[-1]
+        if self._cache is None:
+            return results[:-1]
+        with self._cache_lock:
+            if version == self._version + 1:
+                for key in keys:
+                    self._cache.remove(key)
+            else:
+                self._invalidate()
+            self._version = version
+        return results[:-1]
+
+    def _cached(self, keys) -> Tuple[Dict[str, Any], List[str], int]:
+        """Look up the cache, return the cached values, the missing keys
+        and the version to store the fetched values.
+        """
+        self._check_version()
+        version = self._version
+        found, missing = {}, []
+        for key in keys:
+            value = self._cache.get(key, _UNCACHED)
+            if value is _UNCACHED:
+                missing.append(key)
+            else:
+                found[key] = value
+        return found, missing, version
+
+    def _store(self, values: Dict[str, Any], version: int):
+        with self._cache_lock:
+            #: a write happened during the fetch, the values may be stale
+            if version == self._version:
+                for key, value in iteritems(values):
+                    self._cache.set(key, value)
+
     @property
     def list(self) -> Dict[str, Any]:
-        """list redis hash data"""
-        return {k: json.loads(v) for k, v in iteritems(self._db.hgetall(self.index))}
+        """list redis hash data
+
+        .. versionchanged:: 3.11.0
+            Read by HSCAN in batches instead of one HGETALL
+        """
+        return dict(self.scan())
+
+    def scan(self, count: Optional[int] = None):
+        """Iterate over the (key, value) of the hash by HSCAN, the large
+        hash is not loaded at once.
+
+        :param count: the number of fields asked by each HSCAN,
+                      default is :attr:`SCAN_COUNT`
+
+        .. versionadded:: 3.11.0
+        """
+        for k, v in self._db.hscan_iter(self.index, count=count or self.SCAN_COUNT):
+            yield k, self._decode(v)
 
     def set(self, key: str, value: Any):
         """set key data"""
-        return self._db.hset(self.index, key, json.dumps(value))
+        pipe = self._db.pipeline(transaction=True)
+        pipe.hset(self.index, key, self._encode(value))
+        return self._execute(pipe, [key])[0]
 
     def setmany(self, **mapping: Dict[str, Any]):
         """Set more data
@@ -347,28 +1337,468 @@ class RedisStorage(BaseStorage):
         :param mapping: the more k=v
 
         .. versionadded:: 3.4.1
+
+        .. versionchanged:: 3.11.0
+            Use HSET with mapping instead of the deprecated HMSET
         """
         if mapping and isinstance(mapping, dict):
-            mapping = {k: json.dumps(v) for k, v in iteritems(mapping)}
-            return self._db.hmset(self.index, mapping)
+            mapping = {k: self._encode(v) for k, v in iteritems(mapping)}
+            pipe = self._db.pipeline(transaction=True)
+            pipe.hset(self.index, mapping=mapping)
+            return self._execute(pipe, mapping)[0]
 
     def get(self, key: str, default: Any = None) -> Any:
-        """get key original data from redis"""
-        v = self._db.hget(self.index, key)
-        if v:
-            if not isinstance(v, text_type):
-                v = v.decode("utf-8")
-            return json.loads(v)
-        return default
+        """get key original data from redis
+
+        .. versionchanged:: 3.11.0
+            Read through the cache if enabled
+        """
+        if self._cache is None:
+            v = self._db.hget(self.index, key)
+            if v:
+                return self._decode(v)
+            return default
+        return self.getmany(key, default=default)[key]
+
+    def getmany(self, *keys: str, default: Any = None) -> Dict[str, Any]:
+        """Get more data by one HMGET
+
+        :returns: dict, the missing key is `default`
+
+        .. versionadded:: 3.11.0
+        """
+        if not keys:
+            return {}
+        if self._cache is None:
+            values = self._db.hmget(self.index, keys)
+            return {k: self._decode(v) if v else default for k, v in zip(keys, values)}
+        found, missing, version = self._cached(keys)
+        if missing:
+            values = self._db.hmget(self.index, missing)
+            #: the missing keys are cached too
+            fetched = {
+                k: self._decode(v) if v else _MISSING for k, v in zip(missing, values)
+            }
+            self._store(fetched, version)
+            found.update(fetched)
+        return {k: default if found[k] is _MISSING else found[k] for k in keys}
 
     def remove(self, key: str):
         """delete key from redis"""
-        return self._db.hdel(self.index, key)
+        return self.removemany(key)
+
+    def removemany(self, *keys: str) -> int:
+        """Delete more keys by one HDEL
+
+        :returns: the number of deleted keys
+
+        .. versionadded:: 3.11.0
+        """
+        if not keys:
+            return 0
+        pipe = self._db.pipeline(transaction=True)
+        pipe.hdel(self.index, *keys)
+        return self._execute(pipe, keys)[0]
+
+    @contextmanager
+    def transaction(self):
+        """Group the reads and writes, the writes are buffered and sent
+        together in a MULTI/EXEC pipeline when the block exits, or
+        discarded if it raises. The reads are not isolated from the other
+        clients.
+
+        :returns: :class:`StorageTransaction`
+
+        .. versionadded:: 3.11.0
+        """
+        txn = StorageTransaction(self)
+        yield txn
+        if txn._removed or txn._pending:
+            pipe = self._db.pipeline(transaction=True)
+            if txn._removed:
+                pipe.hdel(self.index, *txn._removed)
+            if txn._pending:
+                pipe.hset(self.index, mapping=txn._pending)
+            self._execute(pipe, txn._removed | set(txn._pending))
+
+    def __contains__(self, key: str) -> bool:
+        """Check the key by HEXISTS
+
+        .. versionadded:: 3.11.0
+        """
+        return bool(self._db.hexists(self.index, key))
 
     def __len__(self):
         return self._db.hlen(self.index)
 
 
+class ShardedStorage(BaseStorage):
+    """Spread the keys over many shards of a storage by a stable hash
+    (crc32) of the key, each shard is a copy of `storage` whose index is
+    formatted by :attr:`SHARD_FORMAT`, e.g. a redis hash or a shelve file::
+
+        storage = ShardedStorage(RedisStorage(redis_url="redis://"), shards=16)
+
+    The keys of a shard are read or written together by `getmany`,
+    `setmany` and `removemany`, `list`, `len` and :meth:`scan` go through
+    the shards one by one.
+
+    Changing the number of shards moves the keys to other shards,
+    so it should not change after the data is written.
+
+    :param storage: the :class:`BaseStorage` to copy as the shards
+
+    :param int shards: the number of shards
+
+    .. versionadded:: 3.11.0
+    """
+
+    #: The index of a shard, formatted by (index, number)
+    SHARD_FORMAT: str = "%s-shard%d"
+
+    def __init__(self, storage: BaseStorage, shards: int = 16):
+        if not isinstance(storage, BaseStorage) or isinstance(storage, ShardedStorage):
+            raise ParamError("Invalid storage")
+        if not isinstance(shards, int) or shards < 1:
+            raise ParamError("Invalid shards")
+        #: The storage copied as the shards
+        self.storage = storage
+        self.shards: List[BaseStorage] = [
+            storage._clone(self.SHARD_FORMAT % (storage.index, i))
+            for i in range(shards)
+        ]
+
+    @property
+    def index(self):
+        return self.storage.index
+
+    def shard_of(self, key: str) -> int:
+        """Get the number of the shard of key"""
+        if isinstance(key, text_type):
+            key = key.encode("utf-8")
+        return zlib.crc32(key) % len(self.shards)
+
+    def _group(self, keys) -> Dict[int, List[str]]:
+        groups: Dict[int, List[str]] = {}
+        for key in keys:
+            groups.setdefault(self.shard_of(key), []).append(key)
+        return groups
+
+    def namespace(self, name: str) -> "ShardedStorage":
+        """Get a sharded storage of the namespace of :attr:`storage`"""
+        return ShardedStorage(self.storage.namespace(name), len(self.shards))
+
+    @property
+    def list(self) -> Dict[str, Any]:
+        """list all data of all shards"""
+        return dict(self.scan())
+
+    def scan(self):
+        """Iterate over the (key, value) of the shards one by one, a shard
+        is scanned by its `scan` if it has, otherwise loaded by its `list`.
+        """
+        for shard in self.shards:
+            if hasattr(shard, "scan"):
+                for item in shard.scan():
+                    yield item
+            else:
+                for item in iteritems(shard.list):
+                    yield item
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.shards[self.shard_of(key)].get(key, default)
+
+    def set(self, key: str, value: Any, **options: Any):
+        return self.shards[self.shard_of(key)].set(key, value, **options)
+
+    def remove(self, key: str):
+        return self.shards[self.shard_of(key)].remove(key)
+
+    def getmany(self, *keys: str, default: Any = None) -> Dict[str, Any]:
+        """Get more data, one `getmany` call per shard if it has"""
+        data = {}
+        for i, group in iteritems(self._group(keys)):
+            shard = self.shards[i]
+            if hasattr(shard, "getmany"):
+                data.update(shard.getmany(*group, default=default))
+            else:
+                data.update((k, shard.get(k, default)) for k in group)
+        return {k: data[k] for k in keys}
+
+    def setmany(self, **mapping: Any):
+        """Set more data, one `setmany` call per shard if it has"""
+        for i, group in iteritems(self._group(mapping)):
+            shard = self.shards[i]
+            if hasattr(shard, "setmany"):
+                shard.setmany(**{k: mapping[k] for k in group})
+            else:
+                for key in group:
+                    shard.set(key, mapping[key])
+
+    def removemany(self, *keys: str) -> int:
+        """Delete more keys, one `removemany` call per shard if it has
+
+        :returns: the number of deleted keys
+        """
+        count = 0
+        for i, group in iteritems(self._group(keys)):
+            shard = self.shards[i]
+            if hasattr(shard, "removemany"):
+                count += shard.removemany(*group)
+                continue
+            for key in group:
+                if key in shard:
+                    shard.remove(key)
+                    count += 1
+        return count
+
+    def close(self):
+        """Close the shards that can be closed"""
+        for shard in self.shards:
+            if hasattr(shard, "close"):
+                shard.close()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.shards[self.shard_of(key)]
+
+    def __len__(self):
+        return sum(len(shard) for shard in self.shards)
+
+
+class AsyncBaseStorage(object):
+    """This is the base class for the async storages, the methods are
+    coroutines, so the storage calls of the async views do not block the
+    event loop and can run concurrently::
+
+        values = await asyncio.gather(storage.get("a"), storage.get("b"))
+
+    The available classes need to inherit from :class:`AsyncBaseStorage`
+    and override the `list`, `get`, `set` and `remove` methods,
+    `getmany` and `setmany` call them concurrently unless overridden.
+
+    .. versionadded:: 3.11.0
+    """
+
+    #: The default index, as the only key, you can override it.
+    DEFAULT_INDEX: str = BaseStorage.DEFAULT_INDEX
+
+    index = BaseStorage.index
+
+    async def list(self) -> Dict[str, Any]:
+        raise NotImplementedError("Please override the list method")
+
+    async def get(self, key: str, default: Any = None) -> Any:
+        raise NotImplementedError("Please override the get method")
+
+    async def set(self, key: str, value: Any):
+        raise NotImplementedError("Please override the set method")
+
+    async def remove(self, key: str):
+        raise NotImplementedError("Please override the remove method")
+
+    async def getmany(self, *keys: str, default: Any = None) -> Dict[str, Any]:
+        """Get more data
+
+        :returns: dict, the missing key is `default`
+        """
+        values = await asyncio.gather(*[self.get(k, default) for k in keys])
+        return dict(zip(keys, values))
+
+    async def setmany(self, **mapping: Any):
+        """Set more data
+
+        :param mapping: the more k=v
+        """
+        await asyncio.gather(*[self.set(k, v) for k, v in iteritems(mapping)])
+
+    async def close(self):
+        """Release the resources of the storage"""
+
+    def __str__(self):
+        return "<%s object at %s, index is %s>" % (
+            self.__class__.__name__,
+            hex(id(self)),
+            self.index,
+        )
+
+    __repr__ = __str__
+
+
+class AsyncLocalStorage(AsyncBaseStorage):
+    """Run the calls of a local storage in a thread pool.
+
+    :param path: the shelve file, as :class:`LocalStorage`
+
+    :param executor: the :class:`concurrent.futures.Executor` to run the
+                     calls, default is the executor of the event loop.
+
+    :param storage: the blocking storage to run, default is a
+                    :class:`LocalStorage` of `path` and `options`.
+
+    :param options: the params of :class:`LocalStorage`, the writes of
+                    the threads are serialized by the lock of the file,
+                    with `persistent` they share one handle, which owns
+                    the file in this process.
+
+    .. versionadded:: 3.11.0
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        executor=None,
+        storage: Optional[BaseStorage] = None,
+        **options: Any
+    ):
+        if storage is None:
+            storage = LocalStorage(path, **options)
+        #: The blocking storage
+        self.storage = storage
+        self.executor = executor
+
+    @property
+    def index(self):
+        return self.storage.index
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+
+    async def list(self) -> Dict[str, Any]:
+        return await self._run(lambda: self.storage.list)
+
+    async def get(self, key: str, default: Any = None) -> Any:
+        return await self._run(self.storage.get, key, default)
+
+    async def set(self, key: str, value: Any, **options: Any):
+        return await self._run(self.storage.set, key, value, **options)
+
+    async def remove(self, key: str):
+        return await self._run(self.storage.remove, key)
+
+    async def getmany(self, *keys: str, default: Any = None) -> Dict[str, Any]:
+        """Get more data in one call of the thread pool"""
+
+        def getmany():
+            return {k: self.storage.get(k, default) for k in keys}
+
+        return await self._run(getmany)
+
+    async def setmany(self, **mapping: Any):
+        """Set more data in one call of the thread pool"""
+
+        def setmany():
+            with self.storage.transaction() as txn:
+                for k, v in iteritems(mapping):
+                    txn[k] = v
+
+        if hasattr(self.storage, "transaction"):
+            return await self._run(setmany)
+        return await self._run(self.storage.setmany, **mapping)
+
+    async def close(self):
+        close = getattr(self.storage, "close", None)
+        if close is not None:
+            await self._run(close)
+
+
+class AsyncRedisStorage(_RedisHashMixin, AsyncBaseStorage):
+    """Use redis stand-alone storage with the asyncio client of redis,
+    the data is the same as :class:`RedisStorage`, and the writes increment
+    its version key, so the cache of :class:`RedisStorage` sees them.
+
+    :param redis_url: the redis url
+
+    :param redis_connection: an instance of :class:`redis.asyncio.Redis`
+
+    :param codec: as :class:`RedisStorage`
+
+    .. versionadded:: 3.11.0
+    """
+
+    #: The number of fields asked by each HSCAN
+    SCAN_COUNT: int = RedisStorage.SCAN_COUNT
+
+    def __init__(
+        self,
+        redis_url=None,
+        redis_connection=None,
+        codec: Optional[BaseCodec] = None,
+    ):
+        self._db = self._open(redis_url) if redis_url else redis_connection
+        if codec is not None:
+            self.codec = codec
+
+    def _open(self, redis_url):
+        try:
+            from redis.asyncio import from_url
+        except ImportError:
+            raise ImportError("Please install the redis module, eg: pip install redis")
+        else:
+            return from_url(redis_url)
+
+    async def _execute(self, pipe) -> list:
+        pipe.incr(self.version_key)
+        results = await pipe.execute()
+        return results[:-1]
+
+    async def list(self) -> Dict[str, Any]:
+        """list redis hash data by HSCAN"""
+        data = {}
+        async for k, v in self._db.hscan_iter(self.index, count=self.SCAN_COUNT):
+            data[k] = self._decode(v)
+        return data
+
+    async def get(self, key: str, default: Any = None) -> Any:
+        v = await self._db.hget(self.index, key)
+        if v:
+            return self._decode(v)
+        return default
+
+    async def getmany(self, *keys: str, default: Any = None) -> Dict[str, Any]:
+        """Get more data by one HMGET"""
+        if not keys:
+            return {}
+        values = await self._db.hmget(self.index, keys)
+        return {k: self._decode(v) if v else default for k, v in zip(keys, values)}
+
+    async def set(self, key: str, value: Any):
+        pipe = self._db.pipeline(transaction=True)
+        pipe.hset(self.index, key, self._encode(value))
+        return (await self._execute(pipe))[0]
+
+    async def setmany(self, **mapping: Any):
+        """Set more data by one HSET"""
+        if mapping:
+            pipe = self._db.pipeline(transaction=True)
+            pipe.hset(
+                self.index,
+                mapping={k: self._encode(v) for k, v in iteritems(mapping)},
+            )
+            return (await self._execute(pipe))[0]
+
+    async def remove(self, key: str):
+        return await self.removemany(key)
+
+    async def removemany(self, *keys: str) -> int:
+        """Delete more keys by one HDEL"""
+        if not keys:
+            return 0
+        pipe = self._db.pipeline(transaction=True)
+        pipe.hdel(self.index, *keys)
+        return (await self._execute(pipe))[0]
+
+    async def exists(self, key: str) -> bool:
+        return bool(await self._db.hexists(self.index, key))
+
+    async def length(self) -> int:
+        return await self._db.hlen(self.index)
+
+    async def close(self):
+        close = getattr(self._db, "aclose", None) or self._db.close
+        await close()
+
+
 class JsonResponse(Response):
     """In response to a return type that cannot be processed.
     If it is a dict, return json.
@@ -393,9 +1823,367 @@ class Attribution(dict):
             raise AttributeError(name)
 
 
+class LRUCache(object):
+    """A bounded, thread-safe cache that evicts the least recently used item,
+    and counts the hits and misses.
+
+    :param int maxsize: the maximum number of items, 0 means unbounded.
+
+    :param int ttl: default time to live in seconds, 0 means never expired.
+
+    .. versionadded:: 3.11.0
+    """
+
+    def __init__(self, maxsize: int = 128, ttl: int = 0):
+        if maxsize < 0 or ttl < 0:
+            raise ParamError("Invalid maxsize or ttl")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Any, tuple]" = OrderedDict()
+        self._lock = RLock()
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        """Get the value of key and mark it as recently used"""
+        with self._lock:
+            try:
+                value, etime = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            if etime and time() > etime:
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Any, value: Any, ttl: Optional[int] = None):
+        """Set the value of key, the least recently used item is evicted
+        when the cache is full.
+
+        :param ttl: time to live in seconds, default is :attr:`ttl`
+        """
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            self._data[key] = (value, time() + ttl if ttl > 0 else 0)
+            self._data.move_to_end(key)
+            if self.maxsize:
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+
+    def remove(self, key: Any) -> bool:
+        with self._lock:
+            return self._data.pop(key, None) is not None
+
+    def clear(self):
+        """Remove all items, the hits and misses are kept."""
+        with self._lock:
+            self._data.clear()
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Get the statistics, look like {hits=, misses=, size=, maxsize=}"""
+        return dict(
+            hits=self.hits,
+            misses=self.misses,
+            size=len(self._data),
+            maxsize=self.maxsize,
+        )
+
+    def __contains__(self, key: Any) -> bool:
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+
+def parse_plugin_meta(filepath: str) -> Tuple[Dict[str, Any], Set[str]]:
+    """Read the metadata of a plugin entry file without executing it,
+    only the top-level literal assignments of :data:`PLUGIN_META_NAMES`
+    are recognized.
+
+    :param str filepath: the plugin entry file, like `plugin/__init__.py`
+    :returns: (metadata, names that are assigned but not literal),
+              the metadata has `register` key if the entry defines it.
+    :raises SyntaxError: if the file is not valid python.
+
+    .. versionadded:: 3.11.0
+    """
+    with open(filepath, "rb") as fd:
+        tree = ast.parse(fd.read(), filepath)
+    meta: Dict[str, Any] = {}
+    dynamic: Set[str] = set()
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            names, value = [node.name], None
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            names = [(a.asname or a.name).split(".")[0] for a in node.names]
+            value = None
+        elif isinstance(node, ast.Assign):
+            names = [t.id for t in node.targets if isinstance(t, ast.Name)]
+            value = node.value
+        elif isinstance(node, ast.AnnAssign) and node.value is not None:
+            names = [node.target.id] if isinstance(node.target, ast.Name) else []
+            value = node.value
+        else:
+            continue
+        for name in names:
+            if name == "register":
+                meta["register"] = True
+            elif name in PLUGIN_META_NAMES:
+                try:
+                    meta[name] = ast.literal_eval(value)  # type: ignore
+                except ValueError:
+                    meta.pop(name, None)
+                    dynamic.add(name)
+                else:
+                    dynamic.discard(name)
+    return meta, dynamic
+
+
+class LazyPlugin(object):
+    """A proxy of the plugin module, the metadata is read statically by
+    :func:`parse_plugin_meta` and the module is imported on first access
+    of other attributes.
+
+    .. versionadded:: 3.11.0
+    """
+
+    def __init__(self, module_name: str, meta: Dict[str, Any]):
+        self.__module_name = module_name
+        self.__meta = meta
+        self.__module = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.__module is not None
+
+    @property
+    def module_name(self) -> str:
+        return self.__module_name
+
+    def load(self):
+        """Import the plugin module if it is not imported"""
+        if self.__module is None:
+            self.__module = import_module(self.__module_name)
+        return self.__module
+
+    def __getattr__(self, name: str):
+        if name in PLUGIN_META_NAMES:
+            try:
+                return self.__meta[name]
+            except KeyError:
+                raise AttributeError(name)
+        return getattr(self.load(), name)
+
+    def __repr__(self):
+        return "<%s %s, loaded: %s>" % (
+            self.__class__.__name__,
+            self.__module_name,
+            self.is_loaded,
+        )
+
+
+def file_stamp(*paths: str) -> Optional[List[int]]:
+    """Get the modification stamp of the paths, like the pyc files,
+    it is made of the mtime (in nanoseconds) and size of each path.
+
+    :returns: None if any path does not exist
+
+    .. versionadded:: 3.11.0
+    """
+    stamp: List[int] = []
+    for path in paths:
+        try:
+            st = stat(path)
+        except OSError:
+            return None
+        stamp.extend((st.st_mtime_ns, st.st_size))
+    return stamp
+
+
+def private_tempdir(name: str = "flask_pluginkit") -> str:
+    """Get a directory in the temporary directory that only the current
+    user can access, it is created with mode 0700 if it does not exist.
+
+    :raises OSError: if it is not a real directory of the current user,
+                     or other users can access it.
+
+    .. versionadded:: 3.11.0
+    """
+    if not hasattr(os, "getuid"):
+        return gettempdir()
+    path = join(gettempdir(), "%s-%d" % (name, os.getuid()))
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    st = os.lstat(path)
+    if not S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise OSError("Insecure temporary directory: %s" % path)
+    return path
+
+
+def is_trusted_file(st: os.stat_result) -> bool:
+    """Check the stat of a file that is about to be trusted, it must be
+    owned by the current user and not writable by others.
+
+    .. versionadded:: 3.11.0
+    """
+    if not hasattr(os, "getuid"):
+        return True
+    return st.st_uid == os.getuid() and not st.st_mode & 0o022
+
+
+class PluginManifest(object):
+    """A persistent manifest of the discovered plugins, it records the
+    package list of the plugins directory, the metadata of each plugin
+    and the stamp of their source files.
+
+    On a warm start, the entries whose stamp has not changed are trusted,
+    only the changed plugins are scanned and validated again.
+
+    :param str path: the manifest file, it is written atomically, and
+                     ignored if it is not owned by the current user or
+                     writable by others.
+    :param str salt: the entries are discarded if the salt changed
+
+    .. versionadded:: 3.11.0
+    """
+
+    #: The format version of the manifest file
+    VERSION: int = 1
+
+    def __init__(self, path: str, salt: str = ""):
+        self.path = path
+        self.salt = "%s:%s:%s" % (self.VERSION, __version__, salt)
+        self._dirs: Dict[str, Dict[str, Any]] = {}
+        self._plugins: Dict[str, Dict[str, Any]] = {}
+        #: The entries checked in this boot, others are dropped on save
+        self._seen: Set[str] = set()
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+        self.load()
+
+    def load(self):
+        """Read the manifest file, the invalid file is ignored."""
+        try:
+            with open(self.path, "r") as fd:
+                if not is_trusted_file(os.fstat(fd.fileno())):
+                    return
+                data = json.load(fd)
+        except (OSError, ValueError):
+            return
+        if not isinstance(data, dict) or data.get("salt") != self.salt:
+            return
+        self._dirs = data.get("dirs") or {}
+        self._plugins = data.get("plugins") or {}
+
+    def listdir(self, path: str) -> Optional[List[str]]:
+        """Get the recorded package names of the directory if it has
+        not changed, otherwise None.
+        """
+        entry = self._dirs.get(path)
+        stamp = file_stamp(path)
+        if entry and stamp and entry.get("stamp") == stamp:
+            self._seen.add(path)
+            return entry.get("packages")
+        return None
+
+    def set_listdir(self, path: str, packages: List[str]):
+        self._dirs[path] = dict(stamp=file_stamp(path), packages=packages)
+        self._seen.add(path)
+        self._dirty = True
+
+    def get(self, path: str, *files: str) -> Optional[Dict[str, Any]]:
+        """Get the entry of the plugin if the stamp of the plugin directory
+        and `files` has not changed, otherwise None.
+
+        :param str path: the plugin directory
+        """
+        entry = self._plugins.get(path)
+        stamp = file_stamp(path, *files)
+        if entry and stamp and entry.get("stamp") == stamp:
+            self._seen.add(path)
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def trusted(self, path: str) -> Optional[Dict[str, Any]]:
+        """Get the entry of the plugin that has been checked by
+        :meth:`get` or recorded by :meth:`set` in this boot.
+        """
+        return self._plugins.get(path) if path in self._seen else None
+
+    def set(self, path: str, entry: Dict[str, Any], *files: str) -> Dict[str, Any]:
+        """Record the entry of the plugin with the current stamp,
+        the entry must be JSON serializable.
+        """
+        try:
+            json.dumps(entry)
+        except (TypeError, ValueError):
+            self._plugins.pop(path, None)
+            return entry
+        entry["stamp"] = file_stamp(path, *files)
+        self._plugins[path] = entry
+        self._seen.add(path)
+        self._dirty = True
+        return entry
+
+    def update(self, path: str, **fields: Any):
+        """Update some fields of the recorded entry"""
+        entry = self._plugins.get(path)
+        if entry is not None and any(entry.get(k) != v for k, v in fields.items()):
+            entry.update(fields)
+            self._dirty = True
+
+    def save(self):
+        """Write the manifest if it is changed, the entries that were not
+        checked in this boot are dropped.
+        """
+        for mapping in (self._dirs, self._plugins):
+            for path in set(mapping) - self._seen:
+                mapping.pop(path)
+                self._dirty = True
+        if not self._dirty:
+            return
+        fd, tmp = mkstemp(
+            prefix=".manifest-", suffix=".tmp", dir=dirname(abspath(self.path))
+        )
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(
+                    dict(salt=self.salt, dirs=self._dirs, plugins=self._plugins),
+                    f,
+                )
+            replace(tmp, self.path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        self._dirty = False
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Get the statistics, look like {hits=, misses=, size=}"""
+        return dict(hits=self.hits, misses=self.misses, size=len(self._plugins))
+
+
 class DcpManager(object):
     def __init__(self):
         self._listeners = {}
+        #: The callbacks defined in these modules (and submodules) are
+        #: skipped by :meth:`emit`, e.g. the modules of disabled plugins.
+        #:
+        #: .. versionadded:: 3.11.0
+        self.muted_modules: Tuple[str, ...] = ()
 
     @property
     def list(self):
@@ -442,14 +2230,31 @@ class DcpManager(object):
         else:
             return True
 
+    def is_muted(self, callback) -> bool:
+        """Check if the callback is defined in :attr:`muted_modules`.
+
+        .. versionadded:: 3.11.0
+        """
+        module = getattr(callback, "__module__", None) or ""
+        for m in self.muted_modules:
+            if module == m or module.startswith(m + "."):
+                return True
+        return False
+
     def emit(self, event, *args, **kwargs):
         """Emits events for the template context.
 
         :returns: strings with :class:`~flask.Markup`
+
+        .. versionchanged:: 3.11.0
+            Skip the callbacks of :attr:`muted_modules`.
         """
         results = []
         funcs = self._listeners.get(event) or []
+        muted = self.muted_modules
         for f in funcs:
+            if muted and self.is_muted(f):
+                continue
             rv = f(*args, **kwargs)
             if isinstance(rv, (list, tuple)):
                 rv = "".join(rv)
@@ -460,6 +2265,26 @@ class DcpManager(object):
         return Markup("".join(results))
 
 
+def hash_file(filepath: str, algorithm: str = "sha256", chunk_size: int = 65536) -> str:
+    """Get the hex digest of a file, read in chunks.
+
+    .. versionadded:: 3.11.0
+    """
+    h = hashlib.new(algorithm)
+    with open(filepath, "rb") as fd:
+        for chunk in iter(lambda: fd.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def hash_data(data: bytes, algorithm: str = "sha256") -> str:
+    """Get the hex digest of bytes.
+
+    .. versionadded:: 3.11.0
+    """
+    return hashlib.new(algorithm, data).hexdigest()
+
+
 def allowed_uploaded_plugin_suffix(filename: str) -> bool:
     """Check suffix for uploaded filename
 
@@ -558,6 +2383,7 @@ def pip_install(
         cmd.append("--quiet")
     cmd.append(pkg)
     retcode = call(cmd)
+    _installed_packages_cache.clear()
     return retcode == 0
 
 
@@ -593,6 +2419,42 @@ def pip_list(target_dir: str = "") -> Dict[str, str]:
     return {n["name"]: n["version"] for n in data}
 
 
+def canonical_name(name: str) -> str:
+    """Normalize the package name, like `Flask_PluginKit` -> `flask-pluginkit`
+
+    .. versionadded:: 3.11.0
+    """
+    return name_pat.sub("-", name).lower()
+
+
+def installed_packages(target_dir: str = "", refresh: bool = False) -> Dict[str, str]:
+    """Get the installed packages in-process with :mod:`importlib.metadata`,
+    it is much faster than :func:`pip_list` that runs pip as subprocess.
+
+    The result is cached in the process (inherited by forked workers),
+    and cleared after :func:`pip_install`.
+
+    :param str target_dir: Also find the packages in this directory.
+    :param bool refresh: Ignore the cache.
+    :returns: {canonical_package_name:version}
+    :rtype: Dict[str, str]
+
+    .. versionadded:: 3.11.0
+    """
+    if not refresh and target_dir in _installed_packages_cache:
+        return _installed_packages_cache[target_dir]
+    path = list(sys.path)
+    if target_dir and isdir(target_dir):
+        path.append(target_dir)
+    pkgs = {}
+    for dist in distributions(path=path):
+        name = dist.metadata["Name"]
+        if name:
+            pkgs.setdefault(canonical_name(name), dist.version)
+    _installed_packages_cache[target_dir] = pkgs
+    return pkgs
+
+
 def pip_show(pkg: str, target_dir: str = "") -> Optional[str]:
     """Query package version.
 
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""A tiny in-memory server of the Redis protocol (RESP2) for the storage tests,
+it supports the string, hash and transaction commands used by RedisStorage
+and records the received data commands.
+"""
+
+import socketserver
+import threading
+
+
+class FakeRedisHandler(socketserver.StreamRequestHandler):
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            return line.strip().split()
+        args = []
+        for _ in range(int(line[1:])):
+            size = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(size + 2)[:-2])
+        return args
+
+    def encode(self, value):
+        if value is None:
+            return b"$-1\r\n"
+        if isinstance(value, Exception):
+            return b"-ERR " + str(value).encode() + b"\r\n"
+        if isinstance(value, bool):
+            return b"+OK\r\n" if value else b"$-1\r\n"
+        if isinstance(value, int):
+            return b":%d\r\n" % value
+        if isinstance(value, str):
+            return b"+" + value.encode() + b"\r\n"
+        if isinstance(value, (list, tuple)):
+            return b"*%d\r\n" % len(value) + b"".join(self.encode(v) for v in value)
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def handle(self):
+        server = self.server
+        queued = None
+        while True:
+            args = self.read_command()
+            if args is None:
+                break
+            name = args[0].decode().upper()
+            if name not in ("CLIENT", "SELECT", "PING"):
+                server.commands.append(name)
+            if name == "MULTI":
+                queued = []
+                reply = "OK"
+            elif name == "EXEC":
+                with server.lock:
+                    reply = [server.execute(*cmd) for cmd in queued or []]
+                queued = None
+            elif queued is not None:
+                queued.append((name, args[1:]))
+                reply = "QUEUED"
+            else:
+                with server.lock:
+                    reply = server.execute(name, args[1:])
+            self.wfile.write(self.encode(reply))
+
+
+class FakeRedisServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        socketserver.ThreadingTCPServer.__init__(
+            self, ("127.0.0.1", 0), FakeRedisHandler
+        )
+        self.lock = threading.Lock()
+        self.data = {}
+        self.commands = []
+
+    @property
+    def url(self):
+        return "redis://%s:%d/0?protocol=2" % self.server_address
+
+    def start(self):
+        t = threading.Thread(target=self.serve_forever)
+        t.daemon = True
+        t.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def hash(self, key):
+        return self.data.setdefault(key, {})
+
+    def execute(self, name, args):
+        data = self.data
+        if name in ("PING",):
+            return "PONG"
+        if name in ("CLIENT", "SELECT"):
+            return "OK"
+        if name == "GET":
+            return data.get(args[0])
+        if name == "SET":
+            data[args[0]] = args[1]
+            return "OK"
+        if name in ("INCR", "INCRBY"):
+            step = int(args[1]) if name == "INCRBY" else 1
+            data[args[0]] = b"%d" % (int(data.get(args[0], 0)) + step)
+            return int(data[args[0]])
+        if name == "DEL":
+            return sum(1 for k in args if data.pop(k, None) is not None)
+        if name == "HGET":
+            return data.get(args[0], {}).get(args[1])
+        if name == "HMGET":
+            h = data.get(args[0], {})
+            return [h.get(k) for k in args[1:]]
+        if name in ("HSET", "HMSET"):
+            h = self.hash(args[0])
+            added = 0
+            for i in range(1, len(args), 2):
+                added += args[i] not in h
+                h[args[i]] = args[i + 1]
+            return "OK" if name == "HMSET" else added
+        if name == "HDEL":
+            h = data.get(args[0], {})
+            return sum(1 for k in args[1:] if h.pop(k, None) is not None)
+        if name == "HLEN":
+            return len(data.get(args[0], {}))
+        if name == "HEXISTS":
+            return int(args[1] in data.get(args[0], {}))
+        if name == "HGETALL":
+            return [x for kv in data.get(args[0], {}).items() for x in kv]
+        if name == "HSCAN":
+            h = data.get(args[0], {})
+            cursor, count = int(args[1]), 10
+            opts = [a.upper() for a in args[2:]]
+            if b"COUNT" in opts:
+                count = int(args[2 + opts.index(b"COUNT") + 1])
+            keys = sorted(h)[cursor : cursor + count]
+            nxt = cursor + count if cursor + count < len(h) else 0
+            return [b"%d" % nxt, [x for k in keys for x in (k, h[k])]]
+        return Exception("unknown command '%s'" % name)
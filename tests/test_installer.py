@@ -1,8 +1,18 @@
 # -*- coding: utf-8 -*-
 
 import os
+import io
+import hashlib
+import tarfile
+import zipfile
 import unittest
-from flask_pluginkit import PluginInstaller
+from threading import Thread
+from shutil import rmtree
+from tempfile import mkdtemp
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from flask import Flask
+from flask_pluginkit import PluginInstaller, PluginManager, blueprint
+from flask_pluginkit.exceptions import PluginError
 from flask_pluginkit.utils import check_url
 
 
@@ -60,5 +70,131 @@ class PITest(unittest.TestCase):
         self.assertFalse(os.path.isdir(pkg))
 
 
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def send_header(self, keyword, value):
+        #: the "nolength" files are sent without Content-Length
+        if keyword == "Content-Length" and "nolength" in self.path:
+            return
+        SimpleHTTPRequestHandler.send_header(self, keyword, value)
+
+
+class RemoteDownloadTest(unittest.TestCase):
+    def setUp(self):
+        self.plugins = mkdtemp()
+        self.files = mkdtemp()
+        self.addCleanup(rmtree, self.plugins)
+        self.addCleanup(rmtree, self.files)
+        #: larger than some chunks, incompressible
+        self.payload = os.urandom(PluginInstaller.CHUNK_SIZE * 3 + 7)
+        with zipfile.ZipFile(os.path.join(self.files, "demo.zip"), "w") as z:
+            z.writestr("demo/__init__.py", "__plugin_name__ = 'demo'\n")
+            z.writestr("demo/data.bin", self.payload)
+        with tarfile.open(os.path.join(self.files, "nolength.tar.gz"), "w:gz") as t:
+            info = tarfile.TarInfo("tardemo/data.bin")
+            info.size = len(self.payload)
+            t.addfile(info, io.BytesIO(self.payload))
+        self.server = ThreadingHTTPServer(
+            ("127.0.0.1", 0),
+            lambda *args: QuietHandler(*args, directory=self.files),
+        )
+        Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def url(self, name):
+        return "http://127.0.0.1:%d/%s" % (self.server.server_address[1], name)
+
+    def sha256(self, name):
+        with open(os.path.join(self.files, name), "rb") as fp:
+            return hashlib.sha256(fp.read()).hexdigest()
+
+    def test_stream(self):
+        pi = PluginInstaller(self.plugins)
+        digest = self.sha256("demo.zip")
+        res = pi.addPlugin(url=self.url("demo.zip"), checksum="sha256:" + digest)
+        self.assertEqual(0, res["code"], res)
+        self.assertEqual("sha256:" + digest, res["checksum"])
+        with open(os.path.join(self.plugins, "demo", "data.bin"), "rb") as fp:
+            self.assertEqual(self.payload, fp.read())
+        # the default hash_name without the algorithm, upper case
+        res = pi.addPlugin(
+            url=self.url("nolength.tar.gz"),
+            checksum=self.sha256("nolength.tar.gz").upper(),
+        )
+        self.assertEqual(0, res["code"], res)
+        self.assertTrue(os.path.isfile(os.path.join(self.plugins, "tardemo/data.bin")))
+        res = PluginInstaller(self.plugins, hash_name="md5").addPlugin(
+            url=self.url("demo.zip")
+        )
+        self.assertTrue(res["checksum"].startswith("md5:"))
+
+    def test_checksum(self):
+        pi = PluginInstaller(self.plugins)
+        res = pi.addPlugin(url=self.url("demo.zip"), checksum="sha256:" + "0" * 64)
+        self.assertEqual(1, res["code"])
+        self.assertEqual("Checksum Mismatch", res["msg"])
+        res = pi.addPlugin(url=self.url("demo.zip"), checksum="nohash:00")
+        self.assertEqual("Invalid Checksum Algorithm", res["msg"])
+        # a supplied checksum without the hex is not skipped
+        for checksum in ("sha256:", " "):
+            res = pi.addPlugin(url=self.url("demo.zip"), checksum=checksum)
+            self.assertEqual("Invalid Checksum", res["msg"])
+        # nothing is unpacked
+        self.assertEqual([], os.listdir(self.plugins))
+
+    def test_max_size(self):
+        size = os.path.getsize(os.path.join(self.files, "demo.zip"))
+        pi = PluginInstaller(self.plugins, max_size=size - 1)
+        # refused by Content-Length
+        res = pi.addPlugin(url=self.url("demo.zip"))
+        self.assertEqual("Plugin Package Too Large", res["msg"])
+        # refused while streaming
+        size = os.path.getsize(os.path.join(self.files, "nolength.tar.gz"))
+        pi.max_size = PluginInstaller.CHUNK_SIZE
+        res = pi.addPlugin(url=self.url("nolength.tar.gz"))
+        self.assertEqual("Plugin Package Too Large", res["msg"])
+        self.assertEqual([], os.listdir(self.plugins))
+        pi.max_size = size
+        self.assertEqual(0, pi.addPlugin(url=self.url("nolength.tar.gz"))["code"])
+        # the size from the config may be a string
+        self.assertEqual(
+            size, PluginInstaller(self.plugins, max_size=str(size)).max_size
+        )
+        for max_size in ("1MB", -1):
+            with self.assertRaises(PluginError):
+                PluginInstaller(self.plugins, max_size=max_size)
+
+    def test_upload(self):
+        app = Flask("app_upload")
+        app.testing = True
+        app.config.update(
+            PLUGINKIT_AUTH_METHOD="FUNC",
+            PLUGINKIT_AUTH_FUNC=lambda: True,
+            PLUGINKIT_INSTALL_MAX_SIZE=PluginInstaller.CHUNK_SIZE,
+        )
+        PluginManager(
+            app,
+            plugins_base=os.path.dirname(self.plugins),
+            plugins_folder=os.path.basename(self.plugins),
+        )
+        app.register_blueprint(blueprint)
+
+        def upload(name):
+            with open(os.path.join(self.files, name), "rb") as fp:
+                data = dict(file=(io.BytesIO(fp.read()), name))
+            with app.test_client() as c:
+                rv = c.post("/api?Action=uploadPlugin", data=data)
+                return rv.get_json()
+
+        self.assertEqual("Plugin Package Too Large", upload("demo.zip")["msg"])
+        self.assertEqual([], os.listdir(self.plugins))
+        app.config["PLUGINKIT_INSTALL_MAX_SIZE"] = None
+        self.assertEqual(0, upload("demo.zip")["code"])
+        self.assertEqual(["demo"], os.listdir(self.plugins))
+
+
 if __name__ == "__main__" and not os.getenv("TRAVIS"):
     unittest.main()
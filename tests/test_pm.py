@@ -3,9 +3,12 @@
 import os
 import sys
 import time
+import gzip
 import json
+import shutil
+import tempfile
 import unittest
-from flask import Flask, request, g
+from flask import Flask, request, g, render_template_string
 from markupsafe import Markup
 from flask_pluginkit import (
     PluginManager,
@@ -14,6 +17,8 @@ from flask_pluginkit import (
     blueprint,
 )
 from flask_pluginkit.exceptions import PluginError, NotCallableError
+from flask_pluginkit.pluginkit import PluginRegistry, ASSETS_MEMO_SIZE
+from flask_pluginkit.utils import Attribution
 from flask_pluginkit._compat import iteritems
 from jinja2 import ChoiceLoader
 
@@ -51,6 +56,12 @@ class PMTest(unittest.TestCase):
         self.app1_pm = app1.extensions.get("pluginkit")
         self.app4_pm = app4.extensions.get("pluginkit")
 
+    def tearDown(self):
+        #: the hook of localdemo writes the default LocalStorage
+        local = LocalStorage()
+        if "nowtime" in local:
+            del local["nowtime"]
+
     def test_extself(self):
         self.assertIsInstance(self.app1_pm, PluginManager)
         self.assertIsInstance(self.app4_pm, PluginManager)
@@ -85,6 +96,13 @@ class PMTest(unittest.TestCase):
             self.assertIn(nowhour, local.get("nowtime"))
             del local["nowtime"]
 
+    def test_hook_registered_on_demand(self):
+        self.assertEqual([], app1.before_request_funcs.get(None, []))
+        self.assertEqual([], app1.after_request_funcs.get(None, []))
+        self.assertEqual([], app1.teardown_request_funcs.get(None, []))
+        self.assertEqual(1, len(app4.before_request_funcs[None]))
+        self.assertEqual([], app4.after_request_funcs.get(None, []))
+
     def test_example(self):
         with app4.test_client() as c:
             rv = c.get("/")
@@ -92,14 +110,298 @@ class PMTest(unittest.TestCase):
             self.assertTrue("css/style.css" in data)
             self.assertTrue("js/hello.js" in data)
             self.assertTrue(self.app4_pm.pluginkit_config["whoami"] in data)
+            self.assertIn(("localdemo", "code"), self.app4_pm._tep_cache)
+            self.assertEqual(data, c.get("/").data.decode("utf-8"))
         self.assertEqual(len(app4.blueprints), 3)
         self.assertEqual(len(self.app4_pm.get_all_plugins), 3)
+        for p in self.app4_pm.get_all_plugins:
+            self.assertGreater(p.__load_cost__, 0)
         self.assertEqual(len(self.app4_pm.get_enabled_beps), 2)
         self.assertIn(self.app4_pm.static_endpoint, app4.view_functions)
         with app4.test_request_context():
             link = self.app4_pm.emit_assets("localdemo", "css/style.css")
             self.assertTrue("stylesheet" in link)
             self.assertTrue("/css/style.css" in link)
+            self.assertIn(app4, self.app4_pm._assets_memo)
+            self.assertIs(link, self.app4_pm.emit_assets("localdemo", "css/style.css"))
+            ext = self.app4_pm.emit_assets("localdemo", "css/style.css", _external=True)
+            self.assertIn("http://localhost/assets/localdemo/css/style.css", ext)
+
+    def test_assets_memo(self):
+        # the memo is bounded although the host comes from the client
+        pm = self.app4_pm
+        for i in range(ASSETS_MEMO_SIZE + 10):
+            with app4.test_request_context(base_url="http://h%d.example" % i):
+                pm.emit_assets("localdemo", "css/style.css", _external=True)
+        version, memo = pm._assets_memo[app4]
+        self.assertEqual(ASSETS_MEMO_SIZE, len(memo))
+        # and reset when the rules or the static files are changed
+        pm._url_version += 1
+        with app4.test_request_context():
+            pm.emit_assets("localdemo", "css/style.css")
+        self.assertEqual(version + 1, pm._assets_memo[app4][0])
+        self.assertEqual(1, len(pm._assets_memo[app4][1]))
+
+    def test_registry(self):
+        pm = self.app4_pm
+        registry = pm.registry
+        self.assertIs(registry, pm.registry)
+        self.assertIsInstance(registry.veps, tuple)
+        self.assertIsInstance(registry.heps["before_request"], tuple)
+        with self.assertRaises(TypeError):
+            registry.teps["code"] = {}
+        # the public accessors return the mutable copies as before
+        self.assertIsInstance(pm.get_enabled_plugins, list)
+        self.assertIsInstance(pm.get_enabled_veps, list)
+        self.assertIsInstance(pm.get_enabled_heps["before_request"], list)
+        self.assertIsInstance(pm.get_enabled_teps["code"]["cod"], list)
+        self.assertIsInstance(pm.get_enabled_tcps[0], dict)
+        plugins = pm.get_enabled_plugins
+        plugins.append(None)
+        teps = pm.get_enabled_teps
+        teps["code"] = {}
+        self.assertNotIn(None, registry.enabled_plugins)
+        self.assertNotEqual({}, pm.get_enabled_teps["code"])
+        with self.assertRaises(AttributeError):
+            pm._PluginManager__registry.teps = {}
+
+    def test_plugin_index(self):
+        pm = self.app4_pm
+        p = pm.get_plugin_info("localdemo")
+        self.assertEqual("local_demo", p.plugin_package_name)
+        self.assertIs(p, pm.get_plugin_info_by_package("local_demo"))
+        with self.assertRaises(PluginError):
+            pm.get_plugin_info("_non_existent_")
+        with self.assertRaises(PluginError):
+            pm.get_plugin_info_by_package("_non_existent_")
+        with app4.test_client() as c:
+            self.assertEqual(404, c.get("/assets/_non_existent_/a.css").status_code)
+
+    def test_registry_stpl(self):
+        def plugin(name, tep):
+            return Attribution(
+                plugin_name=name,
+                plugin_package_name=name,
+                plugin_state="enabled",
+                plugin_tpl_path="/non_existent",
+                plugin_tep=tep,
+                plugin_hep={},
+                plugin_bep={},
+                plugin_vep=[],
+                plugin_cvep=[],
+                plugin_filter=[],
+                plugin_errhandler=[],
+                plugin_tcp={},
+            )
+
+        plugins = [
+            plugin("a", dict(t=dict(cod="10@A"))),
+            plugin("b", dict(t=dict(cod="9@B"))),
+            plugin("c", dict(t=dict(cod="C"))),
+        ]
+        asc = PluginRegistry(plugins, ("before_request",), False)
+        self.assertEqual(
+            (("b", "B"), ("a", "A"), ("c", "C")), asc.tep_entries["t"]["cod"]
+        )
+        self.assertEqual(("10@A", "9@B", "C"), asc.teps["t"]["cod"])
+        desc = PluginRegistry(plugins, ("before_request",), True)
+        self.assertEqual(
+            (("c", "C"), ("a", "A"), ("b", "B")), desc.tep_entries["t"]["cod"]
+        )
+        self.assertEqual(
+            (("a", "10@A"), ("b", "9@B"), ("c", "C")),
+            PluginRegistry(plugins, ()).tep_entries["t"]["cod"],
+        )
+
+    def test_tep_cache(self):
+        pm = self.app4_pm
+        with app4.test_request_context():
+            hits = pm.tep_cache_stats["fragments"]["hits"]
+            self.assertEqual("<p>cached a</p>", pm.emit_tep("cached", name="a"))
+            self.assertEqual("<p>cached a</p>", pm.emit_tep("cached", name="a"))
+            self.assertEqual("<p>cached b</p>", pm.emit_tep("cached", name="b"))
+            self.assertEqual(hits + 1, pm.tep_cache_stats["fragments"]["hits"])
+
+    def test_static_fingerprint(self):
+        app = Flask("app_fingerprint")
+        pm = PluginManager(app, plugins_base=EXAMPLE_DIR, static_fingerprint=True)
+        digest = pm._assets_manifest["localdemo"]["css/style.css"][0]
+        with app.test_request_context():
+            uri = pm.emit_assets("localdemo", "css/style.css", _raw=True)
+        self.assertTrue(uri.endswith("?v=" + digest[:12]))
+        with app.test_client() as c:
+            resp = c.get(uri)
+            self.assertEqual(200, resp.status_code)
+            self.assertEqual('"%s"' % digest, resp.headers["ETag"])
+            self.assertTrue(resp.cache_control.immutable)
+            self.assertEqual(31536000, resp.cache_control.max_age)
+            resp = c.get(uri, headers={"If-None-Match": resp.headers["ETag"]})
+            self.assertEqual(304, resp.status_code)
+            resp = c.get("/assets/localdemo/css/style.css")
+            self.assertFalse(resp.cache_control.immutable)
+
+    def test_static_precompressed(self):
+        base = tempfile.mkdtemp()
+        shutil.copytree(
+            os.path.join(EXAMPLE_DIR, "plugins"), os.path.join(base, "gz_plugins")
+        )
+        css = os.path.join(base, "gz_plugins", "local_demo", "static", "css")
+        with open(os.path.join(css, "style.css"), "rb") as fd:
+            data = fd.read()
+        with gzip.open(os.path.join(css, "style.css.gz"), "wb") as fd:
+            fd.write(data)
+        with open(os.path.join(css, "style.css.br"), "wb") as fd:
+            fd.write(b"fake brotli")
+        sys.path.insert(0, base)
+        try:
+            app = Flask("app_precompressed")
+            pm = PluginManager(
+                app,
+                plugins_base=base,
+                plugins_folder="gz_plugins",
+                static_fingerprint=True,
+            )
+            self.assertEqual(
+                ("br", "gzip"), pm._assets_manifest["localdemo"]["css/style.css"][1]
+            )
+            url = "/assets/localdemo/css/style.css"
+            with app.test_client() as c:
+                for accept, encoding, body in (
+                    ("gzip, br", "br", b"fake brotli"),
+                    ("gzip", "gzip", None),
+                    ("", None, data),
+                ):
+                    resp = c.get(url, headers={"Accept-Encoding": accept})
+                    self.assertEqual(200, resp.status_code)
+                    self.assertEqual(encoding, resp.headers.get("Content-Encoding"))
+                    self.assertEqual("text/css", resp.mimetype)
+                    self.assertIn("Accept-Encoding", resp.headers["Vary"])
+                    if encoding:
+                        self.assertNotIn("Content-Disposition", resp.headers)
+                    if encoding == "gzip":
+                        self.assertEqual(data, gzip.decompress(resp.data))
+                    else:
+                        self.assertEqual(body, resp.data)
+                    resp.close()
+        finally:
+            sys.path.remove(base)
+            shutil.rmtree(base, ignore_errors=True)
+
+    def test_static_bundle(self):
+        app = Flask("app_bundle")
+        pm = PluginManager(
+            app,
+            plugins_base=EXAMPLE_DIR,
+            static_bundles={"all.js": [("localdemo", "js/hello.js")]},
+        )
+        pm.add_bundle("all.css", [("localdemo", "css/style.css")])
+        with self.assertRaises(PluginError):
+            pm.add_bundle("all.css", [("localdemo", "js/hello.js")])
+        with self.assertRaises(PluginError):
+            pm.add_bundle("all.txt", [("localdemo", "a.txt")])
+        with app.test_request_context():
+            self.assertIn("stylesheet", pm.emit_bundle("all.css"))
+            uri = pm.emit_bundle("all.js", _raw=True)
+            self.assertTrue(uri.startswith("/assets/_bundles/all.js?v="))
+        with app.test_client() as c:
+            resp = c.get(uri)
+            self.assertEqual(200, resp.status_code)
+            self.assertIn(b"localdemo", resp.data)
+            self.assertTrue(resp.cache_control.immutable)
+            resp = c.get(uri, headers={"If-None-Match": resp.headers["ETag"]})
+            self.assertEqual(304, resp.status_code)
+            self.assertEqual(404, c.get("/assets/_bundles/none.js").status_code)
+
+    def test_static_bundle_css(self):
+        base = tempfile.mkdtemp()
+        plugins = os.path.join(base, "bundle_plugins")
+        shutil.copytree(os.path.join(EXAMPLE_DIR, "plugins"), plugins)
+        css = os.path.join(plugins, "repeat_demo", "static", "css")
+        os.makedirs(css)
+        with open(os.path.join(css, "theme.css"), "w") as fd:
+            fd.write(
+                '@charset "utf-8";\n'
+                '@import url("fonts.css");\n'
+                ".a { background: url(../img/a.png) }\n"
+                ".b { background: url('data:image/png;base64,AA==') }\n"
+                '.c { background: url("/abs.png") }\n'
+            )
+        sys.path.insert(0, base)
+        try:
+            app = Flask("app_bundle_css")
+            pm = PluginManager(
+                app,
+                plugins_base=base,
+                plugins_folder="bundle_plugins",
+                hot_reload=True,
+                static_bundles={
+                    "all.css": [
+                        ("localdemo", "css/style.css"),
+                        ("repeatdemo", "css/theme.css"),
+                    ]
+                },
+            )
+            with app.test_client() as c:
+                data = c.get("/assets/_bundles/all.css").data.decode()
+                self.assertEqual(
+                    '@import url("../repeatdemo/css/fonts.css");\n'
+                    "h5 {color:red}\n"
+                    ".a { background: url(../repeatdemo/img/a.png) }\n"
+                    ".b { background: url('data:image/png;base64,AA==') }\n"
+                    '.c { background: url("/abs.png") }\n',
+                    data,
+                )
+                # the disabled plugin is not bundled any more
+                pm.disable_plugin("repeatdemo")
+                self.assertEqual(
+                    "h5 {color:red}\n", c.get("/assets/_bundles/all.css").data.decode()
+                )
+                pm.enable_plugin("repeatdemo")
+                self.assertIn(b".a {", c.get("/assets/_bundles/all.css").data)
+        finally:
+            sys.path.remove(base)
+            shutil.rmtree(base, ignore_errors=True)
+
+    def test_plugin_manifest(self):
+        base = tempfile.mkdtemp()
+        shutil.copytree(
+            os.path.join(EXAMPLE_DIR, "plugins"),
+            os.path.join(base, "manifest_plugins"),
+        )
+        child = os.path.join(base, "manifest_plugins", "local_demo", "sub")
+        os.mkdir(child)
+        with open(os.path.join(child, "__init__.py"), "w") as fd:
+            fd.write("VERSION = '0.1.0'\n")
+        manifest_file = os.path.join(base, "manifest.json")
+        sys.path.insert(0, base)
+
+        def boot(name):
+            return PluginManager(
+                Flask(name),
+                plugins_base=base,
+                plugins_folder="manifest_plugins",
+                plugin_manifest=manifest_file,
+            )
+
+        try:
+            pm = boot("app_manifest")
+            self.assertEqual(0, pm._manifest.hits)
+            names = [p.plugin_name for p in pm.get_all_plugins]
+            pm = boot("app_manifest_warm")
+            self.assertEqual(len(names), pm._manifest.hits)
+            self.assertEqual(0, pm._manifest.misses)
+            self.assertEqual(names, [p.plugin_name for p in pm.get_all_plugins])
+            #: the entry may import its version from a subpackage
+            with open(os.path.join(child, "__init__.py"), "w") as fd:
+                fd.write("VERSION = '0.2.0-dev'\n")
+            pm = boot("app_manifest_child")
+            self.assertEqual(len(names) - 1, pm._manifest.hits)
+            self.assertEqual(1, pm._manifest.misses)
+        finally:
+            sys.path.remove(base)
+            shutil.rmtree(base, ignore_errors=True)
+        with self.assertRaises(PluginError):
+            PluginManager(plugin_manifest=123)
 
     def test_vep(self):
         self.assertIn("localdemo.bvep_view", app4.view_functions)
@@ -146,6 +448,141 @@ class PMTest(unittest.TestCase):
             self.assertEqual("test_err_class_handler", data["msg"])
             self.assertEqual(10000, data["code"])
 
+    def test_hot_reload(self):
+        base = tempfile.mkdtemp()
+        shutil.copytree(
+            os.path.join(EXAMPLE_DIR, "plugins"), os.path.join(base, "hot_plugins")
+        )
+        sys.path.insert(0, base)
+        try:
+            app = Flask("app_hot_reload")
+            pm = PluginManager(
+                app, plugins_base=base, plugins_folder="hot_plugins", hot_reload=True
+            )
+            self.assertFalse(pm.lazy_load)
+
+            @app.route("/")
+            def index():
+                return render_template_string("{{ emit_tep('code') }}|{{ im }}")
+
+            with app.test_client() as c:
+                self.assertIn(b"local-demo", c.get("/").data)
+                self.assertEqual(200, c.get("/localdemo/").status_code)
+                self.assertIn(b"Not Found Page", c.get("/404").data)
+                pm.disable_plugin("localdemo")
+                self.assertEqual(
+                    ["repeatdemo"], [p.plugin_name for p in pm.get_enabled_plugins]
+                )
+                self.assertEqual(b"|", c.get("/").data)
+                self.assertEqual(404, c.get("/localdemo/").status_code)
+                self.assertEqual(404, c.get("/limit/x").status_code)
+                self.assertNotIn(b"Not Found Page", c.get("/404").data)
+                self.assertNotIn("demo_filter2", app.jinja_env.filters)
+                self.assertEqual(403, c.get("/403").status_code)
+                pm.disable_plugin("repeatdemo")
+                self.assertEqual(404, c.get("/403").status_code)
+                self.assertEqual(404, c.get("/classful/").status_code)
+                pm.enable_plugin("localdemo")
+                pm.enable_plugin("repeatdemo")
+                self.assertEqual(
+                    b"<p>hello local-demo(from html code)</p>|localdemo",
+                    c.get("/").data,
+                )
+                self.assertEqual(200, c.get("/localdemo/").status_code)
+                self.assertEqual(403, c.get("/403").status_code)
+                self.assertIn("demo_filter2", app.jinja_env.filters)
+        finally:
+            sys.path.remove(base)
+            shutil.rmtree(base, ignore_errors=True)
+
+    def test_plugin_storage(self):
+        base = tempfile.mkdtemp()
+        shutil.copytree(
+            os.path.join(EXAMPLE_DIR, "plugins"), os.path.join(base, "ns_plugins")
+        )
+        sys.path.insert(0, base)
+        try:
+            with self.assertRaises(PluginError):
+                PluginManager(plugin_storage="redis")
+            with self.assertRaises(PluginError):
+                self.app4_pm.get_plugin_storage("localdemo")
+            storage = LocalStorage(os.path.join(base, "data"))
+            pm = PluginManager(
+                Flask("app_storage"),
+                plugins_base=base,
+                plugins_folder="ns_plugins",
+                plugin_storage=storage,
+            )
+            local = pm.get_plugin_storage("localdemo")
+            self.assertIs(local, pm.get_plugin_storage("localdemo"))
+            self.assertEqual(os.path.join(base, "data.localdemo"), local.index)
+            with self.assertRaises(PluginError):
+                pm.get_plugin_storage("none")
+            with self.assertRaises(PluginError):
+                pm.get_plugin_storage()
+            # the plugin of the caller module
+            module = pm.get_plugin_info("localdemo").__proxy__
+            get_storage = eval("lambda: pm.get_plugin_storage()", vars(module), {})
+            module.pm = pm
+            self.assertIs(local, get_storage())
+        finally:
+            sys.path.remove(base)
+            shutil.rmtree(base, ignore_errors=True)
+
+    def test_state_sync(self):
+        base = tempfile.mkdtemp()
+        shutil.copytree(
+            os.path.join(EXAMPLE_DIR, "plugins"), os.path.join(base, "sync_plugins")
+        )
+        sys.path.insert(0, base)
+
+        def worker(name, state_sync):
+            app = Flask(name)
+            pm = PluginManager(
+                app,
+                plugins_base=base,
+                plugins_folder="sync_plugins",
+                hot_reload=True,
+                state_sync=state_sync,
+                state_sync_interval=0,
+            )
+            return app, pm
+
+        try:
+            with self.assertRaises(PluginError):
+                PluginManager(state_sync=True)
+            with self.assertRaises(PluginError):
+                PluginManager(hot_reload=True, state_sync="redis")
+            for state_sync in (True, LocalStorage(os.path.join(base, "states"))):
+                _, pm1 = worker("app_sync1", state_sync)
+                app2, pm2 = worker("app_sync2", state_sync)
+                with app2.test_client() as c:
+                    self.assertEqual(200, c.get("/localdemo/").status_code)
+                    pm1.disable_plugin("localdemo")
+                    self.assertEqual(404, c.get("/localdemo/").status_code)
+                    self.assertEqual(
+                        ["repeatdemo"], [p.plugin_name for p in pm2.get_enabled_plugins]
+                    )
+                    pm2.enable_plugin("localdemo")
+                    self.assertEqual(1, pm1.sync_plugin_states())
+                    self.assertEqual(0, pm1.sync_plugin_states())
+                    self.assertEqual(200, c.get("/localdemo/").status_code)
+            # two workers change different plugins at the same time
+            storage = LocalStorage(os.path.join(base, "race"))
+            _, pm1 = worker("app_race1", storage)
+            _, pm2 = worker("app_race2", storage)
+            for pm, name in ((pm1, "localdemo"), (pm2, "repeatdemo")):
+                p = pm.get_plugin_info(name)
+                pm._PluginManager__set_plugin_states([(p, "disabled")])
+            for pm, name in ((pm1, "localdemo"), (pm2, "repeatdemo")):
+                pm._PluginManager__publish_plugin_state(pm.get_plugin_info(name))
+            for pm in (pm1, pm2):
+                pm.sync_plugin_states()
+                self.assertEqual([], pm.get_enabled_plugins)
+        finally:
+            sys.path.remove(base)
+            shutil.rmtree(base, ignore_errors=True)
+
     def test_tcp(self):
         context = {
             k: v
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import signal
+import unittest
+import subprocess
+from time import sleep
+from threading import Thread
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+from flask_pluginkit._reloader import RollingReloader, http_probe
+from flask_pluginkit.utils import private_tempdir
+
+#: A fake master, it keeps 3 workers and respawns the exited one
+FAKE_MASTER = """
+import sys, time, signal, subprocess
+
+WORKER = "import signal, sys, time; signal.signal(signal.SIGTERM, lambda *a: sys.exit(0)); time.sleep(600)"
+
+def spawn():
+    return subprocess.Popen([sys.executable, "-c", WORKER])
+
+workers = [spawn() for _ in range(3)]
+
+def stop(*args):
+    for w in workers:
+        w.kill()
+    sys.exit(0)
+
+signal.signal(signal.SIGTERM, stop)
+print("ready", flush=True)
+while True:
+    for i, w in enumerate(workers):
+        if w.poll() is not None:
+            workers[i] = spawn()
+    time.sleep(0.05)
+"""
+
+
+@unittest.skipIf(psutil is None, "psutil is not installed")
+class ReloaderTest(unittest.TestCase):
+    def setUp(self):
+        self.master = subprocess.Popen(
+            [sys.executable, "-c", FAKE_MASTER], stdout=subprocess.PIPE
+        )
+        self.master.stdout.readline()
+        self.msgs = []
+
+    def tearDown(self):
+        self.master.terminate()
+        self.master.wait()
+        self.master.stdout.close()
+
+    def reloader(self, **kwargs):
+        kwargs.setdefault("warmup", 0.2)
+        kwargs.setdefault("timeout", 10)
+        return RollingReloader(
+            self.master.pid, signal.SIGTERM, report=self.msgs.append, **kwargs
+        )
+
+    def test_rolling_reload(self):
+        r = self.reloader()
+        old = {w.pid for w in r.workers()}
+        self.assertEqual(3, len(old))
+        self.assertTrue(r.run())
+        new = {w.pid for w in r.workers()}
+        self.assertEqual(3, len(new))
+        self.assertFalse(old & new)
+        #: two workers were serving while one was restarted
+        self.assertEqual(2, r.min_workers)
+        self.assertEqual(
+            ["Reloaded 1/3 workers", "Reloaded 2/3 workers", "Reloaded 3/3 workers"],
+            self.msgs[:-1],
+        )
+        self.assertEqual("Reload is successful", self.msgs[-1])
+
+    def test_batch_size(self):
+        r = self.reloader(batch_size=10)
+        self.assertTrue(r.run())
+        #: at least one worker is left serving
+        self.assertEqual(1, r.min_workers)
+        self.assertEqual("Reloaded 2/3 workers", self.msgs[0])
+
+    def test_unhealthy(self):
+        r = self.reloader(timeout=0.5, probe=lambda w: False)
+        old = {w.pid for w in r.workers()}
+        self.assertFalse(r.run())
+        self.assertTrue(self.msgs[-1].startswith("Reload stopped"))
+        #: the remaining workers were not restarted
+        sleep(0.2)
+        self.assertEqual(2, len(old & {w.pid for w in r.workers()}))
+
+
+class HealthHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.send_response(200 if self.path == "/health" else 503)
+        self.end_headers()
+
+
+class ProbeTest(unittest.TestCase):
+    def test_http_probe(self):
+        server = HTTPServer(("127.0.0.1", 0), HealthHandler)
+        Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = "http://127.0.0.1:%d" % server.server_address[1]
+        self.assertTrue(http_probe(url + "/health")(None))
+        self.assertFalse(http_probe(url + "/starting")(None))
+        self.assertFalse(http_probe("http://127.0.0.1:1/health", timeout=0.5)(None))
+
+    def test_shared_queue(self):
+        # the workers are the children of a master, here the test process
+        code = (
+            "import sys; from flask_pluginkit._web import _SharedQueue; "
+            "q = _SharedQueue('fpk_test_msg'); "
+            "[q.append(m) for m in sys.argv[1:]] if len(sys.argv) > 1 "
+            "else print(q.popleft())"
+        )
+        path = os.path.join(private_tempdir(), "fpk_test_msg.%d" % os.getpid())
+        self.addCleanup(lambda: os.path.exists(path) and os.remove(path))
+        subprocess.check_call([sys.executable, "-c", code, "Reloaded 1/2", "done"])
+        self.assertEqual(0o600, os.stat(path).st_mode & 0o777)
+        #: a line written partly is skipped
+        with open(path, "rb+") as fd:
+            lines = fd.read()
+            fd.seek(0)
+            fd.write(b'"\xff broken\n' + lines)
+        out = [
+            subprocess.check_output([sys.executable, "-c", code]).decode().strip()
+            for _ in range(2)
+        ]
+        self.assertEqual(["Reloaded 1/2", "done"], out)
+        #: the empty queue is removed at exit
+        self.assertFalse(os.path.exists(path))
+        proc = subprocess.run(
+            [sys.executable, "-c", code], stderr=subprocess.PIPE, stdout=subprocess.PIPE
+        )
+        self.assertIn(b"IndexError", proc.stderr)
+        self.assertFalse(os.path.exists(path))
+
+
+if __name__ == "__main__":
+    unittest.main()
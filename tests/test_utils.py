@@ -1,29 +1,62 @@
 # -*- coding: utf-8 -*-
 
+import os
+import sys
+import time
+import zlib
+import asyncio
+import shelve
+import subprocess
 import unittest
-from os import getenv
+from unittest.mock import patch
+from threading import Thread
+from datetime import datetime
+from os import getenv, mkdir
 from os.path import dirname, abspath, join
 from shutil import rmtree
+from tempfile import mkdtemp
 from flask_pluginkit.utils import (
     isValidSemver,
     sortedSemver,
     isValidPrefix,
     LocalStorage,
+    ExpiredLocalStorage,
     RedisStorage,
     BaseStorage,
+    AsyncBaseStorage,
+    AsyncLocalStorage,
+    AsyncRedisStorage,
+    BaseCodec,
+    JsonCodec,
+    PickleCodec,
+    ShardedStorage,
     allowed_uploaded_plugin_suffix,
     Attribution,
     check_url,
     DcpManager,
+    LRUCache,
     pip_install,
     pip_list,
     pip_show,
+    installed_packages,
+    canonical_name,
     is_match_version_req,
+    parse_plugin_meta,
+    LazyPlugin,
+    PluginManifest,
+    private_tempdir,
 )
-from flask_pluginkit.exceptions import NotImplementedError
+from flask_pluginkit._logstorage import LogStorage
+from tests.fake_redis import FakeRedisServer
+from flask_pluginkit.exceptions import NotImplementedError, ParamError, PluginError
 from flask_pluginkit.version import __version__ as ver
 from markupsafe import Markup
 
+try:
+    import redis
+except ImportError:
+    redis = None
+
 
 class UtilsTest(unittest.TestCase):
     def test_isVer(self):
@@ -70,6 +103,8 @@ class UtilsTest(unittest.TestCase):
         self.assertIsInstance(newData, dict)
         self.assertEqual(newData, data)
         self.assertEqual(len(storage), len(storage.list))
+        self.assertIn("test", storage)
+        self.assertNotIn("_non_existent_key_", storage)
         # test setitem getitem
         storage["test"] = "hello"
         self.assertEqual("hello", storage["test"])
@@ -79,10 +114,209 @@ class UtilsTest(unittest.TestCase):
         self.assertIsNone(storage["_non_existent_key_"])
         self.assertEqual(1, storage.get("_non_existent_key_", 1))
         self.assertEqual(0, len(storage))
+        # a storage that does not exist yet
+        base = mkdtemp()
+        storage = LocalStorage(join(base, "none"))
+        self.assertIsNone(storage.get("test"))
+        self.assertNotIn("test", storage)
+        self.assertEqual(0, len(storage))
+        rmtree(base)
+
+    def test_localstorage_persistent(self):
+        base = mkdtemp()
+        path = join(base, "data")
+        storage = LocalStorage(path, persistent=True, sync_every=1000)
+        storage.set("a", 1)
+        storage["b"] = dict(b=2)
+        self.assertEqual(1, storage["a"])
+        self.assertEqual(2, len(storage))
+        self.assertIn("b", storage)
+        #: the storages of the same path share the handle
+        other = LocalStorage(path, persistent=True)
+        self.assertIs(storage._handle(), other._handle())
+        self.assertEqual(dict(b=2), other.get("b"))
+        with self.assertRaises(KeyError):
+            storage.remove("none")
+        del storage["b"]
+        self.assertEqual(dict(a=1), storage.list)
+        # the other storages of the process use the open handle
+        self.assertEqual(dict(a=1), LocalStorage(path).list)
+        # the other processes refuse to open the file
+        code = (
+            "import sys; import flask_pluginkit.utils as u; "
+            "u._SHELF_LOCK_TIMEOUT = 0.1; print(u.LocalStorage(sys.argv[1]).list)"
+        )
+        proc = subprocess.run(
+            [sys.executable, "-c", code, path],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        self.assertIn(b"kept open persistently", proc.stderr)
+
+        def incr():
+            for _ in range(50):
+                with storage.transaction() as txn:
+                    txn["n"] = txn.get("n", 0) + 1
+
+        threads = [Thread(target=incr) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(200, storage["n"])
+        # the failed transaction is discarded
+        with self.assertRaises(ValueError):
+            with storage.transaction() as txn:
+                txn["a"] = 2
+                del txn["n"]
+                self.assertEqual(2, txn["a"])
+                self.assertNotIn("n", txn)
+                raise ValueError
+        self.assertEqual(1, storage["a"])
+        self.assertEqual(200, storage["n"])
+
+        if hasattr(os, "fork"):
+            storage.set("unsynced", 1)
+            pid = os.fork()
+            if pid == 0:
+                # the child can not write the file of the parent
+                try:
+                    storage.set("child", 1)
+                except PluginError:
+                    os._exit(0)
+                os._exit(1)
+            self.assertEqual(0, os.waitpid(pid, 0)[1])
+            self.assertEqual(1, storage.get("unsynced"))
+
+        storage.close()
+        self.assertEqual(3, len(LocalStorage(path)))
+        # the file is released by close
+        proc = subprocess.run(
+            [sys.executable, "-c", code, path],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        self.assertIn(b"'unsynced': 1", proc.stdout)
+        self.assertEqual(1, storage["a"])
+        storage.close()
+        rmtree(base)
+
+    def test_expiredlocalstorage(self):
+        base = mkdtemp()
+        for persistent in (False, True):
+            path = join(base, "data%s" % persistent)
+            storage = ExpiredLocalStorage(path, persistent=persistent)
+            storage.set("a", 1)
+            storage.set("b", 2)
+            with self.assertRaises(ParamError):
+                storage.set("c", 1, ttl=-1)
+            self.assertEqual(1, storage.get("a"))
+            self.assertIsNone(storage.get("none"))
+            self.assertIn("a", storage)
+            with storage.transaction() as txn:
+                txn.set("c", 3, ttl=100)
+                txn.remove("a")
+                self.assertEqual(3, txn["c"])
+                self.assertIsNone(txn["a"])
+            self.assertEqual(dict(b=2, c=3), storage.list)
+            storage.remove("b")
+            self.assertEqual(dict(c=3), storage.list)
+            with self.assertRaises(ParamError):
+                storage.set("__pluginkit_expiry__", 1)
+            storage.close()
+        rmtree(base)
+
+    def test_expiredlocalstorage_sweep(self):
+        base = mkdtemp()
+        path = join(base, "data")
+        # a file written before the expiry index
+        with shelve.open(path) as db:
+            db["a"] = {"value": 1, "etime": 0}
+            db["old"] = {"value": 1, "etime": 1}
+        for persistent in (False, True):
+            storage = ExpiredLocalStorage(path, persistent=persistent, sweep_batch=0)
+            self.assertEqual(dict(a=1), storage.list)
+            self.assertEqual(1, len(storage))
+            self.assertNotIn("old", storage)
+            storage.close()
+        storage = ExpiredLocalStorage(path, sweep_batch=2)
+        for i in range(5):
+            storage.set("t%d" % i, i + 1, ttl=1)
+        self.assertEqual(6, len(storage))
+        later = time.time() + 10
+        with patch("flask_pluginkit.utils.time", return_value=later):
+            self.assertEqual(dict(a=1), storage.list)
+            self.assertEqual(1, len(storage))
+            self.assertNotIn("t1", storage)
+            # the expired keys are deleted in bounded batches
+            self.assertEqual(2, storage.sweep(2))
+            storage.set("b", 2)
+            self.assertEqual(dict(a=1, b=2), storage.list)
+            with shelve.open(path, "r") as db:
+                self.assertEqual(1, len([k for k in db if k.startswith("t")]))
+            storage.start_sweeper(interval=0.01, batch=1)
+            for _ in range(100):
+                if len(LocalStorage(path)) == 3:
+                    break
+                time.sleep(0.01)
+            storage.stop_sweeper()
+        with shelve.open(path, "r") as db:
+            self.assertEqual(["__pluginkit_expiry__", "a", "b"], sorted(db.keys()))
+            self.assertEqual({}, db["__pluginkit_expiry__"])
+        rmtree(base)
+
+    def test_expiredlocalstorage_buckets(self):
+        base = mkdtemp()
+        self.addCleanup(rmtree, base)
+        path = join(base, "data")
+        now = 1800000000
+        storage = ExpiredLocalStorage(path, sweep_batch=0)
+        with patch("flask_pluginkit.utils.time", return_value=now):
+            storage.set("a", 1, ttl=10)
+            storage.set("b", 2, ttl=10)
+            storage.set("c", 3, ttl=3600)
+            storage.set("d", 4)
+        with shelve.open(path, "r") as db:
+            table = db["__pluginkit_expiry__"]
+            self.assertEqual([2, 1], [table[b] for b in sorted(table)])
+            bucket = "__pluginkit_expiry__:%d" % min(table)
+            self.assertEqual(dict(a=now + 10, b=now + 10), db[bucket])
+        with patch("flask_pluginkit.utils.time", return_value=now + 100):
+            self.assertEqual(dict(c=3, d=4), storage.list)
+            self.assertEqual(2, len(storage))
+            self.assertNotIn("a", storage)
+            # the reset key moves to its new bucket
+            storage.set("a", 1, ttl=3600)
+            self.assertEqual(dict(a=1, c=3, d=4), storage.list)
+            self.assertEqual(3, len(storage))
+            storage.remove("c")
+            self.assertEqual(1, storage.sweep())
+        with shelve.open(path, "r") as db:
+            # the emptied bucket is removed
+            self.assertEqual(
+                ["__pluginkit_expiry__", "a", "d"],
+                sorted(k for k in db if ":" not in k),
+            )
+            self.assertNotIn(bucket, db)
+            self.assertEqual(1, sum(db["__pluginkit_expiry__"].values()))
+        with self.assertRaises(ParamError):
+            storage.set(bucket, 1)
+        # the previous index, like {key: etime}
+        with shelve.open(path) as db:
+            for k in [k for k in db if ":" in k]:
+                del db[k]
+            db["__pluginkit_expiry__"] = dict(a=1)
+            db["a"] = {"value": 1, "etime": 1}
+        self.assertEqual(dict(d=4), storage.list)
+        self.assertEqual(1, len(storage))
+        storage.set("e", 5, ttl=100)
+        self.assertEqual(1, storage.sweep())
+        self.assertEqual(dict(d=4, e=5), storage.list)
 
     def test_redisstorage(self):
         """Run this test when it detects that the environment variable
-        FLASK_PLUGINKIT_TEST_REDISURL is valid
+        FLASK_PLUGINKIT_TEST_REDISURL is valid, otherwise against a fake
+        redis server
         """
         redis_url = getenv("FLASK_PLUGINKIT_TEST_REDISURL")
         if redis_url:
@@ -98,6 +332,367 @@ class UtilsTest(unittest.TestCase):
             del storage["test"]
             self.assertIsNone(storage["test"])
             self.assertEqual(0, len(storage))
+        elif redis is not None:
+            server = FakeRedisServer().start()
+            self.addCleanup(server.stop)
+            with patch.dict("os.environ", FLASK_PLUGINKIT_TEST_REDISURL=server.url):
+                self.test_redisstorage()
+
+    @unittest.skipIf(redis is None, "redis is not installed")
+    def test_redisstorage_batch(self):
+        server = FakeRedisServer().start()
+        self.addCleanup(server.stop)
+        storage = RedisStorage(redis_url=server.url)
+        settings = {"s%d" % i: dict(i=i) for i in range(10)}
+        storage.setmany(**settings)
+        del server.commands[:]
+        # one round trip for ten settings
+        data = storage.getmany(*settings, "none", default=0)
+        self.assertEqual(["HMGET"], server.commands)
+        self.assertEqual(0, data.pop("none"))
+        self.assertEqual(settings, data)
+        self.assertEqual({}, storage.getmany())
+        self.assertIn("s1", storage)
+        self.assertNotIn("none", storage)
+        # list streams by HSCAN
+        del server.commands[:]
+        storage.SCAN_COUNT = 3
+        self.assertEqual(settings, {k.decode(): v for k, v in storage.list.items()})
+        self.assertEqual(["HSCAN"] * 4, server.commands)
+        self.assertEqual(2, storage.removemany("s0", "s1", "none"))
+        self.assertEqual(0, storage.removemany())
+        self.assertEqual(8, len(storage))
+        # the writes of a transaction are sent by one pipeline
+        del server.commands[:]
+        with storage.transaction() as txn:
+            txn["a"] = 1
+            txn.set("s2", "new")
+            del txn["s3"]
+            self.assertEqual("new", txn["s2"])
+            self.assertIsNone(txn["s3"])
+            self.assertEqual(dict(i=4), txn["s4"])
+        self.assertEqual(
+            ["HGET", "MULTI", "HDEL", "HSET", "INCRBY", "EXEC"], server.commands
+        )
+        self.assertEqual(
+            dict(a=1, s2="new", s3=None),
+            storage.getmany("a", "s2", "s3"),
+        )
+        with self.assertRaises(ValueError):
+            with storage.transaction() as txn:
+                txn["a"] = 2
+                raise ValueError
+        self.assertEqual(1, storage["a"])
+
+    @unittest.skipIf(redis is None, "redis is not installed")
+    def test_redisstorage_cache(self):
+        server = FakeRedisServer().start()
+        self.addCleanup(server.stop)
+        storage = RedisStorage(redis_url=server.url)
+        self.assertIsNone(storage.cache_stats)
+        cached = RedisStorage(
+            redis_url=server.url, cache_size=3, cache_check_interval=60
+        )
+        storage.setmany(a=1, b=dict(b=2), c=3)
+        del server.commands[:]
+        self.assertEqual(1, cached["a"])
+        self.assertEqual(dict(b=2), cached.get("b"))
+        self.assertEqual(0, cached.get("none", 0))
+        self.assertEqual(["GET", "HMGET", "HMGET", "HMGET"], server.commands)
+        # the reads are served by the cache, a missing key too
+        del server.commands[:]
+        self.assertEqual(dict(a=1, none=None), cached.getmany("a", "none"))
+        self.assertEqual([], server.commands)
+        # the cache is bounded, b is the least recently used
+        self.assertEqual(3, cached["c"])
+        self.assertEqual(["HMGET"], server.commands)
+        self.assertEqual(
+            dict(hits=2, misses=4, size=3, maxsize=3, invalidations=0),
+            cached.cache_stats,
+        )
+        # the own writes invalidate the keys
+        cached.set("a", 10)
+        self.assertEqual(10, cached["a"])
+        self.assertEqual(0, cached.cache_stats["invalidations"])
+        # the writes of others are seen at the next version check
+        storage.set("a", 100)
+        self.assertEqual(10, cached["a"])
+        cached.cache_check_interval = 0
+        self.assertEqual(100, cached["a"])
+        self.assertEqual(1, cached.cache_stats["invalidations"])
+        with cached.transaction() as txn:
+            txn["c"] = 30
+            del txn["a"]
+        self.assertEqual(dict(a=None, c=30), cached.getmany("a", "c"))
+        cached.remove("c")
+        self.assertIsNone(cached["c"])
+        self.assertEqual(b"5", server.data[cached.version_key.encode()])
+        # the version key is not the index of a namespace
+        ns = cached.namespace("version")
+        self.assertNotEqual(cached.version_key, ns.index)
+        ns["a"] = "ns"
+        cached["a"] = 1
+        self.assertEqual("ns", ns["a"])
+        self.assertEqual(1, cached["a"])
+        self.assertEqual(b"6", server.data[cached.version_key.encode()])
+
+    def test_codec(self):
+        with self.assertRaises(NotImplementedError):
+            BaseCodec().encode(1)
+        json_codec = JsonCodec()
+        self.assertEqual('{"a": [1]}', json_codec.encode(dict(a=[1])))
+        self.assertEqual(dict(a=[1]), json_codec.decode(b'{"a": [1]}'))
+        with self.assertRaises(ParamError):
+            PickleCodec(-1)
+        codec = PickleCodec(compress_threshold=100)
+        value = dict(b=b"\x00", d=datetime(2020, 1, 1), s={1, 2})
+        data = codec.encode(value)
+        self.assertTrue(data.startswith(b"p"))
+        self.assertEqual(value, codec.decode(data))
+        big = dict(items=["value %d" % i for i in range(100)])
+        data = codec.encode(big)
+        self.assertTrue(data.startswith(b"z"))
+        self.assertLess(len(data), len(json_codec.encode(big)))
+        self.assertEqual(big, codec.decode(data))
+        self.assertTrue(PickleCodec(0).encode(big).startswith(b"p"))
+        # the json data is still decoded
+        self.assertEqual(big, codec.decode(json_codec.encode(big)))
+        self.assertEqual(big, codec.decode(json_codec.encode(big).encode()))
+
+    def test_storage_codec(self):
+        base = mkdtemp()
+        self.addCleanup(rmtree, base)
+        codec = PickleCodec(compress_threshold=100)
+        big = dict(items=list(range(100)), at=datetime(2020, 1, 1))
+        for persistent in (False, True):
+            path = join(base, "local%s" % persistent)
+            storage = LocalStorage(path, persistent=persistent, codec=codec)
+            storage.set("big", big)
+            storage.setmany(a={1})
+            with storage.transaction() as txn:
+                txn["b"] = b"b"
+                self.assertEqual({1}, txn["a"])
+            self.assertEqual(big, storage.get("big"))
+            self.assertEqual(dict(big=big, a={1}, b=b"b"), storage.list)
+            storage.close()
+            with shelve.open(path, "r") as db:
+                self.assertTrue(db["big"].startswith(b"z"))
+            path = join(base, "expired%s" % persistent)
+            storage = ExpiredLocalStorage(path, persistent=persistent, codec=codec)
+            storage.set("big", big, ttl=100)
+            self.assertEqual(big, storage.get("big"))
+            self.assertEqual(dict(big=big), storage.list)
+            storage.close()
+        if redis is not None:
+            server = FakeRedisServer().start()
+            self.addCleanup(server.stop)
+            RedisStorage(redis_url=server.url).set("old", [1])
+            storage = RedisStorage(redis_url=server.url, codec=codec)
+            storage.set("big", big)
+            self.assertEqual(big, storage["big"])
+            self.assertEqual(dict(big=big, old=[1]), storage.getmany("big", "old"))
+
+    def test_sharded_storage(self):
+        base = mkdtemp()
+        self.addCleanup(rmtree, base)
+        with self.assertRaises(ParamError):
+            ShardedStorage(LocalStorage(join(base, "data")), 0)
+        storage = ShardedStorage(LocalStorage(join(base, "data")), shards=4)
+        self.assertEqual(join(base, "data-shard3"), storage.shards[3].index)
+        self.assertEqual(zlib.crc32(b"k1") % 4, storage.shard_of("k1"))
+        data = {"k%d" % i: i for i in range(100)}
+        storage.setmany(**data)
+        storage.set("a", 1)
+        self.assertEqual(1, storage["a"])
+        self.assertIn("k1", storage)
+        self.assertNotIn("none", storage)
+        self.assertEqual(101, len(storage))
+        # the keys are spread over the shards
+        self.assertTrue(all(len(s) > 10 for s in storage.shards))
+        self.assertEqual(dict(data, a=1), storage.list)
+        self.assertEqual(
+            dict(k3=3, k1=1, none=0), storage.getmany("k3", "k1", "none", default=0)
+        )
+        self.assertEqual(2, storage.removemany("k1", "k2", "none"))
+        del storage["a"]
+        self.assertEqual(98, len(storage))
+        # a namespace is isolated
+        ns = storage.namespace("plugin")
+        self.assertEqual(join(base, "data.plugin-shard0"), ns.shards[0].index)
+        self.assertEqual(0, len(ns))
+        ns["k3"] = "ns"
+        self.assertEqual(3, storage["k3"])
+        self.assertEqual("ns", ns["k3"])
+        with self.assertRaises(ParamError):
+            storage.namespace("a/b")
+        expired = ShardedStorage(ExpiredLocalStorage(join(base, "exp")), 2)
+        expired.set("a", 1, ttl=100)
+        expired.setmany(b=2)
+        self.assertEqual(dict(a=1, b=2), expired.list)
+        self.assertEqual(1, expired.removemany("a"))
+        expired.close()
+        if redis is not None:
+            server = FakeRedisServer().start()
+            self.addCleanup(server.stop)
+            storage = ShardedStorage(
+                RedisStorage(redis_url=server.url, cache_size=10), shards=4
+            )
+            storage.setmany(**data)
+            self.assertEqual(
+                ["flask_pluginkit_dat-shard%d" % i for i in range(4)],
+                sorted(
+                    k.decode()
+                    for k in server.data
+                    if b"shard" in k and b":" not in k and b"/" not in k
+                ),
+            )
+            del server.commands[:]
+            self.assertEqual(data, storage.getmany(*data))
+            self.assertEqual(4, server.commands.count("HMGET"))
+            self.assertEqual(100, len(storage))
+            self.assertEqual(data, {k.decode(): v for k, v in storage.list.items()})
+            ns = storage.namespace("plugin")
+            self.assertEqual("flask_pluginkit_dat:plugin-shard1", ns.shards[1].index)
+            self.assertIsNot(ns.shards[1]._cache, storage.shards[1]._cache)
+            ns["k1"] = "ns"
+            self.assertEqual(1, storage["k1"])
+
+    def test_logstorage(self):
+        base = mkdtemp()
+        self.addCleanup(rmtree, base)
+        path = join(base, "log")
+        storage = LogStorage(path, compact_ratio=0)
+        self.addCleanup(storage.close)
+        self.assertEqual(0, len(storage))
+        storage["a"] = 1
+        storage.set("b", dict(x=[1, 2]))
+        storage.setmany(c=3, d=4)
+        self.assertEqual(1, storage["a"])
+        self.assertEqual(dict(x=[1, 2]), storage.get("b"))
+        self.assertIsNone(storage.get("none"))
+        self.assertEqual(0, storage.get("none", 0))
+        self.assertIn("c", storage)
+        self.assertNotIn("none", storage)
+        del storage["d"]
+        with self.assertRaises(KeyError):
+            storage.remove("d")
+        self.assertEqual(dict(a=1, b=dict(x=[1, 2]), c=3), storage.list)
+        # another instance, as another process, reads the appended records
+        other = LogStorage(path, compact_ratio=0)
+        self.addCleanup(other.close)
+        self.assertEqual(storage.list, other.list)
+        other["a"] = "other"
+        self.assertEqual("other", storage["a"])
+        # the overwritten and removed records are compacted
+        for i in range(100):
+            storage["b"] = i
+        size = storage.stats["size"]
+        self.assertGreater(storage.stats["garbage"], 0)
+        self.assertTrue(storage.compact())
+        self.assertEqual(0, storage.stats["garbage"])
+        self.assertLess(os.path.getsize(path), size)
+        self.assertFalse([n for n in os.listdir(base) if ".compact-" in n])
+        self.assertEqual(dict(a="other", b=99, c=3), storage.list)
+        self.assertEqual(dict(a="other", b=99, c=3), other.list)
+        other["c"] = "new"
+        self.assertEqual("new", storage["c"])
+        # a torn record at the end is ignored and cut by the next write
+        with open(path, "ab") as fp:
+            fp.write(b"\x05\x00\x00\x00\x10\x00")
+        self.assertEqual(3, len(LogStorage(path, compact_ratio=0)))
+        storage["e"] = 5
+        self.assertEqual(5, other["e"])
+        self.assertEqual(4, len(other))
+        # a namespace is a sibling file
+        ns = storage.namespace("plugin")
+        self.addCleanup(ns.close)
+        ns["a"] = "ns"
+        self.assertEqual(path + ".plugin", ns.index)
+        self.assertEqual("other", storage["a"])
+        coded = LogStorage(join(base, "json"), codec=JsonCodec())
+        coded["a"] = [1]
+        self.assertEqual(b"[1]", open(join(base, "json"), "rb").read()[-3:])
+        self.assertEqual([1], coded["a"])
+        coded.close()
+        with open(join(base, "bad"), "wb") as fp:
+            fp.write(b"not a log")
+        with self.assertRaises(PluginError):
+            LogStorage(join(base, "bad")).get("a")
+        with self.assertRaises(ParamError):
+            LogStorage(path, compact_ratio=1)
+
+    def test_logstorage_concurrency(self):
+        base = mkdtemp()
+        self.addCleanup(rmtree, base)
+        path = join(base, "log")
+        storage = LogStorage(path, compact_ratio=0.3, compact_min_size=4096)
+        self.addCleanup(storage.close)
+        storage["start"] = 0
+        # hold the file, so its inode is not reused after a compaction
+        fd = os.open(path, os.O_RDONLY)
+        self.addCleanup(os.close, fd)
+        # a writer process and the writer threads append meanwhile
+        code = (
+            "from flask_pluginkit import LogStorage; s = LogStorage(%r); "
+            "[s.set('p%%d' %% i, i) for i in range(200)]" % path
+        )
+        proc = subprocess.Popen([sys.executable, "-c", code], cwd=base)
+
+        def write(prefix):
+            for i in range(200):
+                storage.set("%s%d" % (prefix, i % 10), i)
+
+        threads = [Thread(target=write, args=("t%d-" % n,)) for n in range(3)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(0, proc.wait())
+        # the background compaction replaced the file
+        self.assertIsNotNone(storage._compactor)
+        storage._compactor.join()
+        self.assertNotEqual(os.fstat(fd).st_ino, os.stat(path).st_ino)
+        expected = dict(start=0)
+        expected.update({"p%d" % i: i for i in range(200)})
+        expected.update(
+            {"t%d-%d" % (n, i): 190 + i for n in range(3) for i in range(10)}
+        )
+        self.assertEqual(expected, storage.list)
+        self.assertEqual(expected, LogStorage(path).list)
+        # a forked child uses its own lock and handle
+        pid = os.fork()
+        if pid == 0:
+            try:
+                storage["child"] = 1
+                os._exit(0 if storage._lock_fd is not None else 1)
+            except BaseException:
+                os._exit(1)
+        self.assertEqual(0, os.waitpid(pid, 0)[1])
+        self.assertEqual(1, storage["child"])
+
+    def test_logstorage_compact_processes(self):
+        base = mkdtemp()
+        self.addCleanup(rmtree, base)
+        path = join(base, "log")
+        # the processes write and compact the same log in the background
+        code = (
+            "import sys; from flask_pluginkit import LogStorage; "
+            "s = LogStorage(%r, compact_ratio=0.2, compact_min_size=4000); "
+            "p = sys.argv[1]; "
+            "[s.set('%%s-%%d' %% (p, i %% 50), i) for i in range(3000)]; "
+            "s.close()" % path
+        )
+        procs = [
+            subprocess.Popen([sys.executable, "-c", code, str(n)], cwd=base)
+            for n in range(4)
+        ]
+        self.assertEqual([0] * 4, [p.wait() for p in procs])
+        expected = {"%d-%d" % (n, i): 2950 + i for n in range(4) for i in range(50)}
+        self.assertEqual(expected, LogStorage(path).list)
+        # only the log and its lock files are left
+        self.assertEqual(
+            ["log", "log.compact.lock", "log.lock"], sorted(os.listdir(base))
+        )
 
     def test_basestorage(self):
         class MyStorage(BaseStorage):
@@ -148,6 +743,31 @@ class UtilsTest(unittest.TestCase):
         self.assertTrue(dcp.remove("f", f))
         self.assertEqual(len(dcp.list), 1)
 
+        dcp.push("f", f)
+        dcp.muted_modules = (__name__.split(".")[0],)
+        self.assertTrue(dcp.is_muted(f))
+        self.assertEqual(dcp.emit("f"), Markup(""))
+        dcp.muted_modules = ()
+        self.assertEqual(dcp.emit("f"), Markup("test"))
+
+    def test_lrucache(self):
+        cache = LRUCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        self.assertEqual(1, cache.get("a"))
+        cache.set("c", 3)
+        self.assertNotIn("b", cache)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(2, len(cache))
+        self.assertEqual(dict(hits=1, misses=1, size=2, maxsize=2), cache.stats)
+        cache.set("d", 4, ttl=1)
+        cache._data["d"] = (4, 1)
+        self.assertEqual(0, cache.get("d", 0))
+        self.assertTrue(cache.remove("c"))
+        self.assertFalse(cache.remove("c"))
+        cache.clear()
+        self.assertEqual(0, len(cache))
+
     def test_pip(self):
         testpkg = "semver"
         testpkgver = "3.0.1"
@@ -161,14 +781,197 @@ class UtilsTest(unittest.TestCase):
         pkgver = pip_show(testpkg, target_dir=tgt)
         self.assertTrue(isValidSemver(pkgver))  # type: ignore
         self.assertEqual(pkgver, testpkgver)
+        self.assertIn(testpkg, installed_packages(target_dir=tgt))
         # cleanup
         rmtree(tgt, ignore_errors=True)
 
+    def test_installed_packages(self):
+        self.assertEqual("flask-pluginkit", canonical_name("Flask_PluginKit"))
+        self.assertEqual("a-b-c", canonical_name("A.b__c"))
+        pkgs = installed_packages()
+        self.assertIn("flask", pkgs)
+        self.assertIs(pkgs, installed_packages())
+        self.assertIsNot(pkgs, installed_packages(refresh=True))
+
+    def test_plugin_manifest(self):
+        base = mkdtemp()
+        plugins = join(base, "plugins")
+        pkg = join(plugins, "demo")
+        init_file = join(pkg, "__init__.py")
+        mkdir(plugins)
+        mkdir(pkg)
+        with open(init_file, "w") as fd:
+            fd.write("__version__ = '0.1.0'\n")
+        manifest_file = join(base, "manifest.json")
+        try:
+            m = PluginManifest(manifest_file)
+            self.assertIsNone(m.listdir(plugins))
+            m.set_listdir(plugins, ["demo"])
+            self.assertIsNone(m.get(pkg, init_file))
+            self.assertIsNone(m.trusted(pkg))
+            m.set(pkg, dict(markers=[False, False], meta=None), init_file)
+            m.update(pkg, version="0.1.0")
+            self.assertEqual("0.1.0", m.trusted(pkg)["version"])
+            m.set(join(base, "bad"), dict(meta=b"bytes"))
+            m.save()
+            self.assertEqual(dict(hits=0, misses=1, size=1), m.stats)
+            self.assertEqual(["manifest.json", "plugins"], sorted(os.listdir(base)))
+            #: warm start
+            m = PluginManifest(manifest_file)
+            self.assertEqual(["demo"], m.listdir(plugins))
+            self.assertIsNone(m.trusted(pkg))
+            self.assertEqual("0.1.0", m.get(pkg, init_file)["version"])
+            self.assertEqual(1, m.hits)
+            #: changed plugin and unchanged salt
+            with open(join(pkg, "DISABLED"), "w") as fd:
+                fd.write("")
+            self.assertIsNone(m.get(pkg, init_file))
+            self.assertIsNone(PluginManifest(manifest_file, "other").listdir(plugins))
+            #: writable by others
+            os.chmod(manifest_file, 0o666)
+            self.assertIsNone(PluginManifest(manifest_file).listdir(plugins))
+            os.chmod(manifest_file, 0o600)
+            self.assertEqual(["demo"], PluginManifest(manifest_file).listdir(plugins))
+            #: invalid file
+            with open(manifest_file, "w") as fd:
+                fd.write("{")
+            self.assertIsNone(PluginManifest(manifest_file).get(pkg, init_file))
+        finally:
+            rmtree(base, ignore_errors=True)
+
+    def test_private_tempdir(self):
+        path = private_tempdir("fpk_test_private")
+        try:
+            self.assertEqual(0o700, os.stat(path).st_mode & 0o777)
+            self.assertEqual(path, private_tempdir("fpk_test_private"))
+            os.chmod(path, 0o755)
+            with self.assertRaises(OSError):
+                private_tempdir("fpk_test_private")
+        finally:
+            os.rmdir(path)
+
+    def test_lazy_plugin(self):
+        base = mkdtemp()
+        pkg = join(base, "fpk_lazy_plugin")
+        mkdir(pkg)
+        with open(join(pkg, "__init__.py"), "w") as fd:
+            fd.write(
+                "from os import getcwd\n"
+                "__plugin_name__ = 'lazy'\n"
+                "__version__ = '0.1.0'\n"
+                "__author__ = getcwd()\n"
+                "__state__ = 'disabled'\n"
+                "VALUE = 1\n"
+                "def register():\n"
+                "    return {}\n"
+            )
+        meta, dynamic = parse_plugin_meta(join(pkg, "__init__.py"))
+        self.assertEqual("lazy", meta["__plugin_name__"])
+        self.assertEqual("disabled", meta["__state__"])
+        self.assertTrue(meta["register"])
+        self.assertNotIn("VALUE", meta)
+        self.assertEqual({"__author__"}, dynamic)
+        sys.path.insert(0, base)
+        try:
+            lp = LazyPlugin("fpk_lazy_plugin", meta)
+            self.assertEqual("0.1.0", lp.__version__)
+            self.assertIsNone(getattr(lp, "__author__", None))
+            self.assertFalse(lp.is_loaded)
+            self.assertEqual(1, lp.VALUE)
+            self.assertTrue(lp.is_loaded)
+        finally:
+            sys.path.remove(base)
+            rmtree(base, ignore_errors=True)
+
     def test_match_version(self):
         self.assertTrue(is_match_version_req(ver))
         self.assertFalse(is_match_version_req(f">{ver}"))
         self.assertFalse(is_match_version_req(f"<{ver}"))
 
 
+class AsyncStorageTest(unittest.IsolatedAsyncioTestCase):
+    async def test_asyncbasestorage(self):
+        class MyStorage(AsyncBaseStorage):
+            def __init__(self):
+                self.data = {}
+
+            async def get(self, key, default=None):
+                await asyncio.sleep(0.05)
+                return self.data.get(key, default)
+
+            async def set(self, key, value):
+                await asyncio.sleep(0.05)
+                self.data[key] = value
+
+        ms = MyStorage()
+        self.assertEqual("flask_pluginkit_dat", ms.index)
+        with self.assertRaises(NotImplementedError):
+            await ms.list()
+        # the calls run concurrently
+        begin = time.time()
+        await ms.setmany(**{"k%d" % i: i for i in range(10)})
+        data = await ms.getmany("k1", "k2", "none", default=0)
+        self.assertLess(time.time() - begin, 0.5)
+        self.assertEqual(dict(k1=1, k2=2, none=0), data)
+
+    async def test_asynclocalstorage(self):
+        base = mkdtemp()
+        self.addCleanup(rmtree, base)
+        storage = AsyncLocalStorage(join(base, "data"))
+        self.assertFalse(storage.storage.persistent)
+        self.assertEqual(join(base, "data"), storage.index)
+        await asyncio.gather(*[storage.set("k%d" % i, i) for i in range(20)])
+        self.assertEqual(1, await storage.get("k1"))
+        self.assertEqual(0, await storage.get("none", 0))
+        await storage.setmany(a=1, b=2)
+        self.assertEqual(dict(a=1, b=2), await storage.getmany("a", "b"))
+        await storage.remove("a")
+        self.assertEqual(21, len(await storage.list()))
+        await storage.close()
+        # an async and a sync store write one path concurrently
+        mixed = AsyncLocalStorage(join(base, "mixed"))
+        sync = LocalStorage(join(base, "mixed"))
+
+        def sync_writes():
+            for i in range(20):
+                sync.set("s%d" % i, i)
+
+        thread = Thread(target=sync_writes)
+        thread.start()
+        await asyncio.gather(*[mixed.set("a%d" % i, i) for i in range(20)])
+        thread.join()
+        self.assertEqual(40, len(await mixed.list()))
+        self.assertEqual(19, sync.get("a19"))
+        expired = AsyncLocalStorage(storage=ExpiredLocalStorage(join(base, "expired")))
+        await expired.set("a", 1, ttl=100)
+        self.assertEqual(dict(a=1), await expired.list())
+
+    @unittest.skipIf(redis is None, "redis is not installed")
+    async def test_asyncredisstorage(self):
+        server = FakeRedisServer().start()
+        self.addCleanup(server.stop)
+        storage = AsyncRedisStorage(redis_url=server.url)
+        cached = RedisStorage(redis_url=server.url, cache_size=10)
+        cached.cache_check_interval = 0
+        await storage.setmany(a=1, b=dict(b=2))
+        self.assertEqual(1, cached["a"])
+        del server.commands[:]
+        self.assertEqual(
+            dict(a=1, b=dict(b=2), none=None),
+            await storage.getmany("a", "b", "none"),
+        )
+        self.assertEqual(["HMGET"], server.commands)
+        await storage.set("a", 10)
+        self.assertEqual(10, await storage.get("a"))
+        # the sync cache sees the version changed
+        self.assertEqual(10, cached["a"])
+        self.assertTrue(await storage.exists("b"))
+        self.assertEqual(1, await storage.remove("b"))
+        self.assertEqual(0, await storage.removemany())
+        self.assertEqual(1, await storage.length())
+        self.assertEqual({b"a": 10}, await storage.list())
+        await storage.close()
+
+
 if __name__ == "__main__":
     unittest.main()